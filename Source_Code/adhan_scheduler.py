@@ -0,0 +1,410 @@
+"""
+Proactive prayer-time announcements: adhan clips, "10 minit lagi" reminders
+and imsak, for one or more zones.
+
+The day's timetables (prayer_tool, so normally straight from the on-disk
+cache) are turned into one heap of upcoming events. A single thread sleeps
+until the earliest one, fires everything that is due and sleeps again; no
+polling. The heap is rebuilt:
+
+- just after midnight (a "rearm" event on the heap)
+- when a zone's timetable is (re)loaded (TimetableStore.subscribe)
+- when the wall clock jumps (NTP, manual change): the wall time that passed
+  during a sleep is compared with the monotonic time that passed
+- on reschedule(), e.g. after changing zones
+
+Times are absolute datetimes in Malaysia time, so the host's timezone setting
+does not matter. The clock is injectable: ManualClock runs a whole day in
+milliseconds (--simulate) and lets a test move or jump time.
+
+    python adhan_scheduler.py --zone SGR01 --remind 10          # announce for real
+    python adhan_scheduler.py --zone SGR01 --zone WLY01 --list  # today's events
+    python adhan_scheduler.py --zone SGR01 --simulate           # fast-forward today, print only
+"""
+import os
+import time
+import heapq
+import argparse
+import itertools
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterable, Optional
+from zoneinfo import ZoneInfo
+
+MY_TZ = ZoneInfo("Asia/Kuala_Lumpur")
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Audio")
+
+ADHAN_PRAYERS = ("subuh", "zohor", "asar", "maghrib", "isyak")
+ADHAN_CLIPS = {"subuh": "subuh.ogg", "zohor": "zuhur.ogg", "asar": "asar.ogg",
+               "maghrib": "maghrib.ogg", "isyak": "isyak.ogg"}
+TIME_KEYS = {"imsak": "imsak", "subuh": "fajr", "zohor": "dhuhr", "asar": "asr",
+             "maghrib": "maghrib", "isyak": "isha"}     # e-Solat day entry fields
+
+REMINDERS_MIN = (10,)      # minutes before each adhan
+GRACE_S = 60.0             # an event this late (e.g. start-up at 13:15:20 for 13:15) still fires
+REARM_AFTER_MIDNIGHT_S = 5.0
+RETRY_S = 600.0            # re-try when a timetable could not be loaded
+MAX_SLEEP_S = 3600.0       # upper bound on one sleep (clock-jump check at least hourly)
+JUMP_S = 2.0               # wall vs monotonic difference that counts as a clock change
+
+REMINDER_TEXT = "{mins} minit lagi masuk waktu {prayer}."
+ADHAN_TEXT = "Telah masuk waktu {prayer}."      # spoken when the clip is missing
+IMSAK_TEXT = "Waktu imsak."
+
+
+class SystemClock:
+    """Real time: wall clock in MY_TZ, sleeps on the scheduler's condition variable."""
+
+    def now(self) -> datetime:
+        return datetime.now(MY_TZ)
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def wait(self, cv: threading.Condition, timeout: float):
+        cv.wait(timeout)
+
+
+class ManualClock:
+    """
+    Virtual time for tests and --simulate. With auto=True every wait() simply
+    jumps forward by its timeout; otherwise time only moves on advance() / set().
+    set() moves the wall clock without moving monotonic time (a clock change).
+    """
+
+    def __init__(self, start: datetime, auto: bool = False):
+        self._now = start
+        self._mono = 0.0
+        self.auto = auto
+        self._cvs: set[threading.Condition] = set()
+
+    def now(self) -> datetime:
+        return self._now
+
+    def monotonic(self) -> float:
+        return self._mono
+
+    def wait(self, cv: threading.Condition, timeout: float):
+        if self.auto:
+            self._now += timedelta(seconds=timeout)
+            self._mono += timeout
+            return
+        self._cvs.add(cv)
+        cv.wait()
+
+    def advance(self, seconds: float):
+        self._now += timedelta(seconds=seconds)
+        self._mono += seconds
+        self._wake()
+
+    def set(self, when: datetime):
+        self._now = when
+        self._wake()
+
+    def _wake(self):
+        for cv in list(self._cvs):
+            with cv:
+                cv.notify_all()
+
+
+class Event:
+    """
+    One announcement. kind: "adhan" | "reminder" | "imsak" | "rearm".
+    interrupt is cleared for all but the first of events due together
+    (imsak and the subuh reminder often share a minute), so they queue.
+    """
+
+    def __init__(self, kind: str, when: datetime, zone: Optional[str] = None, prayer: Optional[str] = None,
+                 text: str = "", clip: Optional[str] = None):
+        self.kind = kind
+        self.when = when
+        self.zone = zone
+        self.prayer = prayer
+        self.text = text
+        self.clip = clip
+        self.interrupt = True
+        self.fired_at: Optional[datetime] = None
+
+    @property
+    def key(self) -> tuple:
+        return (self.kind, self.zone, self.prayer, self.when.isoformat())
+
+    def __repr__(self):
+        return f"Event({self.kind} {self.prayer or ''} {self.zone or ''} @ {self.when:%Y-%m-%d %H:%M:%S})"
+
+
+def announce(event: Event):
+    """
+    Default action: play the adhan clip, or speak the text, cutting off lower
+    priority audio (event.interrupt) or queued behind the alert before it.
+    """
+    from audio_out import get_output, ALERT
+    out = get_output()
+    kw = dict(priority=ALERT, channel="adhan", interrupt=event.interrupt)
+    if event.clip and os.path.exists(event.clip):
+        out.play_file(event.clip, **kw)
+        return
+    try:
+        from tts_cache import get_phrase_cache
+        cache = get_phrase_cache()
+        out.play_pcm(cache.assemble(event.text), cache.sr, **kw)
+    except Exception:
+        out.say(event.text, **kw)
+
+
+def at(day: date, hhmmss: str) -> datetime:
+    """e-Solat "HH:MM:SS" on a given day -> aware datetime in Malaysia time."""
+    hh, mm, ss = map(int, hhmmss.split(":"))
+    return datetime(day.year, day.month, day.day, hh, mm, ss, tzinfo=MY_TZ)
+
+
+class AdhanScheduler:
+    """
+    Timer heap of the day's announcements for `zones`.
+
+    times_for(zone, day) returns the e-Solat day entry (default:
+    prayer_tool.get_times_for_date); on_event(Event) does the announcing
+    (default: announce()). start() runs it on a daemon thread; run_until()
+    runs it on the calling thread (tests, --simulate).
+    """
+
+    def __init__(self, zones: Iterable[str], times_for: Optional[Callable[[str, date], Optional[dict]]] = None,
+                 on_event: Optional[Callable[[Event], None]] = None, clock=None,
+                 reminders_min: Iterable[int] = REMINDERS_MIN, imsak: bool = True, adhan: bool = True,
+                 store=None):
+        if times_for is None:
+            from prayer_tool import get_times_for_date, get_store
+            times_for = get_times_for_date
+            store = store or get_store()
+        self.zones = list(zones)
+        self.times_for = times_for
+        self.on_event = on_event or announce
+        self.clock = clock or SystemClock()
+        self.reminders_min = tuple(sorted(set(reminders_min), reverse=True))
+        self.imsak = imsak
+        self.adhan = adhan
+
+        self._cv = threading.Condition()
+        self._heap: list[tuple[float, int, Event]] = []
+        self._seq = itertools.count()
+        self._fired: set[tuple] = set()
+        self._dirty = True
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.rebuilds = 0
+        self.wakeups = 0
+        self.missed = 0
+        self.fired = {"adhan": 0, "reminder": 0, "imsak": 0}
+        self.late_s: deque = deque(maxlen=1000)   # fire time - scheduled time
+
+        if store is not None:
+            store.subscribe(self._on_timetable)
+
+    # ----------------------------
+    # Control
+    # ----------------------------
+    def start(self) -> "AdhanScheduler":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="adhan-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cv:
+            self._stopped = True
+            self._cv.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def reschedule(self, zones: Optional[Iterable[str]] = None):
+        """Rebuild the heap (new zones, changed settings) before the next sleep."""
+        with self._cv:
+            if zones is not None:
+                self.zones = list(zones)
+            self._dirty = True
+            self._cv.notify_all()
+
+    def run_until(self, end: datetime):
+        """Process events on this thread until the clock reaches `end`."""
+        self._run(until=end)
+
+    def upcoming(self, limit: int = 20) -> list[Event]:
+        with self._cv:
+            if self._dirty:
+                self._rebuild(self.clock.now())
+            return [e for _, _, e in heapq.nsmallest(limit, self._heap) if e.kind != "rearm"]
+
+    def _on_timetable(self, zone: str, year: int):
+        if zone in self.zones:
+            self.reschedule()
+
+    # ----------------------------
+    # Heap
+    # ----------------------------
+    def _push(self, event: Event):
+        heapq.heappush(self._heap, (event.when.timestamp(), next(self._seq), event))
+
+    def _rebuild(self, now: datetime):
+        """Arm every event left today (and the midnight re-arm)."""
+        self._heap.clear()
+        self._dirty = False
+        self.rebuilds += 1
+        today = now.date()
+        self._fired = {k for k in self._fired if k[3][:10] == today.isoformat()}
+        earliest = now - timedelta(seconds=GRACE_S)
+
+        missing = False
+        for zone in self.zones:
+            day = self.times_for(zone, today)
+            if not day:
+                missing = True
+                continue
+            for event in self._events_for(zone, today, day):
+                if event.when >= earliest and event.key not in self._fired:
+                    self._push(event)
+
+        midnight = datetime.combine(today + timedelta(days=1), datetime.min.time(), tzinfo=MY_TZ)
+        rearm = midnight + timedelta(seconds=REARM_AFTER_MIDNIGHT_S)
+        if missing:
+            rearm = min(rearm, now + timedelta(seconds=RETRY_S))
+        self._push(Event("rearm", rearm))
+
+    def _events_for(self, zone: str, today: date, day: dict) -> list[Event]:
+        events = []
+        if self.imsak and day.get(TIME_KEYS["imsak"]):
+            events.append(Event("imsak", at(today, day[TIME_KEYS["imsak"]]), zone, "imsak", IMSAK_TEXT))
+        for prayer in ADHAN_PRAYERS:
+            hhmmss = day.get(TIME_KEYS[prayer])
+            if not hhmmss:
+                continue
+            when = at(today, hhmmss)
+            for mins in self.reminders_min:
+                events.append(Event("reminder", when - timedelta(minutes=mins), zone, prayer,
+                                    REMINDER_TEXT.format(mins=mins, prayer=prayer)))
+            if self.adhan:
+                events.append(Event("adhan", when, zone, prayer, ADHAN_TEXT.format(prayer=prayer),
+                                    os.path.join(AUDIO_DIR, ADHAN_CLIPS[prayer])))
+        return events
+
+    # ----------------------------
+    # Loop
+    # ----------------------------
+    def _run(self, until: Optional[datetime] = None):
+        while True:
+            with self._cv:
+                due = self._next_due(until)
+            if not due:
+                return
+            for k, event in enumerate(due):
+                event.interrupt = k == 0
+                self._fire(event)
+
+    def _next_due(self, until: Optional[datetime]) -> list[Event]:
+        """Sleep until something is due; returns it (empty list = stop)."""
+        while not self._stopped:
+            now = self.clock.now()
+            if self._dirty:
+                self._rebuild(now)
+            ts = now.timestamp()
+
+            due = []
+            while self._heap and self._heap[0][0] <= ts:
+                event = heapq.heappop(self._heap)[2]
+                if event.kind == "rearm":
+                    self._dirty = True
+                elif ts - event.when.timestamp() > GRACE_S:
+                    self.missed += 1           # e.g. the machine was suspended; a late adhan is worse than none
+                elif event.key not in self._fired:
+                    due.append(event)
+            if due:
+                return due
+            if self._dirty:
+                continue
+            if until is not None and now >= until:
+                return []
+
+            delay = self._heap[0][0] - ts if self._heap else MAX_SLEEP_S
+            if until is not None:
+                delay = min(delay, (until - now).total_seconds())
+            wall0, mono0 = ts, self.clock.monotonic()
+            self.clock.wait(self._cv, min(delay, MAX_SLEEP_S))
+            self.wakeups += 1
+            drift = (self.clock.now().timestamp() - wall0) - (self.clock.monotonic() - mono0)
+            if abs(drift) > JUMP_S:
+                print(f"[ADHAN] Clock changed by {drift:+.0f}s; re-arming.")
+                self._dirty = True
+        return []
+
+    def _fire(self, event: Event):
+        now = self.clock.now()
+        event.fired_at = now
+        with self._cv:
+            self._fired.add(event.key)
+            self.fired[event.kind] += 1
+            self.late_s.append((now - event.when).total_seconds())
+        try:
+            self.on_event(event)
+        except Exception as e:
+            print(f"[ADHAN] {event}: {type(e).__name__}: {e}")
+
+    def stats(self) -> dict:
+        with self._cv:
+            late = self.late_s
+            return {
+                "zones": list(self.zones),
+                "armed": sum(1 for _, _, e in self._heap if e.kind != "rearm"),
+                "fired": dict(self.fired),
+                "rebuilds": self.rebuilds,
+                "wakeups": self.wakeups,
+                "missed": self.missed,
+                "max_late_s": max(late) if late else None,
+                "avg_late_s": sum(late) / len(late) if late else None,
+            }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Adhan / reminder scheduler")
+    ap.add_argument("--zone", action="append", default=[], help="JAKIM zone (repeatable), default SGR01")
+    ap.add_argument("--remind", type=int, action="append", default=[], help="minutes before adhan (repeatable)")
+    ap.add_argument("--no-imsak", action="store_true")
+    ap.add_argument("--list", action="store_true", help="print today's remaining events and exit")
+    ap.add_argument("--simulate", action="store_true", help="fast-forward through today, printing events")
+    args = ap.parse_args(argv)
+
+    zones = args.zone or ["SGR01"]
+    reminders = args.remind or REMINDERS_MIN
+    printer = lambda e: print(f"[ADHAN] {e.when:%H:%M:%S} {e.zone} {e.kind:8s} {e.text}")
+
+    if args.simulate:
+        start = datetime.now(MY_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+        clock = ManualClock(start, auto=True)
+        sched = AdhanScheduler(zones, on_event=printer, clock=clock, reminders_min=reminders,
+                               imsak=not args.no_imsak)
+        t0 = time.perf_counter()
+        sched.run_until(start + timedelta(days=1, minutes=1))
+        print(f"[ADHAN] Simulated a day in {(time.perf_counter() - t0) * 1000:.0f} ms: {sched.stats()}")
+        return 0
+
+    sched = AdhanScheduler(zones, reminders_min=reminders, imsak=not args.no_imsak)
+    if args.list:
+        for e in sched.upcoming(100):
+            printer(e)
+        return 0
+
+    print(f"[ADHAN] Armed for {', '.join(zones)}; next: {sched.upcoming(1)}. Ctrl+C to quit.")
+    sched.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    sched.stop()
+    print(f"[ADHAN] {sched.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
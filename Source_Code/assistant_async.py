@@ -0,0 +1,417 @@
+"""
+Full-duplex assistant loop on asyncio.
+
+    mic callback --(endpointer)--> utterances --> STT --> texts --> route/LLM --> segments --> playback
+                   speech start -> barge-in
+
+Every arrow between stages is a bounded asyncio.Queue and every stage is its
+own task, so turn N can be spoken while turn N+1 is being transcribed. The
+microphone is never closed: the endpointer keeps running during playback, and
+when new speech starts while a reply is being generated or spoken, generation
+is cancelled and TTS is stopped (barge-in).
+
+Blocking libraries run in single-thread executors (one per stage; pyttsx3
+must stay on one thread). Stage callables can be swapped for testing.
+
+    python assistant_async.py                         # live mic
+    python assistant_async.py --replay ../Audio/*.ogg --no-tts
+    python assistant_async.py --wake                  # answer only after the wake phrase
+"""
+import os
+import time
+import asyncio
+import argparse
+import threading
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+
+from metrics import tracer, run_in_turn, JsonlSink, serve_prometheus
+from mic_capture import Endpointer, FRAME_MS
+from kws import WakeWordDetector
+
+TARGET_SR = 16000
+QUEUE_SIZE = 2             # utterances / texts waiting for a busy stage
+SEGMENT_QUEUE_SIZE = 4     # reply segments generated ahead of playback
+LISTEN_FOREVER = 24 * 3600.0
+
+# While the assistant is talking the mic also hears the speaker; ask for a
+# louder, longer onset before treating it as the user barging in.
+# (A headset or an echo-cancelling mic array works far better than this.)
+BARGE_IN_DB = 6.0
+BARGE_IN_FRAMES = 8        # x FRAME_MS
+
+# With a wake word detector, utterances are only transcribed within this
+# long after the wake phrase or after the end of a reply (follow-ups).
+WAKE_WINDOW_S = 8.0
+
+TRACE_JSONL = os.environ.get("ASSISTANT_TRACE_JSONL")
+METRICS_PORT = os.environ.get("ASSISTANT_METRICS_PORT")
+
+
+class DuplexAssistant:
+    def __init__(self, transcribe: Optional[Callable[[np.ndarray], str]] = None,
+                 correct: Optional[Callable[[str], str]] = None,
+                 respond_stream: Optional[Callable[..., Iterator[str]]] = None,
+                 speak: Optional[Callable[[str], None]] = None,
+                 stop_speaking: Optional[Callable[[], None]] = None,
+                 model: str = "llama3:latest", barge_in: bool = True, device=None,
+                 sr: int = TARGET_SR, queue_size: int = QUEUE_SIZE,
+                 wake: Optional[WakeWordDetector] = None, **endpointer_kwargs):
+        if correct is None:
+            from stt_postprocess import correct_domain_text as correct
+        if transcribe is None:
+            from stt_faster_whisper import transcribe_faster
+            from router import transcript_complete, intent_complete
+
+            def transcribe(audio):
+                # greedy first; the full decode (or next cascade tier) only if the router can't parse the result
+                return transcribe_faster(audio, accept=lambda raw: transcript_complete(correct(raw)),
+                                         complete=lambda raw: intent_complete(correct(raw)))
+        if respond_stream is None:
+            from router import get_response_stream as respond_stream
+        if speak is None:
+            from tts_cache import speak, stop as stop_speaking
+
+        self.transcribe = transcribe
+        self.correct = correct
+        self.respond_stream = respond_stream
+        self.speak = speak
+        self.stop_speaking = stop_speaking or (lambda: None)
+        self.model = model
+        self.barge_in = barge_in
+        self.device = device
+        self.sr = sr
+        self.queue_size = queue_size
+        self.wake = wake                       # kws.WakeWordDetector, or None to answer everything
+        self._armed_until = 0.0
+
+        endpointer_kwargs.setdefault("max_wait_seconds", LISTEN_FOREVER)
+        self._ep_kwargs = endpointer_kwargs
+        self._ep = Endpointer(sr, **endpointer_kwargs)
+        self._base_db = self._ep.vad.threshold_db
+        self._base_start = self._ep.start_frames
+
+        self._stt_pool = ThreadPoolExecutor(1, thread_name_prefix="stt")
+        self._llm_pool = ThreadPoolExecutor(1, thread_name_prefix="llm")
+        self._tts_pool = ThreadPoolExecutor(1, thread_name_prefix="tts")
+
+        self.speaking = False
+        self._gen = 0                          # bumped on every reply and every barge-in
+        self._cancel: Optional[threading.Event] = None
+        self._active = None                    # turn being answered / spoken
+        self._tts_s: dict[int, float] = {}
+        self._inflight = 0                     # turns between endpoint and end of reply
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self.interruptions = 0
+        self.dropped = 0
+        self.ignored = 0                       # utterances skipped for lack of a wake word
+
+    # ----------------------------
+    # Audio in (mic callback thread, or the loop itself when replaying)
+    # ----------------------------
+    def feed(self, block: np.ndarray):
+        """Push TARGET_SR mono float32 audio; endpointing happens here, results go to the loop."""
+        ep = self._ep
+        ep.vad.threshold_db = self._base_db + (BARGE_IN_DB if self.speaking else 0.0)
+        ep.start_frames = BARGE_IN_FRAMES if self.speaking else self._base_start
+
+        was_triggered = ep.triggered
+        ep.feed(block)
+        if self.wake is not None and self.wake.feed(block):
+            self._armed_until = time.monotonic() + WAKE_WINDOW_S
+            print(f"[KWS] Wake word (score {self.wake.fire_score:.2f})")
+        if ep.triggered and not was_triggered:
+            self._loop.call_soon_threadsafe(self._on_speech_start)
+        if ep.done:
+            audio, reason = ep.audio().copy(), ep.reason
+            # next utterance keeps the learned noise floor
+            self._ep = Endpointer(self.sr, vad=ep.vad, **self._ep_kwargs)
+            if reason != "no_speech":
+                if self._listening():
+                    self._loop.call_soon_threadsafe(self._on_utterance, audio, reason)
+                else:
+                    self.ignored += 1
+
+    def _listening(self) -> bool:
+        """Whisper only runs for utterances that follow the wake word (or belong to a conversation)."""
+        return self.wake is None or self._inflight > 0 or time.monotonic() <= self._armed_until
+
+    def _on_speech_start(self):
+        if self.barge_in and self._active is not None:
+            self.interrupt()
+
+    def _on_utterance(self, audio: np.ndarray, reason: str):
+        turn = tracer.begin()
+        turn.note(endpoint=reason, capture_audio_s=round(len(audio) / self.sr, 3))
+        self._inflight += 1
+        self._offer(self._utt_q, (turn, audio))
+
+    def _offer(self, q: asyncio.Queue, item):
+        """put_nowait, dropping the oldest item when the stage is behind."""
+        if q.full():
+            old_turn = q.get_nowait()[0]
+            old_turn.note(dropped="queue_full")
+            self._close(old_turn)
+            self.dropped += 1
+            print("[ASSISTANT] Busy, dropped an older utterance.")
+        q.put_nowait(item)
+
+    # ----------------------------
+    # Barge-in
+    # ----------------------------
+    def interrupt(self):
+        """Cancel the reply being generated/spoken. Safe to call when idle."""
+        turn = self._active
+        self._gen += 1
+        if self._cancel is not None:
+            self._cancel.set()
+        self._drain_segments()
+        self.stop_speaking()
+        if turn is not None:
+            turn.note(interrupted="yes")
+            self.interruptions += 1
+            print("\n[BOT] Interrupted.")
+
+    def _drain_segments(self):
+        while not self._seg_q.empty():
+            _, turn, seg = self._seg_q.get_nowait()
+            if seg is None:
+                self._end_reply(turn)
+
+    def _end_reply(self, turn):
+        if self._active is turn:
+            self._active = None
+        self._armed_until = time.monotonic() + WAKE_WINDOW_S
+        tts_s = self._tts_s.pop(turn.id, 0.0)
+        if tts_s:
+            turn.add_span("tts", tts_s)
+        self._close(turn)
+
+    def _close(self, turn):
+        self._inflight -= 1
+        tracer.end(turn)
+
+    # ----------------------------
+    # Stages
+    # ----------------------------
+    def _run(self, pool: ThreadPoolExecutor, turn, fn, *args):
+        return self._loop.run_in_executor(pool, run_in_turn, turn, fn, *args)
+
+    async def _stt_loop(self):
+        while True:
+            turn, audio = await self._utt_q.get()
+            try:
+                text = await self._run(self._stt_pool, turn, self._transcribe, turn, audio)
+            except Exception as e:
+                # one bad utterance must not stop the loop for good
+                print(f"[ASSISTANT] STT failed: {e!r}")
+                turn.note(error="stt")
+                self._close(turn)
+                continue
+            if not text.strip():
+                self._close(turn)
+                continue
+            await self._text_q.put((turn, text))
+
+    def _transcribe(self, turn, audio: np.ndarray) -> str:
+        with turn.stage("stt"):
+            raw = self.transcribe(audio)
+        with turn.stage("postprocess"):
+            fixed = self.correct(raw)
+        turn.note(raw=raw, fixed=fixed)
+        print("STT FIX :", fixed)
+        return fixed
+
+    async def _route_loop(self):
+        while True:
+            turn, text = await self._text_q.get()
+            self._gen += 1
+            gen = self._gen
+            cancel = threading.Event()
+            self._cancel = cancel
+            self._active = turn
+            try:
+                await self._run(self._llm_pool, turn, self._produce, turn, text, gen, cancel)
+            except Exception as e:
+                print(f"[ASSISTANT] Reply failed: {e!r}")
+                turn.note(error="route")
+            finally:
+                # end-of-reply marker; playback (or a barge-in drain) closes the turn
+                await self._seg_q.put((gen, turn, None))
+
+    def _produce(self, turn, text: str, gen: int, cancel: threading.Event):
+        """LLM thread: pull reply segments and hand them to playback with backpressure."""
+        t0 = time.monotonic()
+        with turn.stage("route"):
+            for i, seg in enumerate(self.respond_stream(text, ollama_model=self.model, cancel=cancel)):
+                if cancel.is_set():
+                    return
+                if i == 0:
+                    turn.note(first_segment_s=round(time.monotonic() - t0, 4))
+                fut = asyncio.run_coroutine_threadsafe(self._seg_q.put((gen, turn, seg)), self._loop)
+                while True:
+                    try:
+                        fut.result(timeout=0.1)
+                        break
+                    except concurrent.futures.TimeoutError:
+                        if cancel.is_set():
+                            fut.cancel()
+                            return
+
+    async def _playback_loop(self):
+        while True:
+            gen, turn, seg = await self._seg_q.get()
+            if seg is None:
+                self._end_reply(turn)
+                continue
+            if gen != self._gen:
+                continue                       # reply was interrupted
+            print("BOT:", seg)
+            self.speaking = True
+            t0 = time.monotonic()
+            try:
+                await self._run(self._tts_pool, turn, self.speak, seg)
+            except Exception as e:
+                print(f"[ASSISTANT] TTS failed: {e!r}")
+                turn.note(error="tts")
+            finally:
+                self.speaking = False
+                self._tts_s[turn.id] = self._tts_s.get(turn.id, 0.0) + time.monotonic() - t0
+
+    # ----------------------------
+    # Sources
+    # ----------------------------
+    async def _listen_mic(self):
+        import sounddevice as sd
+        from resampler import StreamingResampler
+
+        src_sr = int(sd.query_devices(self.device, "input")["default_samplerate"])
+        rs = StreamingResampler(src_sr, self.sr)
+
+        def _callback(indata, frames, time_info, status):
+            self.feed(rs.process(indata[:, 0]))
+
+        with sd.InputStream(device=self.device, samplerate=src_sr, channels=1, dtype="float32",
+                            blocksize=src_sr * FRAME_MS // 1000, callback=_callback):
+            print(f"[ASSISTANT] Listening at {src_sr} Hz. Just talk; Ctrl+C to quit.")
+            await self._stop.wait()
+
+    async def _replay(self, paths: list[str], speed: float = 1.0, gap_s: float = 1.5):
+        """Feed recordings through feed() at (speed x) real time, like a mic would."""
+        from faster_whisper.audio import decode_audio
+
+        step = self.sr * FRAME_MS // 1000
+        silence = np.zeros(int(gap_s * self.sr), dtype=np.float32)
+        for p in paths:
+            print(f"[ASSISTANT] Replaying {os.path.basename(p)}")
+            audio = np.concatenate([decode_audio(p, sampling_rate=self.sr), silence])
+            for i in range(0, len(audio), step):
+                self.feed(audio[i:i + step])
+                await asyncio.sleep(step / self.sr / speed)
+        await self.wait_idle()
+
+    def busy(self) -> bool:
+        return self._inflight > 0 or self._ep.triggered
+
+    async def wait_idle(self, poll_s: float = 0.05):
+        """Return once every queue is empty and no reply is in flight (checked twice, a poll apart)."""
+        while True:
+            while self.busy():
+                await asyncio.sleep(poll_s)
+            await asyncio.sleep(poll_s)
+            if not self.busy():
+                return
+
+    # ----------------------------
+    async def run(self, source=None):
+        """
+        source: None for the microphone, a list of audio paths to replay, or an
+        async callable taking this assistant (tests / custom feeders).
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._utt_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._text_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._seg_q: asyncio.Queue = asyncio.Queue(SEGMENT_QUEUE_SIZE)
+
+        tasks = [asyncio.create_task(self._stt_loop(), name="stt"),
+                 asyncio.create_task(self._route_loop(), name="route"),
+                 asyncio.create_task(self._playback_loop(), name="playback")]
+        try:
+            if source is None:
+                await self._listen_mic()
+            elif callable(source):
+                await source(self)
+            else:
+                await self._replay(list(source))
+        finally:
+            self.interrupt()
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for pool in (self._stt_pool, self._llm_pool, self._tts_pool):
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Full-duplex voice assistant (asyncio)")
+    ap.add_argument("--replay", nargs="+", help="audio files to play into the loop instead of the mic")
+    ap.add_argument("--speed", type=float, default=1.0, help="replay speed (x real time)")
+    ap.add_argument("--device", type=int, default=None, help="input device index")
+    ap.add_argument("--model", default="llama3:latest")
+    ap.add_argument("--no-barge-in", action="store_true")
+    ap.add_argument("--no-tts", action="store_true", help="print replies only")
+    ap.add_argument("--wake", action="store_true",
+                    help="only answer after the wake phrase (templates from `kws.py enroll`)")
+    args = ap.parse_args(argv)
+
+    from stt_faster_whisper import preload
+    from ollama_client import prewarm
+    from router import SYSTEM_PROMPT
+    prewarm(args.model, system=SYSTEM_PROMPT)
+    preload()
+    if not args.no_tts:
+        import tts_cache
+        print(f"[TTS] {tts_cache.warm()} new phrase clips rendered.")
+
+    if TRACE_JSONL:
+        tracer.add_sink(JsonlSink(TRACE_JSONL))
+    if METRICS_PORT:
+        serve_prometheus(int(METRICS_PORT))
+
+    kw = {}
+    if args.no_tts:
+        kw = {"speak": lambda text: None, "stop_speaking": lambda: None}
+    if args.wake:
+        kw["wake"] = WakeWordDetector.load()
+    assistant = DuplexAssistant(model=args.model, barge_in=not args.no_barge_in, device=args.device, **kw)
+
+    source = None
+    if args.replay:
+        async def source(a):
+            await a._replay(args.replay, speed=args.speed)
+
+    try:
+        asyncio.run(assistant.run(source))
+    except KeyboardInterrupt:
+        pass
+    print(f"[ASSISTANT] interruptions={assistant.interruptions} dropped={assistant.dropped}")
+    if assistant.wake is not None:
+        print(f"[KWS] detections={assistant.wake.detections} ignored_utterances={assistant.ignored} "
+              f"cpu={assistant.wake.cpu_load() * 100:.2f}%")
+    if tracer.enabled:
+        for stage, st in tracer.summary().items():
+            print(f"  {stage:12s} n={st['count']:4d}  avg={st['avg_s'] * 1000:8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,434 @@
+"""
+Multi-client assistant server: thin satellites in each room stream audio to
+one LAN box that runs STT + post-processing + routing/LLM for all of them.
+
+    python assistant_server.py --port 8765 --workers 2 --max-batch 4
+    python loadgen.py --url http://192.168.1.10:8765 --clients 4 --requests 10
+
+POST /v1/ask?client=kitchen[&sr=16000][&format=pcm16|f32|file]
+    body: the utterance; a chunked upload is fine (send blocks while recording)
+    reply: NDJSON, one object per line
+        {"type": "transcript", "raw": ..., "text": ...}
+        {"type": "segment", "text": ...}        one per speakable segment
+        {"type": "done", "timings": {...}}
+    503 + Retry-After when the STT queue is full (backpressure),
+    429 when the same client already has a request in flight,
+    400 for an unknown format or an sr outside 8000..192000.
+GET /v1/stats   per-client latency (p50/p95), queue depth, batch sizes, STT stats
+GET /healthz
+
+All clients share one SttEngine (one WhisperModel, num_workers=--workers).
+Utterances wait in a bounded queue; a free worker takes everything queued
+(up to --max-batch, waiting at most --max-wait-ms for more) and decodes it
+in one batched call. Each client gets its own LLM conversation.
+"""
+import io
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Iterator, Optional
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from metrics import summarize, tracer
+
+SAMPLE_RATE = 16000
+WORKERS = 2                # parallel decodes on the shared model (WhisperModel num_workers)
+MAX_BATCH = 4              # utterances per batched decode
+MAX_WAIT_MS = 15           # how long a free worker waits to fill a batch
+QUEUE_MAX = 16             # utterances waiting for STT before new requests get 503
+MAX_UPLOAD_S = 30.0        # longest utterance accepted
+FORMATS = ("pcm16", "f32", "file")
+SR_RANGE = (8000, 192000)  # accepted ?sr= for raw uploads
+HISTORY = 1000             # latency samples kept per client
+
+
+class SttBatcher:
+    """
+    Bounded queue of utterances in front of a pool of worker threads sharing
+    one engine. engine.transcribe_many(list of float32 16 kHz arrays) -> texts.
+    """
+
+    def __init__(self, engine, workers: int = WORKERS, max_batch: int = MAX_BATCH,
+                 max_wait_ms: float = MAX_WAIT_MS, queue_max: int = QUEUE_MAX):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._q: "queue.Queue[Optional[tuple[np.ndarray, Future]]]" = queue.Queue(queue_max)
+        self._lock = threading.Lock()
+        self.batch_sizes: Counter = Counter()
+        self.rejected = 0
+        self._threads = [threading.Thread(target=self._worker, name=f"stt-{i}", daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, audio: np.ndarray) -> Future:
+        """Queue one utterance; raises queue.Full when the server is saturated."""
+        fut = Future()
+        fut.enqueued_at = time.monotonic()
+        try:
+            self._q.put_nowait((audio, fut))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise
+        return fut
+
+    def depth(self) -> int:
+        return self._q.qsize()
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                # take whatever is already queued, then wait briefly for stragglers
+                item = self._q.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                self._q.put(None)          # shutdown marker is for everyone
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self):
+        while True:
+            first = self._q.get()
+            if first is None:
+                self._q.put(None)
+                return
+            batch = self._collect(first)
+            started = time.monotonic()
+            for _, fut in batch:
+                fut.started_at = started
+            try:
+                texts = self.engine.transcribe_many([a for a, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+            else:
+                finished = time.monotonic()
+                for (_, fut), text in zip(batch, texts):
+                    fut.finished_at = finished
+                    fut.set_result(text)
+            with self._lock:
+                self.batch_sizes[len(batch)] += 1
+
+    def close(self):
+        self._q.put(None)
+        for t in self._threads:
+            t.join(timeout=5)
+
+    def stats(self) -> dict:
+        with self._lock:
+            batches = sum(self.batch_sizes.values())
+            return {
+                "queue_depth": self.depth(),
+                "rejected": self.rejected,
+                "batches": batches,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "avg_batch": sum(k * v for k, v in self.batch_sizes.items()) / batches if batches else 0.0,
+            }
+
+
+class AssistantService:
+    """Everything behind the HTTP handler: STT batcher, routing and per-client bookkeeping."""
+
+    def __init__(self, engine=None, workers: int = WORKERS, max_batch: int = MAX_BATCH,
+                 max_wait_ms: float = MAX_WAIT_MS, queue_max: int = QUEUE_MAX,
+                 model: str = "llama3:latest", correct=None, respond_stream=None):
+        if engine is None:
+            from stt_faster_whisper import get_engine
+            engine = get_engine(num_workers=workers)
+        if correct is None:
+            from stt_postprocess import correct_domain_text as correct
+        if respond_stream is None:
+            from router import get_response_stream as respond_stream
+        self.engine = engine
+        self.correct = correct
+        self.respond_stream = respond_stream
+        self.model = model
+        self.stt = SttBatcher(engine, workers, max_batch, max_wait_ms, queue_max)
+
+        self._lock = threading.Lock()
+        self._busy: set[str] = set()
+        self._lat: dict[str, dict[str, deque]] = defaultdict(lambda: defaultdict(lambda: deque(maxlen=HISTORY)))
+        self._counts: dict[str, Counter] = defaultdict(Counter)
+
+    def begin(self, client: str) -> bool:
+        """One request per client at a time (a satellite asks, then listens)."""
+        with self._lock:
+            if client in self._busy:
+                self._counts[client]["busy"] += 1
+                return False
+            self._busy.add(client)
+            return True
+
+    def end(self, client: str):
+        with self._lock:
+            self._busy.discard(client)
+
+    def count(self, client: str, what: str):
+        with self._lock:
+            self._counts[client][what] += 1
+
+    def record(self, client: str, timings: dict):
+        with self._lock:
+            self._counts[client]["ok"] += 1
+            for k, v in timings.items():
+                self._lat[client][k].append(v)
+
+    def answer(self, client: str, fut: Future, cancel: threading.Event) -> Iterator[dict]:
+        """Wait for the transcript, then stream the reply. Yields NDJSON events."""
+        with tracer.turn() as turn:
+            turn.note(client=client)
+            raw = fut.result()
+            turn.add_span("stt_queue", fut.started_at - fut.enqueued_at)
+            turn.add_span("stt", fut.finished_at - fut.started_at)
+            with turn.stage("postprocess"):
+                text = self.correct(raw)
+            turn.note(raw=raw, fixed=text)
+            yield {"type": "transcript", "raw": raw, "text": text}
+            if not text.strip():
+                return
+            with turn.stage("route"):
+                for seg in self.respond_stream(text, ollama_model=self.model, cancel=cancel, client=client):
+                    if cancel.is_set():
+                        return
+                    yield {"type": "segment", "text": seg}
+
+    def stats(self) -> dict:
+        with self._lock:
+            clients = {}
+            for client in sorted(set(self._lat) | set(self._counts)):
+                clients[client] = {
+                    **dict(self._counts[client]),
+                    **{k: summarize(list(v)) for k, v in self._lat[client].items()},
+                }
+        engine_stats = self.engine.stats() if hasattr(self.engine, "stats") else {}
+        return {"clients": clients, "stt": {**self.stt.stats(), "engine": engine_stats}}
+
+    def close(self):
+        self.stt.close()
+
+
+def decode_upload(body: bytes, fmt: str, sr: int) -> np.ndarray:
+    """Request body -> float32 mono at SAMPLE_RATE."""
+    if fmt == "pcm16":
+        audio = np.frombuffer(body[:len(body) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+    elif fmt == "f32":
+        audio = np.frombuffer(body[:len(body) // 4 * 4], dtype="<f4").astype(np.float32)
+    elif fmt == "file":
+        from faster_whisper.audio import decode_audio
+        return decode_audio(io.BytesIO(body), sampling_rate=SAMPLE_RATE)
+    else:
+        raise ValueError(f"unknown format {fmt!r}")
+    if sr != SAMPLE_RATE:
+        audio = resample_poly(audio, SAMPLE_RATE, sr).astype(np.float32)
+    return audio
+
+
+class AssistantHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"      # chunked replies, so each NDJSON line arrives when written
+    service: AssistantService = None   # set by make_server()
+
+    def _body_chunks(self) -> Iterator[bytes]:
+        """Request body as it arrives (chunked transfer or Content-Length)."""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass           # trailers
+                    return
+                data = self.rfile.read(size)
+                self.rfile.readline()
+                yield data
+        else:
+            left = int(self.headers.get("Content-Length") or 0)
+            while left > 0:
+                data = self.rfile.read(min(left, 65536))
+                if not data:
+                    return
+                left -= len(data)
+                yield data
+
+    def _send_json(self, body: dict, status: int = 200, headers: Optional[dict] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/v1/stats":
+            self._send_json(self.service.stats())
+        elif path == "/healthz":
+            self._send_json({"ok": True, "queue_depth": self.service.stt.depth()})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/v1/ask":
+            self.close_connection = True
+            self._send_json({"error": "not found"}, 404)
+            return
+        qs = {k: v[0] for k, v in parse_qs(url.query).items()}
+        client = qs.get("client") or self.client_address[0]
+        fmt = qs.get("format", "pcm16")
+        try:
+            sr = int(qs.get("sr", SAMPLE_RATE))
+        except ValueError:
+            sr = 0
+        if fmt not in FORMATS or not SR_RANGE[0] <= sr <= SR_RANGE[1]:
+            # body left unread, so this connection can't be reused
+            self.close_connection = True
+            self._send_json({"error": f"format must be one of {', '.join(FORMATS)} and sr an integer "
+                                      f"in {SR_RANGE[0]}..{SR_RANGE[1]}"}, 400)
+            return
+        svc = self.service
+
+        if not svc.begin(client):
+            self.close_connection = True
+            self._send_json({"error": "request already in flight for this client"}, 429)
+            return
+        try:
+            self._ask(svc, client, fmt, sr)
+        finally:
+            svc.end(client)
+
+    def _ask(self, svc: AssistantService, client: str, fmt: str, sr: int):
+        t_first = None
+        body = bytearray()
+        limit = int(MAX_UPLOAD_S * sr * (2 if fmt == "pcm16" else 4)) if fmt != "file" else 64 << 20
+        for chunk in self._body_chunks():
+            if t_first is None:
+                t_first = time.monotonic()
+            body += chunk
+            if len(body) > limit:
+                self.close_connection = True
+                self._send_json({"error": f"utterance longer than {MAX_UPLOAD_S:.0f}s"}, 413)
+                return
+        t_uploaded = time.monotonic()
+        try:
+            audio = decode_upload(bytes(body), fmt, sr)
+        except Exception as e:
+            self._send_json({"error": f"bad audio: {e}"}, 400)
+            return
+
+        try:
+            fut = svc.stt.submit(audio)
+        except queue.Full:
+            svc.count(client, "rejected")
+            self._send_json({"error": "busy"}, 503, {"Retry-After": "1"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        cancel = threading.Event()
+        timings = {"upload_s": t_uploaded - (t_first or t_uploaded)}
+        try:
+            for event in svc.answer(client, fut, cancel):
+                now = time.monotonic()
+                if event["type"] == "transcript":
+                    timings["stt_queue_s"] = fut.started_at - fut.enqueued_at
+                    timings["stt_s"] = fut.finished_at - fut.started_at
+                    timings["transcript_s"] = now - t_uploaded
+                elif "first_segment_s" not in timings:
+                    timings["first_segment_s"] = now - t_uploaded
+                self._write_event(event)
+            timings["total_s"] = time.monotonic() - t_uploaded
+            self._write_event({"type": "done", "timings": {k: round(v, 4) for k, v in timings.items()}})
+            self.wfile.write(b"0\r\n\r\n")
+            svc.record(client, timings)
+        except (BrokenPipeError, ConnectionResetError):
+            cancel.set()                       # satellite hung up (barge-in): stop the LLM
+            svc.count(client, "disconnected")
+            self.close_connection = True
+        except Exception as e:
+            svc.count(client, "failed")
+            self.close_connection = True
+            try:
+                self._write_event({"type": "error", "error": f"{type(e).__name__}: {e}"})
+                self.wfile.write(b"0\r\n\r\n")
+            except OSError:
+                pass
+
+    def _write_event(self, event: dict):
+        line = json.dumps(event, ensure_ascii=False).encode() + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(service: AssistantService, host: str = "0.0.0.0", port: int = 8765) -> ThreadingHTTPServer:
+    handler = type("Handler", (AssistantHandler,), {"service": service})
+    srv = ThreadingHTTPServer((host, port), handler)
+    srv.daemon_threads = True
+    return srv
+
+
+def start_server(service: AssistantService, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Serve on a background thread (tests, load generator self-runs)."""
+    srv = make_server(service, host, port)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Shared STT/LLM backend for satellite devices")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=WORKERS, help="parallel decodes on the shared model")
+    ap.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    ap.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    ap.add_argument("--queue", type=int, default=QUEUE_MAX, help="utterances waiting before 503")
+    ap.add_argument("--model", default="llama3:latest")
+    args = ap.parse_args(argv)
+
+    from stt_faster_whisper import preload
+    from ollama_client import prewarm
+    from router import SYSTEM_PROMPT
+    prewarm(args.model, system=SYSTEM_PROMPT)
+    engine = preload(num_workers=args.workers)
+
+    svc = AssistantService(engine, args.workers, args.max_batch, args.max_wait_ms, args.queue, model=args.model)
+    srv = make_server(svc, args.host, args.port)
+    print(f"[SERVER] Listening on {args.host}:{args.port} (workers={args.workers}, max batch={args.max_batch})")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    srv.server_close()
+    svc.close()
+    print(json.dumps(svc.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
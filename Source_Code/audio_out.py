@@ -0,0 +1,427 @@
+"""
+Long-lived audio output engine.
+
+One sd.OutputStream is opened at start-up and kept open; everything the
+assistant plays (TTS replies, Audio/*.ogg clips, raw PCM) is submitted to it
+as a job instead of opening the device per utterance.
+
+- Queued jobs play one after another, highest priority first (FIFO within
+  a priority). interrupt=True fades out a lower-priority job that is playing.
+- mix=True jobs start at once on top of whatever is playing.
+- While a duck=True job is audible every other job is turned down to
+  DUCK_GAIN (e.g. speech over a clip), with short gain ramps, no clicks.
+- cancel() fades jobs out within one ramp (~10 ms) and drops queued ones.
+- A worker thread prepares (synthesizes / decodes / resamples) the next
+  queued jobs while the current one plays; the stream callback only mixes.
+
+    python audio_out.py ../Audio/asar.ogg --say "Waktu asar dah masuk."
+"""
+import os
+import time
+import heapq
+import argparse
+import itertools
+import threading
+from math import gcd
+from typing import Callable, Iterable, Optional, Union
+
+import numpy as np
+from scipy.signal import resample_poly
+
+BLOCK_MS = 20
+RAMP_S = 0.01              # fade in/out and duck ramps
+DUCK_GAIN = 0.25           # other jobs while a duck=True job plays
+PREFETCH = 2               # queued jobs prepared ahead of playback
+
+# Priorities (higher plays first)
+BACKGROUND = 0
+SPEECH = 10
+ALERT = 20
+
+Source = Union[str, np.ndarray]
+
+
+class Job:
+    """One thing to play. wait() blocks until it finished or was cancelled."""
+
+    def __init__(self, kind: str, source: Source, sr: Optional[int], priority: int, channel: str,
+                 mix: bool, duck: bool, volume: float, seq: int):
+        self.kind = kind              # "text" | "file" | "pcm"
+        self.source = source
+        self.src_sr = sr
+        self.priority = priority
+        self.channel = channel
+        self.mix = mix
+        self.duck = duck
+        self.volume = volume
+        self.seq = seq
+
+        self.audio: Optional[np.ndarray] = None   # prepared, at the engine rate
+        self.error: Optional[BaseException] = None
+        self.pos = 0
+        self.gain = 0.0
+        self.cancelled = False
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def __lt__(self, other: "Job") -> bool:       # heap order
+        return (-self.priority, self.seq) < (-other.priority, other.seq)
+
+    def __repr__(self):
+        label = self.source if isinstance(self.source, str) else f"{len(self.source)} samples"
+        return f"Job({self.kind}, {label[:40]!r}, p={self.priority}, {self.channel})"
+
+
+class AudioOutput:
+    """
+    synthesize(text) -> (float32 audio, sr); defaults to the TTS phrase cache.
+    stream=False skips opening the device; call pull(frames) yourself (tests,
+    offline rendering).
+    """
+
+    def __init__(self, device=None, sr: Optional[int] = None, block_ms: int = BLOCK_MS,
+                 synthesize: Optional[Callable[[str], tuple[np.ndarray, int]]] = None,
+                 stream: bool = True):
+        self.device = device
+        self.use_stream = stream
+        if sr is None:
+            if stream:
+                import sounddevice as sd
+                sr = int(sd.query_devices(device, "output")["default_samplerate"])
+            else:
+                sr = 48000
+        self.sr = sr
+        self.block = sr * block_ms // 1000
+        self._synthesize = synthesize
+
+        self._cv = threading.Condition()
+        self._queue: list[Job] = []          # heap of waiting jobs
+        self._main: Optional[Job] = None     # queued job currently playing
+        self._overlays: list[Job] = []       # mix=True jobs playing
+        self._seq = itertools.count()
+        self._closed = False
+        self._stream = None
+        self._stats = {"played": 0, "cancelled": 0, "failed": 0, "starved_blocks": 0,
+                       "start_s_sum": 0.0, "prepare_s_sum": 0.0, "prepared": 0}
+
+        self._worker = threading.Thread(target=self._prepare_loop, name="audio-prepare", daemon=True)
+        self._worker.start()
+
+    # ----------------------------
+    # Lifecycle
+    # ----------------------------
+    def start(self) -> "AudioOutput":
+        if self.use_stream and self._stream is None:
+            import sounddevice as sd
+            self._stream = sd.OutputStream(device=self.device, samplerate=self.sr, channels=1,
+                                           dtype="float32", blocksize=self.block, latency="low",
+                                           callback=self._callback)
+            self._stream.start()
+        return self
+
+    def close(self):
+        self.cancel()
+        with self._cv:
+            self._closed = True
+            self._cv.notify_all()
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        self._worker.join(timeout=2)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ----------------------------
+    # Submitting
+    # ----------------------------
+    def submit(self, kind: str, source: Source, sr: Optional[int] = None, priority: int = SPEECH,
+               channel: str = "speech", mix: bool = False, duck: bool = False,
+               interrupt: bool = False, volume: float = 1.0) -> Job:
+        job = Job(kind, source, sr, priority, channel, mix, duck, volume, next(self._seq))
+        if kind == "pcm":
+            job.audio = self._to_engine_rate(np.asarray(source, dtype=np.float32), sr or self.sr)
+        with self._cv:
+            if mix:
+                self._overlays.append(job)
+            else:
+                heapq.heappush(self._queue, job)
+                if interrupt and self._main is not None and self._main.priority < priority:
+                    self._main.cancelled = True
+            self._cv.notify_all()
+        return job
+
+    def say(self, text: str, **kw) -> Job:
+        return self.submit("text", text, **kw)
+
+    def play_file(self, path: str, **kw) -> Job:
+        return self.submit("file", path, **kw)
+
+    def play_pcm(self, audio: np.ndarray, sr: int, **kw) -> Job:
+        return self.submit("pcm", audio, sr=sr, **kw)
+
+    def cancel(self, channel: Optional[str] = None, below: Optional[int] = None):
+        """Fade out playing jobs and drop queued ones (optionally only one channel / priority < below)."""
+        def hit(j: Job) -> bool:
+            return (channel is None or j.channel == channel) and (below is None or j.priority < below)
+
+        with self._cv:
+            keep = []
+            for j in self._queue:
+                if hit(j):
+                    self._finish(j, cancelled=True)
+                else:
+                    keep.append(j)
+            heapq.heapify(keep)
+            self._queue = keep
+            for j in [self._main, *self._overlays]:
+                if j is not None and hit(j):
+                    j.cancelled = True
+            self._cv.notify_all()
+
+    def busy(self) -> bool:
+        with self._cv:
+            return bool(self._queue or self._main or self._overlays)
+
+    def wait_idle(self, channel: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """Block until nothing (on channel) is queued or playing."""
+        def idle():
+            jobs = [*self._queue, *self._overlays] + ([self._main] if self._main else [])
+            return not any(channel is None or j.channel == channel for j in jobs)
+
+        with self._cv:
+            return self._cv.wait_for(idle, timeout)
+
+    def channel(self, name: str = "speech", priority: int = SPEECH, duck: bool = False) -> "Channel":
+        return Channel(self, name, priority, duck)
+
+    # ----------------------------
+    # Preparing (worker thread)
+    # ----------------------------
+    def _next_unprepared(self) -> Optional[Job]:
+        for j in self._overlays:
+            if j.audio is None and j.error is None:
+                return j
+        for j in heapq.nsmallest(PREFETCH, self._queue):
+            if j.audio is None and j.error is None:
+                return j
+        return None
+
+    def _prepare_loop(self):
+        while True:
+            with self._cv:
+                self._cv.wait_for(lambda: self._closed or self._next_unprepared() is not None)
+                if self._closed:
+                    return
+                job = self._next_unprepared()
+            t0 = time.monotonic()
+            audio, error = None, None
+            try:
+                audio = self._prepare(job)
+            except Exception as e:
+                error = e
+                print(f"[AUDIO] Could not prepare {job!r}: {type(e).__name__}: {e}")
+            with self._cv:
+                job.audio, job.error = audio, error
+                self._stats["prepare_s_sum"] += time.monotonic() - t0
+                self._stats["prepared"] += 1
+                if error is not None:
+                    self._drop(job)
+                self._cv.notify_all()
+
+    def _prepare(self, job: Job) -> np.ndarray:
+        if job.kind == "text":
+            if self._synthesize is None:
+                from tts_cache import get_phrase_cache
+                cache = get_phrase_cache()
+                self._synthesize = lambda text: (cache.assemble(text), cache.sr)
+            audio, sr = self._synthesize(job.source)
+            return self._to_engine_rate(audio, sr)
+        if job.kind == "file":
+            from faster_whisper.audio import decode_audio
+            return decode_audio(job.source, sampling_rate=self.sr).astype(np.float32, copy=False)
+        raise ValueError(f"unknown job kind {job.kind!r}")
+
+    def _to_engine_rate(self, audio: np.ndarray, sr: int) -> np.ndarray:
+        audio = np.asarray(audio, dtype=np.float32)
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1)
+        if sr != self.sr:
+            g = gcd(int(sr), self.sr)
+            audio = resample_poly(audio, self.sr // g, int(sr) // g).astype(np.float32)
+        return audio
+
+    def _drop(self, job: Job):
+        """Remove a failed job wherever it is (lock held)."""
+        if job in self._overlays:
+            self._overlays.remove(job)
+        elif job in self._queue:
+            self._queue.remove(job)
+            heapq.heapify(self._queue)
+        self._stats["failed"] += 1
+        job._done.set()
+
+    # ----------------------------
+    # Mixing (stream callback)
+    # ----------------------------
+    def _callback(self, outdata, frames, time_info, status):
+        outdata[:, 0] = self.pull(frames)
+
+    def pull(self, frames: int) -> np.ndarray:
+        """Mix the next `frames` samples of everything that is playing."""
+        out = np.zeros(frames, dtype=np.float32)
+        with self._cv:
+            if self._main is None and self._queue:
+                head = self._queue[0]
+                if head.audio is not None:
+                    self._main = heapq.heappop(self._queue)
+                else:
+                    self._stats["starved_blocks"] += 1     # next job still being prepared
+
+            voices = [j for j in [self._main, *self._overlays] if j is not None and j.audio is not None]
+            ducking = any(j.duck and not j.cancelled for j in voices)
+            step = frames / (RAMP_S * self.sr)
+            ramp = np.arange(1, frames + 1, dtype=np.float32) / frames
+            finished = []
+            for j in voices:
+                if j.started_at is None:
+                    j.started_at = time.monotonic()
+                if j.cancelled:
+                    target = 0.0
+                elif ducking and not j.duck:
+                    target = DUCK_GAIN * j.volume
+                else:
+                    target = j.volume
+                delta = float(np.clip(target - j.gain, -step, step))
+                gains = j.gain + delta * ramp
+                j.gain += delta
+
+                chunk = j.audio[j.pos:j.pos + frames]
+                out[:len(chunk)] += chunk * gains[:len(chunk)]
+                j.pos += frames
+                if j.pos >= len(j.audio) or (j.cancelled and j.gain <= 0.0):
+                    finished.append(j)
+
+            for j in finished:
+                if j is self._main:
+                    self._main = None
+                else:
+                    self._overlays.remove(j)
+                self._finish(j, cancelled=j.cancelled)
+            if finished:
+                self._cv.notify_all()
+        np.clip(out, -1.0, 1.0, out=out)
+        return out
+
+    def _finish(self, job: Job, cancelled: bool):
+        job.cancelled = cancelled
+        if cancelled:
+            self._stats["cancelled"] += 1
+        else:
+            self._stats["played"] += 1
+            if job.started_at is not None:
+                self._stats["start_s_sum"] += job.started_at - job.submitted_at
+        job._done.set()
+
+    # ----------------------------
+    def stats(self) -> dict:
+        with self._cv:
+            st = dict(self._stats)
+            played, prepared = st.pop("start_s_sum"), st.pop("prepare_s_sum")
+            st["avg_start_s"] = played / st["played"] if st["played"] else 0.0
+            st["avg_prepare_s"] = prepared / st["prepared"] if st["prepared"] else 0.0
+            st["queued"] = len(self._queue)
+            return st
+
+
+class Channel:
+    """
+    SpeechQueue-compatible view of one channel of an AudioOutput: put()
+    queues without blocking, cancel() only stops this channel's jobs.
+    """
+
+    def __init__(self, out: AudioOutput, name: str, priority: int = SPEECH, duck: bool = False):
+        self.out = out
+        self.name = name
+        self.priority = priority
+        self.duck = duck
+        self.cancelled = threading.Event()
+
+    def put(self, text: str) -> Optional[Job]:
+        if text and not self.cancelled.is_set():
+            return self.out.say(text, priority=self.priority, channel=self.name, duck=self.duck)
+        return None
+
+    def speak_all(self, segments: Iterable[str]):
+        for seg in segments:
+            if self.cancelled.is_set():
+                break
+            self.put(seg)
+
+    def cancel(self):
+        self.cancelled.set()
+        self.out.cancel(channel=self.name)
+
+    def reset(self):
+        self.cancelled.clear()
+
+    def wait(self):
+        self.out.wait_idle(channel=self.name)
+
+    def close(self):
+        pass
+
+
+# ----------------------------
+# Shared engine
+# ----------------------------
+_output: Optional[AudioOutput] = None
+_output_lock = threading.Lock()
+
+def get_output(device=None) -> AudioOutput:
+    """The process-wide output engine (opened on first use, device chosen then)."""
+    global _output
+    with _output_lock:
+        if _output is None:
+            _output = AudioOutput(device=device).start()
+        return _output
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Play clips and TTS through one persistent output stream")
+    ap.add_argument("files", nargs="*", help="audio files (e.g. ../Audio/*.ogg), queued in order")
+    ap.add_argument("--say", action="append", default=[], help="speak this over the first file (ducked)")
+    ap.add_argument("--device", type=int, default=None, help="output device index")
+    args = ap.parse_args(argv)
+
+    with AudioOutput(device=args.device) as out:
+        print(f"[AUDIO] Output stream open at {out.sr} Hz")
+        for p in args.files:
+            print(f"[AUDIO] Queued {os.path.basename(p)}")
+            out.play_file(p, priority=BACKGROUND, channel="clips")
+        if args.files and args.say:
+            time.sleep(0.5)     # let the clip start, then talk over it
+        for text in args.say:
+            out.say(text, mix=bool(args.files), duck=True)
+        try:
+            out.wait_idle()
+        except KeyboardInterrupt:
+            out.cancel()
+        print(f"[AUDIO] {out.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,187 @@
+"""
+Batch offline transcription of a directory of recordings.
+
+    python batch_transcribe.py ../Audio
+    python batch_transcribe.py /logs/utterances --workers 4 --model small
+    python batch_transcribe.py /logs/long_calls --workers 1 --batch-size 8
+
+Writes <name>.json/.srt/.tsv/.txt/.vtt next to each file (same layout as the
+samples in Audio/) and skips files whose outputs are newer than the audio.
+
+--workers N   N processes, each with its own model and cores/N CPU threads
+--batch-size  use faster-whisper's batched pipeline inside each process
+              (helps long recordings; short utterances gain more from --workers)
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+AUDIO_EXTS = (".ogg", ".wav", ".mp3", ".m4a", ".flac", ".opus", ".webm")
+OUTPUT_EXTS = ("json", "srt", "tsv", "txt", "vtt")
+
+
+# ----------------------------
+# Output writers (openai-whisper formats)
+# ----------------------------
+def _ts(seconds: float, always_hours: bool, sep: str) -> str:
+    ms = int(round(seconds * 1000))
+    hh, ms = divmod(ms, 3_600_000)
+    mm, ms = divmod(ms, 60_000)
+    ss, ms = divmod(ms, 1000)
+    hours = f"{hh:02d}:" if always_hours or hh else ""
+    return f"{hours}{mm:02d}:{ss:02d}{sep}{ms:03d}"
+
+def write_outputs(base: str, result: dict):
+    segs = result["segments"]
+
+    with open(base + ".txt", "w", encoding="utf-8") as f:
+        for s in segs:
+            f.write(s["text"].strip() + "\n")
+
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False)
+
+    with open(base + ".tsv", "w", encoding="utf-8") as f:
+        f.write("start\tend\ttext\n")
+        for s in segs:
+            text = s["text"].strip().replace("\t", " ")
+            f.write(f"{int(round(s['start'] * 1000))}\t{int(round(s['end'] * 1000))}\t{text}\n")
+
+    with open(base + ".srt", "w", encoding="utf-8") as f:
+        for i, s in enumerate(segs, start=1):
+            f.write(f"{i}\n{_ts(s['start'], True, ',')} --> {_ts(s['end'], True, ',')}\n{s['text'].strip()}\n\n")
+
+    with open(base + ".vtt", "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n\n")
+        for s in segs:
+            f.write(f"{_ts(s['start'], False, '.')} --> {_ts(s['end'], False, '.')}\n{s['text'].strip()}\n\n")
+
+
+def _to_result(segments, info) -> dict:
+    segs = [{
+        "id": s.id,
+        "seek": s.seek,
+        "start": s.start,
+        "end": s.end,
+        "text": s.text,
+        "tokens": list(s.tokens),
+        "temperature": s.temperature,
+        "avg_logprob": s.avg_logprob,
+        "compression_ratio": s.compression_ratio,
+        "no_speech_prob": s.no_speech_prob,
+    } for s in segments]
+    return {"text": "".join(s["text"] for s in segs), "segments": segs, "language": info.language}
+
+
+# ----------------------------
+# Work discovery
+# ----------------------------
+def is_up_to_date(path: str) -> bool:
+    base, _ = os.path.splitext(path)
+    src_mtime = os.path.getmtime(path)
+    for ext in OUTPUT_EXTS:
+        out = f"{base}.{ext}"
+        if not os.path.exists(out) or os.path.getmtime(out) < src_mtime:
+            return False
+    return True
+
+def find_audio(root: str, recursive: bool = True) -> list[str]:
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            if name.lower().endswith(AUDIO_EXTS):
+                found.append(os.path.join(dirpath, name))
+        if not recursive:
+            break
+    return sorted(found)
+
+
+# ----------------------------
+# Worker process
+# ----------------------------
+_engine = None
+_options = {}
+
+def _init_worker(model_size: str, compute_type: str, cpu_threads: int, options: dict):
+    global _engine, _options
+    from stt_faster_whisper import SttEngine
+    _engine = SttEngine(model_size, compute_type=compute_type, cpu_threads=cpu_threads, num_workers=1)
+    _engine.load()
+    _options = options
+
+def _transcribe_one(path: str) -> tuple[str, float, float]:
+    t0 = time.perf_counter()
+    segments, info = _engine.transcribe_segments(path, **_options)
+    write_outputs(os.path.splitext(path)[0], _to_result(segments, info))
+    return path, time.perf_counter() - t0, info.duration
+
+
+def run_batch(paths: list[str], workers: int, model_size: str, compute_type: str,
+              options: dict) -> dict:
+    cores = os.cpu_count() or 1
+    threads = max(cores // max(workers, 1), 1)
+    init_args = (model_size, compute_type, threads, options)
+
+    done, failed, audio_s = 0, 0, 0.0
+    t0 = time.perf_counter()
+
+    if workers <= 1:
+        _init_worker(*init_args)
+        for p in paths:
+            try:
+                _, dt, dur = _transcribe_one(p)
+                done += 1
+                audio_s += dur
+                print(f"[BATCH] {p}  {dt:.2f}s")
+            except Exception as e:
+                failed += 1
+                print(f"[BATCH] FAILED {p}: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as ex:
+            futs = {ex.submit(_transcribe_one, p): p for p in paths}
+            for fut in as_completed(futs):
+                p = futs[fut]
+                try:
+                    _, dt, dur = fut.result()
+                    done += 1
+                    audio_s += dur
+                    print(f"[BATCH] {p}  {dt:.2f}s")
+                except Exception as e:
+                    failed += 1
+                    print(f"[BATCH] FAILED {p}: {e}")
+
+    wall = time.perf_counter() - t0
+    return {"done": done, "failed": failed, "wall_s": wall, "audio_s": audio_s,
+            "rtf": wall / audio_s if audio_s else None}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Transcribe every recording in a directory")
+    ap.add_argument("root", help="directory (or single file) to transcribe")
+    ap.add_argument("--workers", type=int, default=max((os.cpu_count() or 1) // 2, 1))
+    ap.add_argument("--model", default="small")
+    ap.add_argument("--compute-type", default="int8")
+    ap.add_argument("--batch-size", type=int, default=0, help="use BatchedInferencePipeline with this batch size")
+    ap.add_argument("--no-recursive", action="store_true")
+    ap.add_argument("--force", action="store_true", help="re-transcribe even if outputs are up to date")
+    args = ap.parse_args(argv)
+
+    paths = [args.root] if os.path.isfile(args.root) else find_audio(args.root, not args.no_recursive)
+    todo = [p for p in paths if args.force or not is_up_to_date(p)]
+    print(f"[BATCH] {len(paths)} audio files, {len(paths) - len(todo)} up to date, {len(todo)} to do")
+    if not todo:
+        return 0
+
+    options = {"batch_size": args.batch_size} if args.batch_size else {}
+    summary = run_batch(todo, args.workers, args.model, args.compute_type, options)
+    rtf = f"{summary['rtf']:.3f}" if summary["rtf"] is not None else "-"
+    print(f"[BATCH] done={summary['done']} failed={summary['failed']} "
+          f"wall={summary['wall_s']:.1f}s audio={summary['audio_s']:.1f}s RTF={rtf}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
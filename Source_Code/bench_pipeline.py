@@ -0,0 +1,217 @@
+"""
+End-to-end latency benchmark: replays Audio/*.ogg through the real pipeline
+
+    resample -> transcribe_faster -> correct_domain_text -> get_response -> TTS-to-file
+
+against local fake e-Solat and Ollama servers (no internet, no real LLM).
+
+    python bench_pipeline.py --repeats 5 --esolat-latency 0.3 --ollama-latency 1.0 --out bench.json
+    python bench_pipeline.py --model base --out base.json --baseline bench.json
+    python bench_pipeline.py --cascade tiny,small --baseline bench.json
+
+Prints p50/p95/p99 per stage and end to end; --out writes the same numbers
+as JSON (plus git commit and settings) so runs can be compared later.
+"""
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import numpy as np
+
+from metrics import summarize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_AUDIO = os.path.join(HERE, "..", "Audio", "*.ogg")
+
+MIC_SR = 48000   # fixtures are decoded at a typical webcam rate, then resampled like the live path
+STAGES = ["resample", "stt", "postprocess", "route", "tts", "end_to_end"]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def setup_fakes(esolat_latency: float, ollama_latency: float, token_latency: float, cache_dir: str,
+                answer_cache: bool = True):
+    """Start both stand-in servers and point the pipeline modules at them."""
+    import fake_esolat
+    import fake_ollama
+    import prayer_tool
+    import ollama_client
+    import router
+    from prayer_cache import TimetableStore
+    from response_cache import ResponseCache
+
+    es = fake_esolat.start_server(latency=esolat_latency)
+    ol = fake_ollama.start_server(latency=ollama_latency, token_latency=token_latency)
+
+    prayer_tool.ESOLAT_URL = fake_esolat.url_for(es)
+    prayer_tool._store = TimetableStore(prayer_tool.fetch_year, path=os.path.join(cache_dir, "bench_cache.sqlite3"))
+    ollama_client.OLLAMA_HOST = fake_ollama.host_for(ol)
+    if answer_cache:
+        router._cache = ResponseCache(path=os.path.join(cache_dir, "bench_answers.sqlite3"))
+    else:
+        # size 0: every lookup misses, so repeats measure the uncached path
+        router._cache = ResponseCache(path=None, answer_max=0, llm_max=0)
+    return es, ol
+
+
+def run(paths: list[str], repeats: int, model_size: str, tts: bool, tmp: str,
+        cascade: bool = False) -> tuple[dict, list[dict], dict]:
+    from faster_whisper.audio import decode_audio
+    from resampler import StreamingResampler
+    from stt_faster_whisper import preload, preload_cascade, transcribe_faster
+    from stt_postprocess import correct_domain_text
+    from router import get_response, transcript_complete, intent_complete
+
+    engine = preload_cascade() if cascade else preload(model_size)
+    accept = lambda t: transcript_complete(correct_domain_text(t))
+    complete = lambda t: intent_complete(correct_domain_text(t))
+    stt_kwargs = {} if cascade else {"model_size": model_size}
+    if tts:
+        from tts_pyttsx3 import synthesize_to_file
+
+    fixtures = [(p, decode_audio(p, sampling_rate=MIC_SR)) for p in paths]
+    times = {s: [] for s in STAGES}
+    turns = []
+
+    for r in range(repeats):
+        for path, mic_audio in fixtures:
+            t = {}
+            t0 = time.perf_counter()
+
+            rs = StreamingResampler(MIC_SR, 16000)
+            audio = np.concatenate((rs.process(mic_audio), rs.flush()))
+            t1 = time.perf_counter(); t["resample"] = t1 - t0
+
+            raw = transcribe_faster(audio, accept=accept, complete=complete, **stt_kwargs)
+            t2 = time.perf_counter(); t["stt"] = t2 - t1
+
+            fixed = correct_domain_text(raw)
+            t3 = time.perf_counter(); t["postprocess"] = t3 - t2
+
+            reply = get_response(fixed, ollama_model="llama3:latest")
+            t4 = time.perf_counter(); t["route"] = t4 - t3
+
+            if tts:
+                synthesize_to_file(reply, os.path.join(tmp, "bench_reply.wav"))
+            t5 = time.perf_counter(); t["tts"] = t5 - t4
+            t["end_to_end"] = t5 - t0
+
+            for k, v in t.items():
+                times[k].append(v)
+            turns.append({"file": os.path.basename(path), "repeat": r, "raw": raw, "fixed": fixed,
+                          "reply": reply, **{f"{k}_ms": v * 1000 for k, v in t.items()}})
+            print(f"[BENCH] {os.path.basename(path):36s} e2e {t['end_to_end'] * 1000:8.1f} ms  | {fixed}")
+
+    return {s: summarize(v) for s, v in times.items()}, turns, engine.stats()
+
+
+def print_table(stats: dict, baseline: dict = None):
+    print()
+    print(f"{'stage':12s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'max':>9s}" + ("   Δp50     Δp95" if baseline else ""))
+    for s in STAGES:
+        st = stats.get(s, {})
+        if not st.get("n"):
+            continue
+        line = f"{s:12s} {st['p50_ms']:9.1f} {st['p95_ms']:9.1f} {st['p99_ms']:9.1f} {st['max_ms']:9.1f}"
+        base = (baseline or {}).get(s)
+        if base and base.get("n"):
+            d50 = 100 * (st["p50_ms"] - base["p50_ms"]) / max(base["p50_ms"], 1e-9)
+            d95 = 100 * (st["p95_ms"] - base["p95_ms"]) / max(base["p95_ms"], 1e-9)
+            line += f"  {d50:+6.1f}%  {d95:+6.1f}%"
+        print(line)
+    print("(ms)")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="End-to-end latency benchmark")
+    ap.add_argument("--audio", default=DEFAULT_AUDIO, help="glob of fixture recordings")
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--model", default="small")
+    ap.add_argument("--cascade", help='STT model cascade, e.g. "tiny,small" (overrides --model)')
+    ap.add_argument("--decode", choices=["adaptive", "beam"], default=None,
+                    help="STT decode mode (default: STT_DECODE, i.e. adaptive)")
+    ap.add_argument("--esolat-latency", type=float, default=0.2)
+    ap.add_argument("--ollama-latency", type=float, default=0.5, help="fake time to first token (s)")
+    ap.add_argument("--token-latency", type=float, default=0.02, help="fake time per token (s)")
+    ap.add_argument("--no-tts", action="store_true")
+    ap.add_argument("--no-answer-cache", action="store_true", help="disable router answer cache (cold path every repeat)")
+    ap.add_argument("--out", help="write JSON results here")
+    ap.add_argument("--baseline", help="previous --out JSON to diff against")
+    args = ap.parse_args(argv)
+
+    paths = sorted(glob.glob(args.audio))
+    if not paths:
+        print(f"[BENCH] No fixtures match {args.audio}")
+        return 1
+
+    import stt_faster_whisper
+    if args.decode:
+        stt_faster_whisper.DECODE_MODE = args.decode
+    if args.cascade:
+        stt_faster_whisper.CASCADE = args.cascade.split(",")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        es, ol = setup_fakes(args.esolat_latency, args.ollama_latency, args.token_latency, tmp,
+                             answer_cache=not args.no_answer_cache)
+        try:
+            stats, turns, stt = run(paths, args.repeats, args.model, not args.no_tts, tmp,
+                                    cascade=bool(args.cascade))
+        finally:
+            es.shutdown()
+            ol.shutdown()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["stages"]
+    print_table(stats, baseline)
+    for tier in stt.get("tiers", []):
+        print(f"[BENCH] STT {tier['model']}: {tier['accepted']}/{tier['attempts']} kept, "
+              f"p50 {tier['p50_ms'] or 0:.0f} ms")
+    stt = {**stt.get("final", stt), "tiers": stt.get("tiers")}
+    if stt["adaptive_calls"]:
+        print(f"[BENCH] STT fallback rate {stt['fallback_rate']:.0%} {stt['fallback_reasons']}, "
+              f"greedy pass {stt['first_pass_avg_s'] * 1000:.0f} ms avg")
+
+    if args.out:
+        result = {
+            "meta": {
+                "commit": _git_commit(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "machine": platform.machine(),
+                "python": platform.python_version(),
+                "model": args.model,
+                "cascade": args.cascade,
+                "decode": stt_faster_whisper.DECODE_MODE,
+                "repeats": args.repeats,
+                "fixtures": [os.path.basename(p) for p in paths],
+                "esolat_latency": args.esolat_latency,
+                "ollama_latency": args.ollama_latency,
+                "token_latency": args.token_latency,
+                "tts": not args.no_tts,
+                "answer_cache": not args.no_answer_cache,
+            },
+            "stages": stats,
+            "stt": stt,
+            "turns": turns,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"[BENCH] Wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
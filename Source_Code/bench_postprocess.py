@@ -0,0 +1,97 @@
+"""
+Throughput benchmark for correct_domain_text on large transcript files.
+
+    python bench_postprocess.py transcripts/*.txt
+    python bench_postprocess.py --synthetic 50000
+
+Compares the old chained str.replace + per-word extractOne implementation
+with the compiled single-pass corrector, and counts lines where they differ.
+"""
+import re
+import sys
+import time
+import random
+import argparse
+
+from rapidfuzz import process, fuzz
+
+import stt_postprocess
+from stt_postprocess import VOCAB, REPLACE, CompiledCorrector
+
+
+def legacy_correct(text: str, threshold: int = 78) -> str:
+    """The original implementation, kept here only as the benchmark baseline."""
+    t = text.lower()
+    for k, v in REPLACE.items():
+        t = t.replace(k, v)
+    t = re.sub(r"[^a-z0-9\s]", " ", t)
+    t = re.sub(r"\s+", " ", t).strip()
+    fixed = []
+    for w in t.split():
+        m = process.extractOne(w, VOCAB, scorer=fuzz.ratio)
+        fixed.append(m[0] if m and m[1] >= threshold else w)
+    return " ".join(fixed)
+
+
+def synthetic_lines(n: int, seed: int = 0) -> list[str]:
+    """STT-like lines: domain words, known mis-hearings and random filler."""
+    rng = random.Random(seed)
+    noisy = list(REPLACE) + VOCAB
+    filler = ["berapa", "lagi", "dah", "masuk", "belum", "ke", "tak", "nak", "tahu", "pukul"]
+    lines = []
+    for _ in range(n):
+        words = [rng.choice(noisy if rng.random() < 0.6 else filler) for _ in range(rng.randint(3, 9))]
+        if rng.random() < 0.2:
+            w = rng.randrange(len(words))
+            words[w] = words[w][:-1] or words[w]          # truncated word
+        lines.append(" ".join(words).capitalize() + rng.choice([".", "?", ""]))
+    return lines
+
+
+def bench(lines: list[str]):
+    n_words = sum(len(l.split()) for l in lines)
+
+    t0 = time.perf_counter()
+    old = [legacy_correct(l) for l in lines]
+    t_old = time.perf_counter() - t0
+
+    stt_postprocess._correctors.clear()
+    fresh = CompiledCorrector()
+    t0 = time.perf_counter()
+    new = [fresh(l) for l in lines]
+    t_new = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for l in lines:
+        fresh(l)
+    t_warm = time.perf_counter() - t0
+
+    diff = sum(a != b for a, b in zip(old, new))
+    print(f"{len(lines)} lines, {n_words} words")
+    print(f"  legacy chained replace + extractOne   {t_old:8.3f} s   {n_words / t_old:10.0f} words/s")
+    print(f"  compiled (cold LRU)                   {t_new:8.3f} s   {n_words / t_new:10.0f} words/s   x{t_old / t_new:.1f}")
+    print(f"  compiled (warm LRU)                   {t_warm:8.3f} s   {n_words / t_warm:10.0f} words/s   x{t_old / t_warm:.1f}")
+    print(f"  lines that differ from legacy: {diff}")
+    for a, b, l in [(a, b, l) for a, b, l in zip(old, new, lines) if a != b][:5]:
+        print(f"    {l!r}: {a!r} -> {b!r}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("files", nargs="*", help="transcript files, one utterance per line")
+    ap.add_argument("--synthetic", type=int, default=20000, help="lines to generate when no files are given")
+    args = ap.parse_args(argv)
+
+    if args.files:
+        lines = []
+        for p in args.files:
+            with open(p, encoding="utf-8", errors="ignore") as f:
+                lines.extend(l.strip() for l in f if l.strip())
+    else:
+        lines = synthetic_lines(args.synthetic)
+    bench(lines)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
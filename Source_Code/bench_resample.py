@@ -0,0 +1,65 @@
+"""
+Benchmark: one-shot resample_poly after recording vs StreamingResampler in mic-sized blocks.
+
+    python bench_resample.py --src-sr 48000 --seconds 7 --block-ms 20
+
+"after-stop" is what the user waits for once they stop talking: the whole
+resample_poly pass for the one-shot path, only flush() for the streaming path.
+"""
+import time
+import argparse
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from resampler import StreamingResampler
+
+
+def bench(src_sr: int, dst_sr: int, seconds: float, block_ms: int, repeats: int):
+    rng = np.random.default_rng(0)
+    x = (rng.standard_normal(int(src_sr * seconds)) * 0.1).astype(np.float32)
+    block = src_sr * block_ms // 1000
+
+    oneshot = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        ref = resample_poly(x, dst_sr, src_sr).astype(np.float32)
+        oneshot.append(time.perf_counter() - t0)
+
+    per_block, flush_t, total = [], [], []
+    for _ in range(repeats):
+        rs = StreamingResampler(src_sr, dst_sr)
+        out = []
+        t_start = time.perf_counter()
+        for i in range(0, len(x), block):
+            t0 = time.perf_counter()
+            out.append(rs.process(x[i:i + block]))
+            per_block.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        out.append(rs.flush())
+        flush_t.append(time.perf_counter() - t0)
+        total.append(time.perf_counter() - t_start)
+    y = np.concatenate(out)
+
+    ms = lambda v: 1000 * float(np.median(v))
+    print(f"{src_sr} -> {dst_sr} Hz, {seconds}s audio, {block_ms} ms blocks, {repeats} repeats")
+    print(f"  one-shot resample_poly     after-stop {ms(oneshot):8.2f} ms")
+    print(f"  streaming (flush only)     after-stop {ms(flush_t):8.2f} ms")
+    print(f"  streaming per block        {ms(per_block):8.3f} ms  (block budget {block_ms} ms)")
+    print(f"  streaming total CPU        {ms(total):8.2f} ms  (spread over the recording)")
+    print(f"  max |diff| vs one-shot     {np.abs(ref - y).max():.2e}  (len {len(ref)} vs {len(y)})")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--src-sr", type=int, default=48000)
+    ap.add_argument("--dst-sr", type=int, default=16000)
+    ap.add_argument("--seconds", type=float, default=7.0)
+    ap.add_argument("--block-ms", type=int, default=20)
+    ap.add_argument("--repeats", type=int, default=5)
+    args = ap.parse_args()
+    bench(args.src_sr, args.dst_sr, args.seconds, args.block_ms, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
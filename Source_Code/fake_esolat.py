@@ -0,0 +1,138 @@
+"""
+Local stand-in for the e-Solat takwimsolat API (stdlib only).
+
+    python fake_esolat.py --port 8765 --latency 0.2 --fail-rate 0.1
+    ESOLAT_URL="http://127.0.0.1:8765/index.php?r=esolatApi/takwimsolat" python main_live_mic.py
+
+Returns a deterministic, plausible timetable for any zone so the HTTP client,
+cache and benchmarks can run without touching e-solat.gov.my.
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Rough Selangor times (minutes after midnight); shifted a little per day
+BASE_MINUTES = {
+    "imsak": 5 * 60 + 50,
+    "fajr": 6 * 60,
+    "syuruk": 7 * 60 + 15,
+    "dhuha": 7 * 60 + 40,
+    "dhuhr": 13 * 60 + 15,
+    "asr": 16 * 60 + 35,
+    "maghrib": 19 * 60 + 20,
+    "isha": 20 * 60 + 35,
+}
+
+
+def fake_day(zone: str, d: date) -> dict:
+    # small seasonal drift + per-zone offset so zones differ
+    drift = (d.timetuple().tm_yday % 60) // 10 - 3
+    offset = sum(map(ord, zone)) % 3
+    day = {"date": d.strftime("%d-%b-%Y"), "day": d.strftime("%A"), "hijri": ""}
+    for key, mins in BASE_MINUTES.items():
+        m = mins + drift + offset
+        day[key] = f"{m // 60:02d}:{m % 60:02d}:00"
+    return day
+
+
+def fake_range(zone: str, start: date, end: date) -> list[dict]:
+    out = []
+    d = start
+    while d <= end:
+        out.append(fake_day(zone, d))
+        d += timedelta(days=1)
+    return out
+
+
+def period_range(period: str, today: date) -> tuple[date, date]:
+    if period == "week":
+        return today, today + timedelta(days=6)
+    if period == "month":
+        start = today.replace(day=1)
+        nxt = (start + timedelta(days=32)).replace(day=1)
+        return start, nxt - timedelta(days=1)
+    if period == "year":
+        return date(today.year, 1, 1), date(today.year, 12, 31)
+    return today, today
+
+
+class FakeESolatHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    fail_rate = 0.0
+    hits = 0
+    _lock = threading.Lock()
+
+    def _reply(self, body: dict, status: int = 200):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _handle(self, form: dict):
+        cls = type(self)
+        with cls._lock:
+            cls.hits += 1
+        if cls.latency:
+            time.sleep(cls.latency)
+        if cls.fail_rate and random.random() < cls.fail_rate:
+            self._reply({"status": "ERROR"}, status=503)
+            return
+
+        qs = parse_qs(urlparse(self.path).query)
+        zone = qs.get("zone", ["SGR01"])[0]
+        period = qs.get("period", ["today"])[0]
+        if period == "duration":
+            start = date.fromisoformat(form.get("datestart", [date.today().isoformat()])[0])
+            end = date.fromisoformat(form.get("dateend", [start.isoformat()])[0])
+        else:
+            start, end = period_range(period, date.today())
+        self._reply({"zone": zone, "status": "OK!", "prayerTime": fake_range(zone, start, end)})
+
+    def do_GET(self):
+        self._handle({})
+
+    def do_POST(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        self._handle(parse_qs(self.rfile.read(n).decode()))
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(port: int = 0, latency: float = 0.0, fail_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Start on a daemon thread. Returns the server (server.server_port has the real port)."""
+    handler = type("Handler", (FakeESolatHandler,), {"latency": latency, "fail_rate": fail_rate, "hits": 0})
+    srv = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def url_for(srv: ThreadingHTTPServer) -> str:
+    return f"http://127.0.0.1:{srv.server_port}/index.php?r=esolatApi/takwimsolat"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake e-Solat server")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds added to each response")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="fraction of 503 responses")
+    args = ap.parse_args()
+
+    srv = start_server(args.port, args.latency, args.fail_rate)
+    print(f"[FAKE] e-Solat on {url_for(srv)}  (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
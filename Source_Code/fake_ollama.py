@@ -0,0 +1,209 @@
+"""
+Local stand-in for the Ollama REST API (stdlib only).
+
+    python fake_ollama.py --port 11435 --latency 0.5 --token-latency 0.02
+    OLLAMA_HOST=http://127.0.0.1:11435 python main_live_mic.py
+
+Supports /api/generate and /api/chat, streaming (NDJSON) and non-streaming,
+with a configurable time-to-first-token and per-token delay.
+
+Optionally mimics the two costs a real Ollama hides from a single request:
+model (re)load after keep_alive runs out (--load-latency), and prompt
+evaluation, where only the part of the prompt after the longest prefix shared
+with the previous request is evaluated again (--prompt-token-latency).
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CANNED_REPLY = (
+    "Baik, ini jawapan ringkas daripada pelayan ujian. "
+    "Saya tidak menggunakan model sebenar, jadi jawapan ini sentiasa sama. "
+    "Terima kasih kerana bertanya."
+)
+
+
+DEFAULT_KEEP_ALIVE = 300.0   # Ollama's default: unload after 5 minutes idle
+
+
+def keep_alive_seconds(v) -> float:
+    """Ollama keep_alive: seconds as a number, or "30s" / "10m" / "1h"; negative = forever."""
+    if v is None:
+        return DEFAULT_KEEP_ALIVE
+    units = {"ms": 1e-3, "s": 1.0, "m": 60.0, "h": 3600.0}
+    scale = 1.0
+    v = str(v).strip()
+    for u in ("ms", "s", "m", "h"):
+        if v.endswith(u):
+            v, scale = v[:-len(u)], units[u]
+            break
+    n = float(v) * scale
+    return float("inf") if n < 0 else n
+
+
+def _prompt_text(req: dict) -> str:
+    if req.get("messages") is not None:
+        return "".join(f"<{m.get('role')}>{m.get('content', '')}" for m in req["messages"])
+    return (req.get("system") or "") + (req.get("prompt") or "")
+
+
+def _common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    latency = 0.0               # seconds before the first token
+    token_latency = 0.0         # seconds between tokens
+    load_latency = 0.0          # seconds to load the model when it isn't resident
+    prompt_token_latency = 0.0  # seconds per prompt token that isn't in the cached prefix
+    reply = CANNED_REPLY
+    hits = 0
+    loads = 0
+    _lock = threading.Lock()
+    _loaded_until: dict = {}    # model -> monotonic time it gets unloaded
+    _last_prompt: dict = {}     # model -> previous prompt text (KV-cache stand-in)
+
+    def _model_costs(self, req: dict) -> tuple[float, float, int]:
+        """(load seconds, prompt-eval seconds, prompt tokens evaluated) for this request."""
+        cls = type(self)
+        model = req.get("model", "fake")
+        prompt = _prompt_text(req)
+        now = time.monotonic()
+        with cls._lock:
+            loaded = cls._loaded_until.get(model, 0.0) > now
+            if not loaded:
+                cls.loads += 1
+                cls._last_prompt.pop(model, None)
+            cached = _common_prefix(cls._last_prompt.get(model, ""), prompt)
+            # the generated reply is in the KV cache too, so the next chat turn
+            # that repeats it as history doesn't pay for it again
+            reply = f"<assistant>{cls.reply}" if req.get("messages") else ""
+            cls._last_prompt[model] = prompt + reply
+            cls._loaded_until[model] = now + keep_alive_seconds(req.get("keep_alive"))
+        load_s = 0.0 if loaded else cls.load_latency
+        new_tokens = (len(prompt) - cached) // 4
+        return load_s, new_tokens * cls.prompt_token_latency, new_tokens
+
+    def do_POST(self):
+        cls = type(self)
+        with cls._lock:
+            cls.hits += 1
+        n = int(self.headers.get("Content-Length") or 0)
+        req = json.loads(self.rfile.read(n) or b"{}")
+        chat = self.path.startswith("/api/chat")
+        if not (chat or self.path.startswith("/api/generate")):
+            self.send_error(404)
+            return
+
+        load_s, prompt_s, prompt_tokens = self._model_costs(req)
+        time.sleep(load_s + prompt_s + cls.latency)
+
+        # empty prompt / no messages = "just load the model" (how clients pre-warm)
+        load_only = not req.get("messages") and not req.get("prompt")
+        tokens = [] if load_only else [w + " " for w in cls.reply.split(" ")]
+        final = {
+            "model": req.get("model", "fake"),
+            "done": True,
+            "done_reason": "load" if load_only else "stop",
+            "total_duration": 0,
+            "load_duration": int(load_s * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int((prompt_s + cls.latency) * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(cls.token_latency * len(tokens) * 1e9),
+            "context": [1, 2, 3],
+        }
+
+        if req.get("stream", True) is False:
+            time.sleep(cls.token_latency * len(tokens))
+            body = dict(final)
+            text = "".join(tokens).strip()
+            if chat:
+                body["message"] = {"role": "assistant", "content": text}
+            else:
+                body["response"] = text
+            self._send_json(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for tok in tokens:
+            if cls.token_latency:
+                time.sleep(cls.token_latency)
+            msg = {"model": final["model"], "done": False}
+            if chat:
+                msg["message"] = {"role": "assistant", "content": tok}
+            else:
+                msg["response"] = tok
+            self.wfile.write((json.dumps(msg) + "\n").encode())
+            self.wfile.flush()
+        last = dict(final)
+        if chat:
+            last["message"] = {"role": "assistant", "content": ""}
+        else:
+            last["response"] = ""
+        self.wfile.write((json.dumps(last) + "\n").encode())
+        self.close_connection = True
+
+    def do_GET(self):
+        if self.path.startswith("/api/tags"):
+            self._send_json({"models": [{"name": "llama3:latest"}]})
+        else:
+            self.send_error(404)
+
+    def _send_json(self, body: dict):
+        raw = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(port: int = 0, latency: float = 0.0, token_latency: float = 0.0,
+                 load_latency: float = 0.0, prompt_token_latency: float = 0.0) -> ThreadingHTTPServer:
+    """Start on a daemon thread. Returns the server (server.server_port has the real port)."""
+    handler = type("Handler", (FakeOllamaHandler,),
+                   {"latency": latency, "token_latency": token_latency, "load_latency": load_latency,
+                    "prompt_token_latency": prompt_token_latency, "hits": 0, "loads": 0,
+                    "_lock": threading.Lock(), "_loaded_until": {}, "_last_prompt": {}})
+    srv = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def host_for(srv: ThreadingHTTPServer) -> str:
+    return f"http://127.0.0.1:{srv.server_port}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake Ollama server")
+    ap.add_argument("--port", type=int, default=11435)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds before first token")
+    ap.add_argument("--token-latency", type=float, default=0.0, help="seconds per token")
+    ap.add_argument("--load-latency", type=float, default=0.0, help="seconds to (re)load the model")
+    ap.add_argument("--prompt-token-latency", type=float, default=0.0,
+                    help="seconds per prompt token outside the cached prefix")
+    args = ap.parse_args()
+
+    srv = start_server(args.port, args.latency, args.token_latency, args.load_latency, args.prompt_token_latency)
+    print(f"[FAKE] Ollama on {host_for(srv)}  (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
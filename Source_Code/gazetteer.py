@@ -0,0 +1,220 @@
+"""
+Nationwide JAKIM zone gazetteer.
+
+zones.tsv lists every e-Solat zone with its state, an approximate reference
+point and the district / town names that belong to it (~630 names; mukim
+lists are still to be added). This module
+loads it once and answers two questions for the router:
+
+    gz = get_gazetteer()
+    gz.resolve("pontian", states={"pahang"})     -> ("PHG07", ())
+    gz.index.best("kuantn")                      -> ("kuantan", 92.3)
+
+Fuzzy lookups go through a character-trigram inverted index: only names that
+share trigrams with the query are rescored with rapidfuzz, so the cost stays
+flat as the name list grows to thousands of entries.
+"""
+import os
+from collections import Counter
+from typing import Iterable, NamedTuple, Optional
+
+try:
+    from rapidfuzz import process, fuzz
+    _HAS_FUZZ = True
+except Exception:
+    _HAS_FUZZ = False
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zones.tsv")
+
+# State names as spoken -> state as written in zones.tsv
+STATE_ALIASES = {
+    "johor": "johor",
+    "kedah": "kedah",
+    "kelantan": "kelantan",
+    "melaka": "melaka",
+    "malacca": "melaka",
+    "negeri sembilan": "negeri sembilan",
+    "pahang": "pahang",
+    "perlis": "perlis",
+    "pulau pinang": "pulau pinang",
+    "penang": "pulau pinang",
+    "perak": "perak",
+    "sabah": "sabah",
+    "sarawak": "sarawak",
+    "selangor": "selangor",
+    "terengganu": "terengganu",
+    "wilayah persekutuan": "wilayah persekutuan",
+    "wilayah": "wilayah persekutuan",
+}
+
+# Place whose zone answers a question that names only the state ("isyak di johor")
+STATE_CAPITALS = {
+    "johor": "johor bahru",
+    "kedah": "alor setar",
+    "kelantan": "kota bharu",
+    "melaka": "melaka",
+    "negeri sembilan": "seremban",
+    "pahang": "kuantan",
+    "perlis": "kangar",
+    "pulau pinang": "george town",
+    "perak": "ipoh",
+    "sabah": "kota kinabalu",
+    "sarawak": "kuching",
+    "selangor": "shah alam",
+    "terengganu": "kuala terengganu",
+    "wilayah persekutuan": "kuala lumpur",
+}
+
+
+class Zone(NamedTuple):
+    code: str
+    state: str
+    lat: float
+    lon: float
+    places: tuple[str, ...]
+
+
+def _trigrams(s: str) -> set[str]:
+    s = f"  {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class TrigramIndex:
+    """
+    Inverted index trigram -> name ids. search() counts shared trigrams to pick
+    a short candidate list, then rescores only those with fuzz.ratio.
+    Ties keep the lower id, i.e. the name listed first.
+    """
+
+    def __init__(self, names: Iterable[str], candidates: int = 24):
+        self.names = list(dict.fromkeys(names))
+        self.candidates = candidates
+        self._sizes = []
+        self._postings: dict[str, list[int]] = {}
+        for i, name in enumerate(self.names):
+            grams = _trigrams(name)
+            self._sizes.append(len(grams))
+            for g in grams:
+                self._postings.setdefault(g, []).append(i)
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, query: str, limit: int = 5, threshold: float = 0.0) -> list[tuple[str, float]]:
+        grams = _trigrams(query)
+        shared = Counter()
+        for g in grams:
+            shared.update(self._postings.get(g, ()))
+        if not shared:
+            return []
+        # Dice coefficient on trigram sets as the prefilter score
+        nq = len(grams)
+        ranked = sorted(shared, key=lambda i: (-2.0 * shared[i] / (nq + self._sizes[i]), i))
+        cand = sorted(ranked[:self.candidates])
+
+        if _HAS_FUZZ:
+            scored = [(self.names[i], fuzz.ratio(query, self.names[i]), i) for i in cand]
+        else:
+            scored = [(self.names[i], 200.0 * shared[i] / (nq + self._sizes[i]), i) for i in cand]
+        scored.sort(key=lambda t: (-t[1], t[2]))
+        return [(name, float(score)) for name, score, _ in scored[:limit] if score >= threshold]
+
+    def best(self, query: str) -> tuple[Optional[str], float]:
+        hits = self.search(query, limit=1)
+        return hits[0] if hits else (None, 0.0)
+
+
+class Gazetteer:
+    def __init__(self, zones: list[Zone], gated: Iterable[str] = ()):
+        self.zones = {z.code: z for z in zones}
+        self.gated = set(gated)                       # names that need a state mention
+        self.place_zones: dict[str, list[str]] = {}   # name -> zone codes, file order
+        for z in zones:
+            for p in z.places:
+                codes = self.place_zones.setdefault(p, [])
+                if z.code not in codes:
+                    codes.append(z.code)
+        self.index = TrigramIndex(p for p in self.place_zones if p not in self.gated)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH) -> "Gazetteer":
+        zones, gated = [], []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not line.strip() or line.startswith("#"):
+                    continue
+                code, state, lat, lon, places = line.split("\t")
+                names = []
+                for p in places.split(";"):
+                    p = p.strip()
+                    if p.startswith("~"):
+                        p = p[1:]
+                        gated.append(p)
+                    if p:
+                        names.append(p)
+                zones.append(Zone(code, state, float(lat), float(lon), tuple(names)))
+        return cls(zones, gated)
+
+    def state_of(self, zone: str) -> Optional[str]:
+        z = self.zones.get(zone)
+        return z.state if z else None
+
+    def state_zone(self, state: str) -> Optional[str]:
+        """Zone of the state's capital (STATE_CAPITALS), or None."""
+        capital = STATE_CAPITALS.get(state)
+        codes = [c for c in self.place_zones.get(capital, ()) if self.zones[c].state == state]
+        return codes[0] if codes else None
+
+    def places(self) -> list[str]:
+        return list(self.place_zones)
+
+    def resolve(self, place: str, states: Iterable[str] = (),
+                prefer_state: Optional[str] = None) -> tuple[Optional[str], tuple[str, ...]]:
+        """
+        Pick the zone for a place name. Returns (zone, alternatives).
+
+        A state named in the utterance decides first; then the home state;
+        then the first zone listed. alternatives lists the other candidate
+        zones when the choice was not pinned down by a spoken state.
+        Gated names resolve only when a matching state was spoken.
+        """
+        codes = self.place_zones.get(place)
+        if not codes:
+            return None, ()
+        states = set(states)
+        if states:
+            named = [c for c in codes if self.zones[c].state in states]
+            if named:
+                return named[0], ()
+        if place in self.gated:
+            return None, ()
+        if prefer_state:
+            home = [c for c in codes if self.zones[c].state == prefer_state]
+            if home:
+                return home[0], tuple(c for c in codes if c != home[0])
+        return codes[0], tuple(codes[1:])
+
+
+_default: Optional[Gazetteer] = None
+
+
+def get_gazetteer() -> Gazetteer:
+    global _default
+    if _default is None:
+        _default = Gazetteer.load()
+    return _default
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    gz = get_gazetteer()
+    n = sum(len(z.places) for z in gz.zones.values())
+    print(f"{len(gz.zones)} zones, {n} names, {len(gz.index)} indexed for fuzzy lookup")
+    for q in sys.argv[1:] or ["kuantn", "pontian", "sungai petany", "bukit tinggi"]:
+        t0 = time.perf_counter()
+        hits = gz.index.search(q, limit=3)
+        dt = (time.perf_counter() - t0) * 1000
+        print(f"{q!r}: {[(p, round(s, 1), gz.place_zones[p]) for p, s in hits]}  ({dt:.3f} ms)")
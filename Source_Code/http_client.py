@@ -0,0 +1,229 @@
+import time
+import random
+import asyncio
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying (upstream busy / flaky gateway)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without touching the network while the breaker is open."""
+
+
+class _Call:
+    """One in-flight request that identical callers wait on (single-flight)."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class HttpClient:
+    """
+    Shared JSON HTTP client for slow upstreams like e-Solat.
+
+    - keep-alive connection pool (one requests.Session)
+    - single-flight: identical concurrent requests share one upstream call
+    - bounded retries with full-jitter exponential backoff
+    - circuit breaker: after `breaker_threshold` consecutive failures, calls
+      fail fast for `breaker_reset` seconds; then one trial call goes through
+      while the rest keep failing fast (half-open). Its success closes the
+      breaker, its failure opens it again for another `breaker_reset`
+    """
+
+    def __init__(self, timeout: float = 15, retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 8.0, breaker_threshold: int = 5,
+                 breaker_reset: float = 30.0, pool_size: int = 4):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._inflight: dict[tuple, _Call] = {}
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._trial = False          # half-open: the one trial call is in flight
+        self._stats = {
+            "calls": 0,          # upstream attempts
+            "ok": 0,
+            "failures": 0,
+            "retries": 0,
+            "deduped": 0,        # callers served by someone else's in-flight call
+            "short_circuited": 0,
+            "latency_total_s": 0.0,
+            "latency_max_s": 0.0,
+        }
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def get_json(self, url: str, params: Optional[dict] = None) -> dict:
+        return self.request_json("GET", url, params=params)
+
+    def post_json(self, url: str, params: Optional[dict] = None, data: Optional[dict] = None) -> dict:
+        return self.request_json("POST", url, params=params, data=data)
+
+    def request_json(self, method: str, url: str, params: Optional[dict] = None,
+                     data: Optional[dict] = None) -> dict:
+        key = (method, url, _freeze(params), _freeze(data))
+
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._inflight[key] = call
+            else:
+                self._stats["deduped"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._request_with_retry(method, url, params, data)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["breaker_open"] = time.monotonic() < self._open_until
+            s["breaker_trial"] = self._trial
+        s["latency_avg_s"] = s["latency_total_s"] / s["calls"] if s["calls"] else 0.0
+        return s
+
+    def close(self):
+        self.session.close()
+
+    # ----------------------------
+    # Internals
+    # ----------------------------
+    def _request_with_retry(self, method, url, params, data) -> dict:
+        attempt = 0
+        while True:
+            trial = self._check_breaker()
+            try:
+                result = self._request_once(method, url, params, data)
+            except requests.exceptions.RequestException as e:
+                self._record(ok=False, trial=trial)
+                if attempt >= self.retries or not _retryable(e):
+                    raise
+            except BaseException:
+                self._record(ok=False, trial=trial)
+                raise
+            else:
+                self._record(ok=True, trial=trial)
+                return result
+            attempt += 1
+            with self._lock:
+                self._stats["retries"] += 1
+            cap = min(self.max_backoff, self.backoff * (2 ** attempt))
+            time.sleep(random.uniform(0, cap))
+
+    def _request_once(self, method, url, params, data) -> dict:
+        t0 = time.perf_counter()
+        try:
+            r = self.session.request(method, url, params=params, data=data, timeout=self.timeout)
+            r.raise_for_status()
+            return r.json()
+        finally:
+            dt = time.perf_counter() - t0
+            with self._lock:
+                self._stats["calls"] += 1
+                self._stats["latency_total_s"] += dt
+                self._stats["latency_max_s"] = max(self._stats["latency_max_s"], dt)
+
+    def _check_breaker(self) -> bool:
+        """Raise while open; True if this caller is the half-open trial call."""
+        with self._lock:
+            if not self._open_until:
+                return False
+            if time.monotonic() >= self._open_until and not self._trial:
+                self._trial = True
+                return True
+            self._stats["short_circuited"] += 1
+            raise CircuitOpenError("circuit open: upstream failing, try again later")
+
+    def _record(self, ok: bool, trial: bool = False):
+        with self._lock:
+            if trial:
+                self._trial = False
+            if ok:
+                self._stats["ok"] += 1
+                self._consecutive_failures = 0
+                self._open_until = 0.0
+                return
+            self._stats["failures"] += 1
+            self._consecutive_failures += 1
+            if trial or self._consecutive_failures >= self.breaker_threshold:
+                # (re)open; after breaker_reset one trial call goes through
+                self._open_until = time.monotonic() + self.breaker_reset
+
+
+class AsyncHttpClient:
+    """
+    asyncio front end over HttpClient.
+
+    Identical concurrent awaits share one future; the blocking request runs
+    in the default executor so the event loop never stalls on e-Solat.
+    """
+
+    def __init__(self, client: Optional[HttpClient] = None):
+        self.client = client or HttpClient()
+        self._inflight: dict[tuple, asyncio.Future] = {}
+
+    async def get_json(self, url: str, params: Optional[dict] = None) -> dict:
+        return await self.request_json("GET", url, params=params)
+
+    async def post_json(self, url: str, params: Optional[dict] = None, data: Optional[dict] = None) -> dict:
+        return await self.request_json("POST", url, params=params, data=data)
+
+    async def request_json(self, method: str, url: str, params: Optional[dict] = None,
+                           data: Optional[dict] = None) -> dict:
+        key = (method, url, _freeze(params), _freeze(data))
+        fut = self._inflight.get(key)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = loop.run_in_executor(None, self.client.request_json, method, url, params, data)
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda f, k=key: self._inflight.pop(k, None))
+        # shield: one cancelled caller must not cancel the shared call
+        return await asyncio.shield(fut)
+
+    def stats(self) -> dict:
+        return self.client.stats()
+
+
+def _freeze(d: Optional[dict]) -> tuple:
+    return tuple(sorted((d or {}).items()))
+
+
+def _retryable(e: requests.exceptions.RequestException) -> bool:
+    if isinstance(e, CircuitOpenError):
+        return False
+    if isinstance(e, requests.exceptions.HTTPError):
+        return e.response is not None and e.response.status_code in RETRY_STATUS
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
@@ -0,0 +1,399 @@
+"""
+Wake-word spotting in front of Whisper.
+
+An always-on stage cheap enough for a Raspberry Pi: MFCCs every 10 ms
+(NumPy FFT + mel filterbank + DCT), matched against a few enrolled
+recordings of the wake phrase ("assalamualaikum" by default) with a
+streaming subsequence DTW. Each new frame costs one small matrix-vector
+product per template, and the DTW pauses while the room is quiet, so
+Whisper only has to run once the phrase is heard.
+
+    python kws.py enroll wake/*.wav                            # -> wake_templates.npz
+    python kws.py eval --pos wake_test/*.wav --neg ../Audio/*.ogg
+    python kws.py listen                                       # prints on every detection
+
+eval reports false rejects (positives missed), false accepts per hour of
+negative audio and the CPU time per second of audio, for a range of
+thresholds.
+"""
+import os
+import time
+import glob
+import argparse
+import threading
+from functools import lru_cache
+from typing import Iterable, Optional
+
+import numpy as np
+from scipy.signal import lfilter
+
+from resampler import StreamingResampler
+
+SR = 16000
+WIN = 400                  # 25 ms
+HOP = 160                  # 10 ms
+N_FFT = 512
+N_MELS = 40
+N_MFCC = 13                # c0 (energy) is dropped before matching
+CMN_FRAMES = 100           # running cepstral mean over ~1 s
+
+THRESHOLD = 0.25           # mean cosine distance along the best path (calibrate with `eval`)
+REFRACTORY_S = 1.5         # ignore repeats right after a detection
+TRIM_DB = 30.0             # enrollment clips: frames this far below the loudest are trimmed
+QUIET_DB = 6.0             # frames within this of the noise floor count as quiet
+QUIET_FRAMES = 30          # after 300 ms of quiet the DTW pauses until sound returns
+FLOOR_RISE = 0.002         # noise floor tracking (drops at once, rises slowly)
+LEAD_IN_S = 0.5            # quiet audio put before enrollment / eval clips (settles the running mean)
+
+DEFAULT_TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wake_templates.npz")
+
+
+@lru_cache(maxsize=4)
+def _mel_filterbank(sr: int = SR, n_fft: int = N_FFT, n_mels: int = N_MELS,
+                    fmin: float = 60.0, fmax: float = 7600.0) -> np.ndarray:
+    def hz_to_mel(f):
+        return 2595.0 * np.log10(1.0 + f / 700.0)
+
+    def mel_to_hz(m):
+        return 700.0 * (10 ** (m / 2595.0) - 1.0)
+
+    edges = mel_to_hz(np.linspace(hz_to_mel(fmin), hz_to_mel(fmax), n_mels + 2))
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sr)
+    lo, mid, hi = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    fb = np.maximum(0.0, np.minimum((bins - lo) / (mid - lo), (hi - bins) / (hi - mid)))
+    return fb.astype(np.float32)
+
+
+@lru_cache(maxsize=4)
+def _dct_matrix(n_mels: int = N_MELS, n_mfcc: int = N_MFCC) -> np.ndarray:
+    n = np.arange(n_mels)
+    k = np.arange(n_mfcc)[:, None]
+    return (np.cos(np.pi / n_mels * (n + 0.5) * k) * np.sqrt(2.0 / n_mels)).astype(np.float32)
+
+
+class Features:
+    """
+    Streaming MFCC front end. push() takes audio of any chunk size at SR and
+    returns the frames completed by it: (mfcc[:, 1:], log energy), with a
+    running cepstral mean subtracted so the mic/room colouring cancels out.
+    """
+
+    def __init__(self):
+        self._rest = np.zeros(0, dtype=np.float32)
+        self._window = np.hanning(WIN).astype(np.float32)
+        self._fb = _mel_filterbank()
+        self._dct = _dct_matrix()
+        self._zi: Optional[np.ndarray] = None     # running-mean filter state
+
+    def push(self, audio: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        buf = np.concatenate([self._rest, np.asarray(audio, dtype=np.float32).reshape(-1)])
+        n = 0 if len(buf) < WIN else 1 + (len(buf) - WIN) // HOP
+        self._rest = buf[n * HOP:]
+        if n == 0:
+            return np.zeros((0, N_MFCC - 1), np.float32), np.zeros(0, np.float32)
+
+        frames = np.lib.stride_tricks.sliding_window_view(buf, WIN)[::HOP][:n]
+        power = np.abs(np.fft.rfft(frames * self._window, N_FFT)) ** 2
+        log_mel = np.log(power @ self._fb.T + 1e-8)
+        cep = log_mel @ self._dct.T
+        log_e = np.log(power.sum(axis=1) + 1e-8).astype(np.float32)
+
+        # running mean as a one-pole filter, state carried between chunks
+        alpha = 1.0 / CMN_FRAMES
+        if self._zi is None:
+            self._zi = ((1.0 - alpha) * cep[0])[None, :]
+        mean, self._zi = lfilter([alpha], [1.0, alpha - 1.0], cep, axis=0, zi=self._zi)
+        return (cep[:, 1:] - mean[:, 1:]).astype(np.float32), log_e
+
+
+def mfcc(audio: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Whole-clip features (same processing as the stream)."""
+    return Features().push(audio)
+
+
+def _lead_in() -> np.ndarray:
+    """Near-silence like an idle mic, so clips see the same running mean as the live stream."""
+    return np.random.default_rng(0).normal(0.0, 1e-4, int(LEAD_IN_S * SR)).astype(np.float32)
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-8)
+
+
+class WakeWordDetector:
+    """
+    Streaming subsequence DTW against every template at once.
+
+    Template frames are stacked into one matrix; for each incoming frame the
+    DTW column is updated from the previous two columns only (steps (1,1),
+    (2,1), (1,2): the speaker may be up to twice as fast or slow as the
+    recording), so the work per frame is one (rows x 12) matvec. A match may
+    start at any frame. The score is the mean cosine distance per stream
+    frame along the best path ending at a template's last frame.
+    """
+
+    def __init__(self, templates: list[np.ndarray], threshold: float = THRESHOLD,
+                 refractory_s: float = REFRACTORY_S):
+        if not templates:
+            raise ValueError("need at least one wake word template")
+        self.templates = [np.asarray(t, np.float32) for t in templates]
+        self.threshold = threshold
+        self.refractory_frames = int(refractory_s * SR / HOP)
+
+        self._T = _unit(np.concatenate(self.templates))
+        rows = len(self._T)
+        starts = np.cumsum([0] + [len(t) for t in self.templates[:-1]])
+        ends = starts + np.array([len(t) for t in self.templates]) - 1
+        first = np.zeros(rows, bool)
+        first[starts] = True
+        second = np.zeros(rows, bool)
+        second[starts[[len(t) > 1 for t in self.templates]] + 1] = True
+        idx = np.arange(rows)
+        sentinel = rows                       # index of an always-inf slot
+        self._p1 = np.where(first, sentinel, idx - 1)
+        self._p2 = np.where(first | second, sentinel, idx - 2)
+        self._first = first
+        self._ends = ends
+
+        self.reset()
+        self.frames = 0
+        self.detections = 0
+        self.cpu_s = 0.0
+        self.fire_score = np.inf               # score of the latest detection
+
+    @classmethod
+    def enroll(cls, clips: Iterable[np.ndarray], **kw) -> "WakeWordDetector":
+        """Templates from recordings of the wake phrase (SR mono), silence trimmed."""
+        templates = []
+        lead = _lead_in()
+        skip = len(lead) // HOP
+        for audio in clips:
+            feats, log_e = mfcc(np.concatenate([lead, audio]))
+            feats, log_e = feats[skip:], log_e[skip:]
+            loud = np.flatnonzero(log_e >= log_e.max() - TRIM_DB / 10 * np.log(10))
+            if len(loud):
+                templates.append(feats[loud[0]:loud[-1] + 1])
+        return cls(templates, **kw)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TEMPLATES, **kw) -> "WakeWordDetector":
+        with np.load(path) as z:
+            templates = [z[k] for k in sorted(z.files, key=lambda k: int(k.split("_")[1]))]
+        return cls(templates, **kw)
+
+    def save(self, path: str = DEFAULT_TEMPLATES):
+        np.savez_compressed(path, **{f"t_{i}": t for i, t in enumerate(self.templates)})
+
+    def reset(self):
+        """Start a fresh stream (features and DTW state)."""
+        self._feat = Features()
+        rows = len(self._T) + 1
+        self._d1 = np.full(rows, np.inf, np.float32)
+        self._d2 = np.full(rows, np.inf, np.float32)
+        self._l1 = np.ones(rows, np.float32)
+        self._l2 = np.ones(rows, np.float32)
+        self._cooldown = 0
+        self._floor: Optional[float] = None
+        self._quiet_run = 0
+
+    def _step(self, x: np.ndarray) -> float:
+        """One DTW column; returns the best normalized score ending at a template end."""
+        c = 1.0 - self._T @ x
+        p1, p2 = self._p1, self._p2
+        d1, d2, l1, l2 = self._d1, self._d2, self._l1, self._l2
+
+        cand = np.stack([d1[p1] + c, d1[p2] + c, d2[p1] + 2 * c])
+        lens = np.stack([l1[p1] + 1, l1[p2] + 1, l2[p1] + 2])
+        pick = np.argmin(cand / lens, axis=0)
+        cols = np.arange(len(c))
+        d = cand[pick, cols]
+        ln = lens[pick, cols]
+        d = np.where(self._first, c, d)        # a match can start on any frame
+        ln = np.where(self._first, 1.0, ln)
+
+        self._d2, self._l2 = d1, l1
+        self._d1 = np.append(d, np.inf).astype(np.float32)
+        self._l1 = np.append(ln, 1.0).astype(np.float32)
+        return float(np.min(d[self._ends] / ln[self._ends]))
+
+    def scores(self, audio: np.ndarray) -> np.ndarray:
+        """Per-frame scores for a chunk (no firing logic); used by feed() and eval."""
+        t0 = time.process_time()
+        feats, log_e = self._feat.push(audio)
+        out = np.full(len(feats), np.inf, np.float32)
+        quiet_margin = QUIET_DB / 10 * np.log(10)
+        for i, (x, e) in enumerate(zip(_unit(feats), log_e)):
+            if self._floor is None or e < self._floor:
+                self._floor = float(e)
+            else:
+                self._floor += FLOOR_RISE * (e - self._floor)
+            self._quiet_run = self._quiet_run + 1 if e < self._floor + quiet_margin else 0
+            if self._quiet_run > QUIET_FRAMES:
+                if self._quiet_run == QUIET_FRAMES + 1:
+                    self._d1[:] = np.inf
+                    self._d2[:] = np.inf
+                continue
+            out[i] = self._step(x)
+        self.frames += len(feats)
+        self.cpu_s += time.process_time() - t0
+        return out
+
+    def feed(self, audio: np.ndarray) -> bool:
+        """Push SR mono audio; True if the wake phrase ended inside this chunk."""
+        fired = False
+        for s in self.scores(audio):
+            if self._cooldown > 0:
+                self._cooldown -= 1
+            elif s <= self.threshold:
+                fired = True
+                self.detections += 1
+                self.fire_score = float(s)
+                self._cooldown = self.refractory_frames
+        if fired:
+            # don't let the same utterance match again from stale columns
+            self._d1[:] = np.inf
+            self._d2[:] = np.inf
+        return fired
+
+    def cpu_load(self) -> float:
+        """CPU seconds per second of audio processed so far."""
+        return self.cpu_s / (self.frames * HOP / SR) if self.frames else 0.0
+
+
+def count_fires(scores: np.ndarray, threshold: float, refractory_frames: int) -> int:
+    fires, cooldown = 0, 0
+    for s in scores:
+        if cooldown > 0:
+            cooldown -= 1
+        elif s <= threshold:
+            fires += 1
+            cooldown = refractory_frames
+    return fires
+
+
+def listen_for_wake(detector: WakeWordDetector, device=None, sr: Optional[int] = None,
+                    stop: Optional[threading.Event] = None) -> bool:
+    """Block on the mic until the wake phrase is heard (True) or stop is set (False)."""
+    import sounddevice as sd
+
+    if sr is None:
+        sr = int(sd.query_devices(device, "input")["default_samplerate"])
+    rs = StreamingResampler(sr, SR) if sr != SR else None
+    heard = threading.Event()
+    detector.reset()
+
+    def _callback(indata, frames, time_info, status):
+        block = indata[:, 0] if rs is None else rs.process(indata[:, 0])
+        if detector.feed(block):
+            heard.set()
+            raise sd.CallbackStop()
+
+    with sd.InputStream(device=device, samplerate=sr, channels=1, dtype="float32",
+                        blocksize=sr // 50, callback=_callback):
+        while not heard.wait(0.1):
+            if stop is not None and stop.is_set():
+                return False
+    return True
+
+
+# ----------------------------
+# CLI: enroll / eval / listen
+# ----------------------------
+def _load_clips(patterns: list[str]) -> list[tuple[str, np.ndarray]]:
+    from faster_whisper.audio import decode_audio
+    paths = sorted({p for pat in patterns for p in glob.glob(pat)})
+    return [(p, decode_audio(p, sampling_rate=SR)) for p in paths]
+
+
+def evaluate(detector: WakeWordDetector, positives: list[tuple[str, np.ndarray]],
+             negatives: list[tuple[str, np.ndarray]], thresholds: Iterable[float],
+             chunk_ms: int = 20) -> dict:
+    """Replay fixtures in mic-sized chunks; FR / FA per hour / CPU at each threshold."""
+    step = SR * chunk_ms // 1000
+    traces = {}
+    lead = _lead_in()
+    for name, audio in positives + negatives:
+        detector.reset()
+        audio = np.concatenate([lead, audio, lead])
+        traces[name] = np.concatenate([detector.scores(audio[i:i + step])
+                                       for i in range(0, len(audio), step)])
+
+    # idle: a minute of quiet room, which is what the detector sees most of the day
+    cpu0, frames0 = detector.cpu_s, detector.frames
+    detector.reset()
+    quiet = np.random.default_rng(1).normal(0.0, 3e-3, 60 * SR).astype(np.float32)
+    for i in range(0, len(quiet), step):
+        detector.scores(quiet[i:i + step])
+    idle_load = (detector.cpu_s - cpu0) / ((detector.frames - frames0) * HOP / SR)
+
+    neg_hours = sum(len(a) for _, a in negatives) / SR / 3600
+    rows = []
+    for thr in thresholds:
+        missed = sum(count_fires(traces[n], thr, detector.refractory_frames) == 0 for n, _ in positives)
+        false = sum(count_fires(traces[n], thr, detector.refractory_frames) for n, _ in negatives)
+        rows.append({
+            "threshold": thr,
+            "false_reject": missed / len(positives) if positives else None,
+            "false_accepts": false,
+            "fa_per_hour": false / neg_hours if neg_hours else None,
+        })
+    return {
+        "cpu_load": detector.cpu_load(),
+        "idle_cpu_load": idle_load,
+        "negative_minutes": neg_hours * 60,
+        "best_positive_scores": {n: float(traces[n].min()) for n, _ in positives},
+        "rows": rows,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Wake-word spotting (MFCC + DTW)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    en = sub.add_parser("enroll", help="build templates from recordings of the wake phrase")
+    en.add_argument("clips", nargs="+")
+    en.add_argument("--out", default=DEFAULT_TEMPLATES)
+    ev = sub.add_parser("eval", help="false accept / reject and CPU on recorded fixtures")
+    ev.add_argument("--templates", default=DEFAULT_TEMPLATES)
+    ev.add_argument("--pos", nargs="*", default=[], help="recordings that contain the wake phrase")
+    ev.add_argument("--neg", nargs="*", default=[], help="recordings that do not")
+    ev.add_argument("--thresholds", type=float, nargs="+", default=[0.1, 0.15, 0.2, 0.25, 0.3])
+    li = sub.add_parser("listen", help="print every detection from the mic")
+    li.add_argument("--templates", default=DEFAULT_TEMPLATES)
+    li.add_argument("--device", type=int, default=None)
+    li.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "enroll":
+        clips = _load_clips(args.clips)
+        det = WakeWordDetector.enroll(a for _, a in clips)
+        det.save(args.out)
+        lens = [len(t) * HOP / SR for t in det.templates]
+        print(f"[KWS] {len(lens)} templates ({min(lens):.2f}-{max(lens):.2f}s) -> {args.out}")
+        return 0
+
+    if args.cmd == "eval":
+        det = WakeWordDetector.load(args.templates)
+        res = evaluate(det, _load_clips(args.pos), _load_clips(args.neg), args.thresholds)
+        print(f"[KWS] CPU: {res['cpu_load'] * 100:.2f}% of one core on fixtures, "
+              f"{res['idle_cpu_load'] * 100:.2f}% idle; {res['negative_minutes']:.1f} min negative audio")
+        for name, s in res["best_positive_scores"].items():
+            print(f"  {os.path.basename(name):30s} best score {s:.3f}")
+        print("  threshold  false-reject  false-accepts  FA/hour")
+        for r in res["rows"]:
+            fr = "-" if r["false_reject"] is None else f"{r['false_reject'] * 100:5.1f}%"
+            fah = "-" if r["fa_per_hour"] is None else f"{r['fa_per_hour']:.1f}"
+            print(f"  {r['threshold']:9.2f}  {fr:>12s}  {r['false_accepts']:13d}  {fah:>7s}")
+        return 0
+
+    det = WakeWordDetector.load(args.templates, threshold=args.threshold)
+    print("[KWS] Listening for the wake phrase (Ctrl+C to stop)...")
+    try:
+        while listen_for_wake(det, device=args.device):
+            print(f"[KWS] Wake word (score {det.fire_score:.3f}, cpu {det.cpu_load() * 100:.2f}%)")
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,198 @@
+"""
+Load generator for assistant_server.py: N simulated satellites replaying the
+sample recordings in Audio/ and measuring what each one would experience.
+
+    python loadgen.py --url http://127.0.0.1:8765 --clients 4 --requests 10
+    python loadgen.py --clients 8 --realtime         # upload at speaking pace
+
+Each client loops: upload one utterance (chunked, 100 ms blocks), read the
+NDJSON reply, think for a moment, repeat. 503 replies are retried after
+Retry-After. Reports p50/p95 of transcript / first segment / done latency
+(measured from the end of upload, like a satellite that stops recording and
+waits), overall throughput and rejects.
+"""
+import os
+import sys
+import json
+import glob
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+
+import numpy as np
+import requests
+
+from metrics import summarize
+
+SAMPLE_RATE = 16000
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Audio")
+BLOCK_S = 0.1
+
+
+def load_clips(audio_dir: str = AUDIO_DIR) -> list[tuple[str, bytes]]:
+    """Decode every .ogg once to 16 kHz pcm16 bytes."""
+    from faster_whisper.audio import decode_audio
+    clips = []
+    for path in sorted(glob.glob(os.path.join(audio_dir, "*.ogg"))):
+        audio = decode_audio(path, sampling_rate=SAMPLE_RATE)
+        pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        clips.append((os.path.basename(path), pcm))
+    return clips
+
+
+def _blocks(pcm: bytes, realtime: bool):
+    step = int(BLOCK_S * SAMPLE_RATE) * 2
+    for i in range(0, len(pcm), step):
+        if realtime and i:
+            time.sleep(BLOCK_S)
+        yield pcm[i:i + step]
+
+
+def ask(session: requests.Session, url: str, client: str, pcm: bytes, realtime: bool = False,
+        timeout: float = 120) -> dict:
+    """
+    One request. Returns {"status", "text", "segments", "timings"} where timings
+    are client-side seconds from end of upload. Raises nothing for HTTP errors.
+    """
+    t = {}
+
+    def body():
+        yield from _blocks(pcm, realtime)
+        t["uploaded"] = time.monotonic()
+
+    r = session.post(f"{url}/v1/ask", params={"client": client, "sr": SAMPLE_RATE, "format": "pcm16"},
+                     data=body(), stream=True, timeout=timeout)
+    out = {"status": r.status_code, "text": "", "segments": [], "timings": {}}
+    if r.status_code != 200:
+        out["retry_after"] = float(r.headers.get("Retry-After", 1))
+        r.close()
+        return out
+
+    t0 = t.get("uploaded", time.monotonic())
+    for line in r.iter_lines():
+        if not line:
+            continue
+        ev = json.loads(line)
+        now = time.monotonic() - t0
+        if ev["type"] == "transcript":
+            out["text"] = ev["text"]
+            out["timings"]["transcript_s"] = now
+        elif ev["type"] == "segment":
+            out["segments"].append(ev["text"])
+            out["timings"].setdefault("first_segment_s", now)
+        elif ev["type"] == "done":
+            out["timings"]["done_s"] = now
+            out["server"] = ev["timings"]
+        elif ev["type"] == "error":
+            out["error"] = ev["error"]
+    r.close()
+    return out
+
+
+def run(url: str, clips: list[tuple[str, bytes]], clients: int, requests_per_client: int,
+        realtime: bool = False, think_s: float = 0.5, verbose: bool = False) -> dict:
+    lat: dict[str, dict[str, list]] = defaultdict(lambda: defaultdict(list))
+    counts = defaultdict(int)
+    lock = threading.Lock()
+
+    def client_loop(n: int):
+        name = f"client-{n}"
+        rng = random.Random(n)
+        session = requests.Session()
+        done = 0
+        while done < requests_per_client:
+            clip_name, pcm = rng.choice(clips)
+            try:
+                res = ask(session, url, name, pcm, realtime)
+            except requests.RequestException as e:
+                with lock:
+                    counts["errors"] += 1
+                print(f"[LOADGEN] {name}: {e}")
+                done += 1
+                continue
+            if res["status"] in (429, 503):
+                with lock:
+                    counts["rejected"] += 1
+                time.sleep(res["retry_after"])
+                continue
+            done += 1
+            with lock:
+                if res["status"] != 200 or "error" in res:
+                    counts["errors"] += 1
+                else:
+                    counts["ok"] += 1
+                    counts["audio_s"] += len(pcm) / 2 / SAMPLE_RATE
+                    for k, v in res["timings"].items():
+                        lat[name][k].append(v)
+                        lat["all"][k].append(v)
+            if verbose:
+                print(f"[LOADGEN] {name} {clip_name}: {res['text']!r} -> {' '.join(res['segments'])!r}")
+            time.sleep(rng.uniform(0, 2 * think_s))
+
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=client_loop, args=(n,)) for n in range(clients)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    wall = time.monotonic() - t0
+
+    return {
+        "clients": clients,
+        "wall_s": wall,
+        "ok": counts["ok"],
+        "rejected": counts["rejected"],
+        "errors": counts["errors"],
+        "throughput_rps": counts["ok"] / wall if wall else 0.0,
+        "audio_s_per_s": counts["audio_s"] / wall if wall else 0.0,
+        "latency": {who: {k: summarize(v) for k, v in d.items()} for who, d in sorted(lat.items())},
+    }
+
+
+def print_report(rep: dict):
+    print(f"\n{rep['clients']} clients, {rep['ok']} ok, {rep['rejected']} rejected (retried), "
+          f"{rep['errors']} errors in {rep['wall_s']:.1f}s")
+    print(f"Throughput: {rep['throughput_rps']:.2f} req/s, {rep['audio_s_per_s']:.2f} s of audio per s")
+    keys = ["transcript_s", "first_segment_s", "done_s"]
+    print(f"{'client':<12}" + "".join(f"{k[:-2] + ' p50/p95 ms':>28}" for k in keys))
+    for who, d in rep["latency"].items():
+        cells = []
+        for k in keys:
+            s = d.get(k, {"n": 0})
+            cells.append(f"{s['p50_ms']:>13.0f} / {s['p95_ms']:<9.0f}" if s["n"] else f"{'-':>28}")
+        print(f"{who:<12}" + "".join(f"{c:>28}" for c in cells))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replay Audio/*.ogg against assistant_server.py from N clients")
+    ap.add_argument("--url", default="http://127.0.0.1:8765")
+    ap.add_argument("--clients", type=int, default=4)
+    ap.add_argument("--requests", type=int, default=10, help="requests per client")
+    ap.add_argument("--audio-dir", default=AUDIO_DIR)
+    ap.add_argument("--realtime", action="store_true", help="upload at speaking pace instead of all at once")
+    ap.add_argument("--think", type=float, default=0.5, help="mean pause between a client's requests (s)")
+    ap.add_argument("--json", help="also write the report here")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    args = ap.parse_args(argv)
+
+    clips = load_clips(args.audio_dir)
+    if not clips:
+        print(f"No .ogg files in {args.audio_dir}")
+        return 1
+    print(f"[LOADGEN] {len(clips)} clips, {args.clients} clients x {args.requests} requests -> {args.url}")
+    rep = run(args.url, clips, args.clients, args.requests, args.realtime, args.think, args.verbose)
+    print_report(rep)
+    try:
+        rep["server"] = requests.get(f"{args.url}/v1/stats", timeout=5).json()
+    except requests.RequestException:
+        pass
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
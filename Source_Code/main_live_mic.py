@@ -1,77 +1,234 @@
 import os
+import time
 import tempfile
+import threading
 import numpy as np
 import sounddevice as sd
 from scipy.io.wavfile import write
 from scipy.signal import resample_poly
 
-from stt_faster_whisper import transcribe_faster
+from mic_capture import capture_utterance
+from stt_faster_whisper import transcribe_faster, transcribe_partials, preload, preload_cascade, CASCADE
 from stt_postprocess import correct_domain_text
-from router import get_response
+from router import (get_response, get_response_stream, get_response_cache, transcript_complete, intent_complete,
+                    IncrementalRouter, SYSTEM_PROMPT)
+from ollama_client import prewarm
+from kws import WakeWordDetector, listen_for_wake, DEFAULT_TEMPLATES
+from adhan_scheduler import AdhanScheduler
+from metrics import tracer, current_turn, JsonlSink, serve_prometheus
 
 # Optional TTS
-from tts_pyttsx3 import speak
+from tts_pyttsx3 import speak, SpeechQueue
+import tts_cache
+from audio_out import get_output
 
 # Demo import from another folder
 from demo_module import hello_world
 
 DEVICE_INDEX = 1      # Webcam mic (WASAPI). If any issue, try 1.
-SECONDS = 7
+SECONDS = 7           # max length per question (fixed length if USE_VAD is off)
+USE_VAD = True        # end recording on trailing silence instead of always waiting SECONDS
+TRAILING_SILENCE_MS = 700
 TARGET_SR = 16000
+DEBUG_WAV = False     # also write live_input.wav to the temp dir
+STREAM_REPLY = True   # speak LLM replies sentence by sentence while still generating
+EARLY_INTENT = True   # decode at pauses and answer prayer questions from the first chunks, skip the rest (needs STREAM_REPLY)
+USE_TTS_CACHE = True  # play replies from pre-rendered clips (tts_cache.py) instead of live pyttsx3
+USE_WAKE_WORD = True  # wait for the wake phrase instead of Enter once wake_templates.npz exists (kws.py enroll)
+ADHAN_ZONES = ["SGR01"]   # play the adhan and "10 minit lagi" reminders for these zones ([] = off)
 
-def record_to_wav(seconds: int = SECONDS) -> str:
+# Per-turn tracing (off unless one of these is set)
+TRACE_JSONL = os.environ.get("ASSISTANT_TRACE_JSONL")       # e.g. turns.jsonl
+METRICS_PORT = os.environ.get("ASSISTANT_METRICS_PORT")     # e.g. 9108 -> /metrics
+
+_speech = None
+
+def record_audio(seconds: int = SECONDS) -> np.ndarray:
+    """Record one question and return it as float32 mono at TARGET_SR (ready for Whisper)."""
     dev = sd.query_devices(DEVICE_INDEX)
     src_sr = int(dev["default_samplerate"])  # usually 48000 for webcam mics
 
     sd.default.device = (DEVICE_INDEX, None)
     print(f"[MIC] Using: {dev['name']}")
-    print(f"[MIC] Recording {seconds}s at {src_sr} Hz... Speak now.")
 
-    audio = sd.rec(int(seconds * src_sr), samplerate=src_sr, channels=1, dtype=np.float32)
-    sd.wait()
-    print("[MIC] Done.")
+    turn = current_turn()
+    if USE_VAD:
+        print(f"[MIC] Listening at {src_sr} Hz (stops on silence, max {seconds}s)... Speak now.")
+        # resampled to 16k block by block inside the callback
+        with turn.stage("capture"):
+            audio, _ = capture_utterance(DEVICE_INDEX, sr=src_sr, out_sr=TARGET_SR, max_seconds=seconds,
+                                         trailing_silence_ms=TRAILING_SILENCE_MS)
+        print("[MIC] Done.")
+        return audio
 
+    print(f"[MIC] Recording {seconds}s at {src_sr} Hz... Speak now.")
+    with turn.stage("capture"):
+        audio = sd.rec(int(seconds * src_sr), samplerate=src_sr, channels=1, dtype=np.float32)
+        sd.wait()
     audio = audio.squeeze()
+    print("[MIC] Done.")
 
     # Resample to 16k for STT
-    audio_16k = resample_poly(audio, TARGET_SR, src_sr)
+    if src_sr == TARGET_SR:
+        return audio.astype(np.float32, copy=False)
+    with turn.stage("resample"):
+        return resample_poly(audio, TARGET_SR, src_sr).astype(np.float32)
 
+def write_debug_wav(audio_16k: np.ndarray) -> str:
+    """Debug tap: save what STT heard as 16-bit WAV."""
     # Float [-1,1] -> int16
-    audio_16k = np.clip(audio_16k, -1.0, 1.0)
-    audio_i16 = (audio_16k * 32767).astype(np.int16)
+    audio_i16 = (np.clip(audio_16k, -1.0, 1.0) * 32767).astype(np.int16)
 
     wav_path = os.path.join(tempfile.gettempdir(), "live_input.wav")
     write(wav_path, TARGET_SR, audio_i16)
     return wav_path
 
-def run_once():
-    wav_path = record_to_wav()
+def record_to_wav(seconds: int = SECONDS) -> str:
+    return write_debug_wav(record_audio(seconds))
 
-    raw = transcribe_faster(wav_path)
-    fixed = correct_domain_text(raw)
+def run_once():
+    with tracer.turn() as turn:
+        _run_turn(turn)
+
+def _run_turn(turn):
+    audio = record_audio()
+    if audio.size == 0:
+        print("[MIC] No speech heard.")
+        return
+    if DEBUG_WAV:
+        print("[MIC] Saved:", write_debug_wav(audio))
+
+    if STREAM_REPLY and EARLY_INTENT and not CASCADE:
+        router = IncrementalRouter("llama3:latest")
+        with turn.stage("stt"):
+            fixed = router.resolve(transcribe_partials(
+                audio, accept=lambda t: transcript_complete(correct_domain_text(t)),
+                postprocess=correct_domain_text))
+        turn.note(fixed=fixed)
+        print("STT FIX :", fixed, "(answered early)" if router.early else "")
+        run_reply_streaming(fixed, router.respond)
+        return
+
+    with turn.stage("stt"):
+        raw = transcribe_faster(audio, accept=lambda t: transcript_complete(correct_domain_text(t)),
+                                complete=lambda t: intent_complete(correct_domain_text(t)))
+    with turn.stage("postprocess"):
+        fixed = correct_domain_text(raw)
+    turn.note(raw=raw, fixed=fixed)
 
     print("STT RAW :", raw)
     print("STT FIX :", fixed)
 
-    reply = get_response(fixed, ollama_model="llama3:latest")
+    if STREAM_REPLY:
+        run_reply_streaming(fixed)
+        return
+
+    with turn.stage("route"):
+        reply = get_response(fixed, ollama_model="llama3:latest")
     print("BOT:", reply)
     print("-" * 60)
 
-    speak(reply)  # uncomment if you want voice output
+    with turn.stage("tts"):
+        (tts_cache.speak if USE_TTS_CACHE else speak)(reply)
+
+def run_reply_streaming(text: str, respond=None):
+    """
+    Queue each reply segment to TTS as soon as it is ready. Ctrl+C interrupts.
+    respond(cancel) -> segments replaces the router call (IncrementalRouter.respond).
+    """
+    global _speech
+    if _speech is None:
+        # the output engine prepares the next segment while the current one plays
+        _speech = get_output().channel("speech") if USE_TTS_CACHE else SpeechQueue()
+    _speech.reset()
+
+    turn = current_turn()
+    cancel = threading.Event()
+    print("BOT:", end=" ", flush=True)
+    try:
+        t0 = time.monotonic()
+        with turn.stage("route"):
+            segments = (respond(cancel) if respond is not None
+                        else get_response_stream(text, ollama_model="llama3:latest", cancel=cancel))
+            for i, seg in enumerate(segments):
+                if i == 0:
+                    turn.note(first_segment_s=round(time.monotonic() - t0, 4))
+                print(seg, end=" ", flush=True)
+                _speech.put(seg)
+        with turn.stage("tts"):
+            _speech.wait()
+    except KeyboardInterrupt:
+        cancel.set()
+        _speech.cancel()
+        turn.note(interrupted="yes")
+        print("\n[BOT] Interrupted.")
+    print()
+    print("-" * 60)
 
 def main():
     print("=== LIVE MIC: WAKTU SOLAT ASSISTANT ===")
-    print("Press Enter to record. Type 'q' then Enter to quit.\n")
     
     # Test demo import
     hello_world()
     print()
 
+    # Load + warm up Whisper now so the first question isn't slow;
+    # Ollama loads in the background meanwhile and stays pinned (OLLAMA_KEEP_ALIVE)
+    prewarm("llama3:latest", system=SYSTEM_PROMPT)
+    stt = preload_cascade() if CASCADE else preload()
+    if USE_TTS_CACHE:
+        print("[TTS] Checking phrase cache (first run renders every template phrase)...")
+        print(f"[TTS] {tts_cache.warm()} new clips rendered.")
+    print()
+
+    adhan = None
+    if ADHAN_ZONES:
+        adhan = AdhanScheduler(ADHAN_ZONES).start()
+        print(f"[ADHAN] Announcements on for {', '.join(ADHAN_ZONES)}")
+
+    if TRACE_JSONL:
+        tracer.add_sink(JsonlSink(TRACE_JSONL))
+        print(f"[METRICS] Writing turns to {TRACE_JSONL}")
+    if METRICS_PORT:
+        serve_prometheus(int(METRICS_PORT))
+        print(f"[METRICS] Prometheus on :{METRICS_PORT}/metrics")
+
+    wake = None
+    if USE_WAKE_WORD and os.path.exists(DEFAULT_TEMPLATES):
+        wake = WakeWordDetector.load()
+        print("Hands-free: say the wake phrase, then your question. Ctrl+C to quit.\n")
+    else:
+        print("Press Enter to record. Type 'q' then Enter to quit.\n")
+
     while True:
-        cmd = input(">> ").strip().lower()
-        if cmd == "q":
-            break
+        if wake is None:
+            cmd = input(">> ").strip().lower()
+            if cmd == "q":
+                break
+        else:
+            try:
+                listen_for_wake(wake, device=DEVICE_INDEX)
+            except KeyboardInterrupt:
+                break
+            print(f"[KWS] Wake word heard (score {wake.fire_score:.2f}).")
         run_once()
+    if adhan is not None:
+        adhan.stop()
+    if wake is not None:
+        print(f"[KWS] {wake.detections} detections, {wake.cpu_load() * 100:.2f}% CPU while listening")
+
+    st = stt.stats()
+    for tier in st.get("tiers", []):
+        print(f"[STT] {tier['model']}: {tier['accepted']}/{tier['attempts']} kept, p50 {tier['p50_ms'] or 0:.0f} ms")
+    st = st.get("final", st)
+    if st["adaptive_calls"]:
+        print(f"[STT] {st['adaptive_calls']} questions, {st['fallback_rate']:.0%} needed the full decode "
+              f"{st['fallback_reasons']}, RTF {st['rtf']:.2f}")
+    for tier, st in get_response_cache().stats().items():
+        print(f"[CACHE] {tier}: {st['hits']} hits / {st['misses']} misses, {st['size']} entries")
+    if USE_TTS_CACHE:
+        for kind, st in tts_cache.get_phrase_cache().stats().items():
+            print(f"[TTS] {kind}: {st['hits']} hits / {st['misses']} misses, {st['files']} clips")
 
 if __name__ == "__main__":
     main()
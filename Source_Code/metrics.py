@@ -0,0 +1,285 @@
+"""
+Per-turn stage tracing for the assistant loop.
+
+    from metrics import tracer, current_turn
+
+    with tracer.turn() as turn:
+        with turn.stage("stt"):
+            ...
+        turn.note(route="prayer")
+
+Code deeper in the pipeline (cache, router, STT engine) reports into the active
+turn via current_turn(), so nothing has to be threaded through call signatures.
+Finished turns go to every sink (JSONL file, callback, Prometheus endpoint) and
+stage durations are aggregated into histograms.
+
+With tracing disabled (the default) turn()/stage()/note() are no-ops.
+"""
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Optional
+
+# seconds; covers a 5 ms dict lookup up to a slow LLM answer
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+# Notes counted per value in the Prometheus output (bounded sets only, never transcripts)
+LABEL_NOTES = {"route", "timetable", "answer_cache", "endpoint", "stt_model", "interrupted", "tts_cache",
+               "stt_decode", "early_intent", "error"}
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float):
+        self.sum += v
+        self.count += 1
+        for i, b in enumerate(self.buckets):
+            if v <= b:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound containing quantile q (coarse, like Prometheus)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for b, c in zip(self.buckets, self.counts):
+            seen += c
+            if seen >= target:
+                return b
+        return self.buckets[-1]
+
+
+def summarize(samples: list[float]) -> dict:
+    """Latency summary (seconds in, milliseconds out) for benchmarks and per-client server stats."""
+    a = sorted(v * 1000.0 for v in samples)
+    if not a:
+        return {"n": 0}
+    return {
+        "n": len(a),
+        "mean_ms": sum(a) / len(a),
+        "p50_ms": _percentile(a, 50),
+        "p95_ms": _percentile(a, 95),
+        "p99_ms": _percentile(a, 99),
+        "max_ms": a[-1],
+    }
+
+
+def _percentile(a: list[float], q: float) -> float:
+    """Linear interpolation on sorted values (same as numpy.percentile's default)."""
+    pos = (len(a) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(a) - 1)
+    return a[lo] + (a[hi] - a[lo]) * (pos - lo)
+
+
+class Turn:
+    """One question/answer cycle: stage spans (monotonic) plus free-form notes."""
+
+    def __init__(self, turn_id: int):
+        self.id = turn_id
+        self.t0 = time.monotonic()
+        self.wall = time.time()
+        self.spans: list[tuple[str, float, float]] = []   # (stage, start offset s, duration s)
+        self.notes: dict = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.monotonic()
+        try:
+            yield self
+        finally:
+            end = time.monotonic()
+            self.spans.append((name, start - self.t0, end - start))
+
+    def add_span(self, name: str, duration: float):
+        """Record a stage measured elsewhere (e.g. time spent on another thread)."""
+        self.spans.append((name, time.monotonic() - self.t0 - duration, duration))
+
+    def note(self, **fields):
+        self.notes.update(fields)
+
+    def to_dict(self) -> dict:
+        return {
+            "turn": self.id,
+            "ts": self.wall,
+            "total_s": time.monotonic() - self.t0,
+            "stages": [{"stage": n, "start_s": round(s, 6), "dur_s": round(d, 6)} for n, s, d in self.spans],
+            **self.notes,
+        }
+
+
+class _NullTurn:
+    """Stand-in when tracing is off: every call is a cheap no-op."""
+
+    id = 0
+
+    @contextmanager
+    def stage(self, name: str):
+        yield self
+
+    def add_span(self, name: str, duration: float):
+        pass
+
+    def note(self, **fields):
+        pass
+
+    def to_dict(self) -> dict:
+        return {}
+
+
+NULL_TURN = _NullTurn()
+_current: contextvars.ContextVar = contextvars.ContextVar("assistant_turn", default=NULL_TURN)
+
+
+def current_turn():
+    """The turn being traced on this thread/task, or a no-op turn."""
+    return _current.get()
+
+
+def run_in_turn(turn, fn, *args, **kwargs):
+    """Call fn with current_turn() == turn (executor threads don't inherit the caller's context)."""
+    token = _current.set(turn)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _current.reset(token)
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.sinks: list[Callable[[dict], None]] = []
+        self.histograms: dict[str, Histogram] = {}
+        self.labels: dict[tuple[str, str], int] = {}    # (note name, value) -> count, for LABEL_NOTES
+        self.turns = 0
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def add_sink(self, sink: Callable[[dict], None]):
+        self.sinks.append(sink)
+        self.enabled = True
+
+    @contextmanager
+    def turn(self):
+        t = self.begin()
+        if t is NULL_TURN:
+            yield t
+            return
+        token = _current.set(t)
+        try:
+            yield t
+        finally:
+            _current.reset(token)
+            self._finish(t)
+
+    def begin(self):
+        """
+        Start a turn without making it current. For pipelines where one turn
+        moves between tasks/threads: pass it along, use run_in_turn() for the
+        blocking parts, and call end() exactly once.
+        """
+        if not self.enabled:
+            return NULL_TURN
+        with self._lock:
+            self._next_id += 1
+            return Turn(self._next_id)
+
+    def end(self, t):
+        if t is not NULL_TURN:
+            self._finish(t)
+
+    def _finish(self, t: Turn):
+        rec = t.to_dict()
+        with self._lock:
+            self.turns += 1
+            for name, _, dur in t.spans:
+                self.histograms.setdefault(name, Histogram()).observe(dur)
+            self.histograms.setdefault("turn", Histogram()).observe(rec["total_s"])
+            for k, v in t.notes.items():
+                if k in LABEL_NOTES and isinstance(v, str):
+                    self.labels[(k, v)] = self.labels.get((k, v), 0) + 1
+        for sink in self.sinks:
+            try:
+                sink(rec)
+            except Exception as e:
+                print(f"[METRICS] sink failed: {e}")
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {name: {"count": h.count, "avg_s": h.sum / h.count if h.count else 0.0,
+                           "p50_le_s": h.quantile(0.5), "p95_le_s": h.quantile(0.95)}
+                    for name, h in self.histograms.items()}
+
+    def prometheus_text(self) -> str:
+        lines = ["# TYPE assistant_stage_seconds histogram"]
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                cum = 0
+                for b, c in zip(h.buckets, h.counts):
+                    cum += c
+                    le = "+Inf" if b == float("inf") else repr(b)
+                    lines.append(f'assistant_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cum}')
+                lines.append(f'assistant_stage_seconds_sum{{stage="{name}"}} {h.sum}')
+                lines.append(f'assistant_stage_seconds_count{{stage="{name}"}} {h.count}')
+            lines.append("# TYPE assistant_turns_total counter")
+            lines.append(f"assistant_turns_total {self.turns}")
+            lines.append("# TYPE assistant_turn_label_total counter")
+            for (k, v), c in sorted(self.labels.items()):
+                v = v.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'assistant_turn_label_total{{name="{k}",value="{v}"}} {c}')
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer()
+
+
+# ----------------------------
+# Sinks
+# ----------------------------
+class JsonlSink:
+    """Append one JSON line per turn."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, rec: dict):
+        line = json.dumps(rec, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def serve_prometheus(port: int, t: Optional[Tracer] = None) -> ThreadingHTTPServer:
+    """Expose t.prometheus_text() at http://0.0.0.0:port/metrics on a daemon thread."""
+    t = t or tracer
+    t.enabled = True
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if not self.path.startswith("/metrics"):
+                self.send_error(404)
+                return
+            raw = t.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
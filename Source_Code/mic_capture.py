@@ -0,0 +1,260 @@
+"""
+Streaming microphone capture with voice-activity endpointing.
+
+Instead of a fixed-length sd.rec(), audio is pushed from a sd.InputStream
+callback into an Endpointer, which stops the utterance after a configurable
+amount of trailing silence. Recorded files can be fed through the same
+Endpointer (see endpoint_file) to tune the thresholds offline.
+"""
+import threading
+from typing import Optional
+
+import numpy as np
+
+from metrics import current_turn
+from resampler import StreamingResampler
+
+FRAME_MS = 20
+PREROLL_MS = 300         # audio kept from before speech start (first syllable)
+TRAILING_SILENCE_MS = 700
+MAX_SECONDS = 10.0       # hard cap per utterance
+MAX_WAIT_SECONDS = 8.0   # give up if nobody speaks
+SPLIT_GAP_MS = 200       # pause_splits(): shortest pause to cut at
+SPLIT_MIN_S = 1.0        # ... shortest chunk worth its own decode
+SPLIT_MAX_CHUNKS = 3
+
+
+class EnergyVAD:
+    """
+    Cheap frame-level VAD: RMS energy above an adaptive noise floor,
+    with a zero-crossing-rate ceiling to reject hiss / fan noise.
+    """
+
+    def __init__(self, threshold_db: float = 10.0, min_rms: float = 0.003,
+                 max_zcr: float = 0.35, floor_alpha: float = 0.05):
+        self.threshold_db = threshold_db
+        self.min_rms = min_rms
+        self.max_zcr = max_zcr
+        self.floor_alpha = floor_alpha
+        self.noise_rms = None
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        rms = float(np.sqrt(np.mean(frame * frame) + 1e-12))
+        zcr = float(np.count_nonzero(np.diff(np.signbit(frame)))) / max(len(frame) - 1, 1)
+
+        if self.noise_rms is None:
+            self.noise_rms = rms
+
+        floor = max(self.noise_rms, 1e-5)
+        loud = rms >= self.min_rms and 20 * np.log10(rms / floor) >= self.threshold_db
+        speech = loud and zcr <= self.max_zcr
+
+        if not speech:
+            # only track the floor on non-speech frames
+            self.noise_rms += self.floor_alpha * (rms - self.noise_rms)
+        return speech
+
+
+class Endpointer:
+    """
+    Feed float32 mono audio of any chunk size; `done` becomes True once the
+    utterance has ended (trailing silence, max length, or nobody spoke).
+
+    Samples land in a buffer preallocated for MAX_SECONDS + pre-roll, so the
+    audio callback never allocates per chunk.
+    """
+
+    def __init__(self, sr: int, vad: Optional[EnergyVAD] = None, frame_ms: int = FRAME_MS,
+                 preroll_ms: int = PREROLL_MS, trailing_silence_ms: int = TRAILING_SILENCE_MS,
+                 max_seconds: float = MAX_SECONDS, max_wait_seconds: float = MAX_WAIT_SECONDS,
+                 start_frames: int = 3):
+        self.sr = sr
+        self.vad = vad or EnergyVAD()
+        self.frame_len = sr * frame_ms // 1000
+        self.preroll_frames = max(preroll_ms // frame_ms, 1)
+        self.silence_frames = max(trailing_silence_ms // frame_ms, 1)
+        self.max_wait_frames = int(max_wait_seconds * 1000 / frame_ms)
+        self.start_frames = start_frames
+
+        cap = int(max_seconds * sr) + self.preroll_frames * self.frame_len
+        self._buf = np.zeros(cap, dtype=np.float32)
+        self._n = 0
+
+        # pre-roll ring (in frames) while waiting for speech
+        self._ring = np.zeros((self.preroll_frames, self.frame_len), dtype=np.float32)
+        self._ring_pos = 0
+        self._ring_fill = 0
+
+        self._partial = np.zeros(self.frame_len, dtype=np.float32)
+        self._partial_n = 0
+
+        self.triggered = False
+        self.done = False
+        self.reason = ""
+        self.rest = np.zeros(0, dtype=np.float32)   # samples fed after the endpoint (last chunk)
+        self._speech_run = 0
+        self._silence_run = 0
+        self._frames_seen = 0
+        self.speech_frames = 0
+
+    def feed(self, chunk: np.ndarray) -> bool:
+        """Push samples; returns self.done."""
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        i = 0
+        while i < len(chunk) and not self.done:
+            take = min(self.frame_len - self._partial_n, len(chunk) - i)
+            self._partial[self._partial_n:self._partial_n + take] = chunk[i:i + take]
+            self._partial_n += take
+            i += take
+            if self._partial_n == self.frame_len:
+                self._on_frame(self._partial)
+                self._partial_n = 0
+        if self.done and i < len(chunk):
+            self.rest = chunk[i:].copy()
+        return self.done
+
+    @property
+    def seconds(self) -> float:
+        return self._n / self.sr
+
+    def audio(self) -> np.ndarray:
+        """Captured utterance (pre-roll + speech + trailing silence). A view, copy if you keep it."""
+        return self._buf[:self._n]
+
+    def _append(self, frame: np.ndarray):
+        room = len(self._buf) - self._n
+        k = min(room, len(frame))
+        self._buf[self._n:self._n + k] = frame[:k]
+        self._n += k
+        if self._n >= len(self._buf):
+            self._finish("max_length")
+
+    def _finish(self, reason: str):
+        self.done = True
+        self.reason = reason
+
+    def _on_frame(self, frame: np.ndarray):
+        self._frames_seen += 1
+        speech = self.vad.is_speech(frame)
+
+        if not self.triggered:
+            self._ring[self._ring_pos] = frame
+            self._ring_pos = (self._ring_pos + 1) % self.preroll_frames
+            self._ring_fill = min(self._ring_fill + 1, self.preroll_frames)
+
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run >= self.start_frames:
+                self.triggered = True
+                # flush ring oldest-first (it already includes the speech-start frames)
+                start = (self._ring_pos - self._ring_fill) % self.preroll_frames
+                for k in range(self._ring_fill):
+                    self._append(self._ring[(start + k) % self.preroll_frames])
+                self.speech_frames = self._speech_run
+            elif self._frames_seen >= self.max_wait_frames:
+                self._finish("no_speech")
+            return
+
+        self._append(frame)
+        if speech:
+            self.speech_frames += 1
+            self._silence_run = 0
+        else:
+            self._silence_run += 1
+            if self._silence_run >= self.silence_frames:
+                self._finish("silence")
+
+
+def capture_utterance(device=None, sr: Optional[int] = None, blocksize_ms: int = FRAME_MS,
+                      out_sr: Optional[int] = None, **endpointer_kwargs) -> tuple[np.ndarray, int]:
+    """
+    Record one utterance from the mic, ending on trailing silence.
+    Returns (float32 mono audio, sample rate).
+
+    With out_sr set (e.g. 16000) each block is resampled inside the callback
+    while the user is still talking, and the endpointer/buffer run at out_sr.
+    """
+    import sounddevice as sd
+
+    if sr is None:
+        sr = int(sd.query_devices(device, "input")["default_samplerate"])
+    rs = StreamingResampler(sr, out_sr) if out_sr and out_sr != sr else None
+    ep = Endpointer(out_sr or sr, **endpointer_kwargs)
+    finished = threading.Event()
+
+    def _callback(indata, frames, time_info, status):
+        block = indata[:, 0] if rs is None else rs.process(indata[:, 0])
+        if ep.feed(block):
+            finished.set()
+            raise sd.CallbackStop()
+
+    with sd.InputStream(device=device, samplerate=sr, channels=1, dtype="float32",
+                        blocksize=sr * blocksize_ms // 1000, callback=_callback,
+                        finished_callback=finished.set):
+        finished.wait()
+
+    audio = ep.audio().copy()
+    if rs is not None and ep.triggered and ep.reason != "max_length":
+        # the resampler still holds the last filter-delay samples; the endpoint
+        # fell inside the last block, so keep its rest to stay contiguous
+        audio = np.concatenate((audio, ep.rest, rs.flush()))
+
+    print(f"[MIC] Endpoint: {ep.reason}, {len(audio) / ep.sr:.2f}s captured.")
+    current_turn().note(endpoint=ep.reason, capture_audio_s=round(len(audio) / ep.sr, 3))
+    return audio, ep.sr
+
+
+def pause_splits(audio: np.ndarray, sr: int, min_gap_ms: int = SPLIT_GAP_MS, min_chunk_s: float = SPLIT_MIN_S,
+                 max_chunks: int = SPLIT_MAX_CHUNKS, vad: Optional[EnergyVAD] = None) -> list[int]:
+    """
+    Sample offsets to cut a captured utterance at for incremental decoding:
+    the middle of each pause (min_gap_ms of non-speech after speech), earliest
+    first, keeping every chunk at least min_chunk_s long. Empty if there is no
+    usable pause.
+    """
+    vad = vad or EnergyVAD()
+    frame_len = sr * FRAME_MS // 1000
+    gap_frames = max(min_gap_ms // FRAME_MS, 1)
+    min_len = int(min_chunk_s * sr)
+    cuts, last, run, heard = [], 0, 0, False
+    for i in range(len(audio) // frame_len):
+        if not vad.is_speech(audio[i * frame_len:(i + 1) * frame_len]):
+            run += 1
+            continue
+        if heard and run >= gap_frames:
+            cut = (i - run + run // 2) * frame_len
+            if cut - last >= min_len and len(audio) - cut >= min_len:
+                cuts.append(cut)
+                last = cut
+                if len(cuts) >= max_chunks - 1:
+                    break
+        heard, run = True, 0
+    return cuts
+
+
+def endpoint_file(path: str, sr: int = 16000, chunk_ms: int = 32, **endpointer_kwargs) -> tuple[np.ndarray, Endpointer]:
+    """
+    Run a recorded file (e.g. Audio/asar.ogg) through the same Endpointer in
+    mic-sized chunks. Returns (captured audio, endpointer) for inspection.
+    """
+    from faster_whisper.audio import decode_audio
+
+    audio = decode_audio(path, sampling_rate=sr)
+    ep = Endpointer(sr, **endpointer_kwargs)
+    step = sr * chunk_ms // 1000
+    for i in range(0, len(audio), step):
+        if ep.feed(audio[i:i + step]):
+            break
+    if not ep.done:
+        ep._finish("end_of_file")
+    return ep.audio().copy(), ep
+
+
+if __name__ == "__main__":
+    import sys
+    import glob
+    import os
+
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "Audio", "*.ogg")))
+    for p in paths:
+        audio, ep = endpoint_file(p)
+        print(f"{os.path.basename(p):40s} {ep.reason:12s} {ep.seconds:5.2f}s  speech_frames={ep.speech_frames}")
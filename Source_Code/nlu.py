@@ -0,0 +1,399 @@
+"""
+Compiled query parser for the router.
+
+All lookup tables (places, prayer synonyms, intent phrases, weekdays,
+months) are compiled once into a phrase trie keyed by token. A query is
+normalized and tokenized once, scanned once, and the result is a
+ParsedQuery that every router function reads instead of re-parsing.
+
+With a Gazetteer the parser also knows every JAKIM zone nationwide; the
+router's own place table still wins, and a spoken state name settles
+places that exist in more than one state.
+"""
+import re
+from datetime import date, timedelta
+from typing import Optional
+
+from dateutil.relativedelta import relativedelta
+
+from gazetteer import Gazetteer, TrigramIndex, STATE_ALIASES
+
+try:
+    from rapidfuzz import process, fuzz
+    _HAS_FUZZ = True
+except Exception:
+    _HAS_FUZZ = False
+
+# Intent phrases -> flag name on ParsedQuery.flags
+INTENT_PHRASES = {
+    "waktu solat": "waktu_solat",
+    "waktu": "waktu",
+    "waktu hari ini": "timetable_day",
+    "waktu esok": "timetable_day",
+    "waktu lusa": "timetable_day",
+    "minit": "minit",
+    "berapa minit": "ask_mins",
+    "minit lagi": "ask_mins",
+    "berapa lama": "ask_mins",
+    "berapa menit": "ask_mins",
+    "menit lagi": "ask_mins",
+    "dah masuk": "ask_entered",
+    "sudah masuk": "ask_entered",
+    "masuk belum": "ask_entered",
+    "assalamualaikum": "greeting",
+    "hari ini": "hari_ini",
+    "esok": "esok",
+    "lusa": "lusa",
+    "minggu depan": "minggu_depan",
+    "bulan depan": "bulan_depan",
+}
+
+# Flags that on their own make an utterance a prayer-time question
+PRAYER_INTENT_FLAGS = {"waktu", "waktu_solat", "minit", "ask_mins", "ask_entered"}
+
+_NUM_DATE = re.compile(r"\b(\d{1,2})[/-](\d{1,2})(?:[/-](\d{4}))?\b")
+_TOKEN = re.compile(r"[\w/-]+")
+_WORD = re.compile(r"[a-z]+")
+
+MEMO_SIZE = 8192
+
+
+class PhraseTrie:
+    """
+    Token-level trie: first token -> [(phrase tokens, kind, value)], longest first.
+    scan() walks the token list once and reports every phrase occurrence.
+    """
+
+    def __init__(self):
+        self._by_first: dict[str, list[tuple[tuple[str, ...], str, object]]] = {}
+
+    def add(self, phrase: str, kind: str, value):
+        toks = tuple(_TOKEN.findall(phrase))     # tokenized like queries ("fraser's hill")
+        bucket = self._by_first.setdefault(toks[0], [])
+        bucket.append((toks, kind, value))
+        bucket.sort(key=lambda e: len(e[0]), reverse=True)
+
+    def scan(self, tokens: list[str]):
+        """Yields (position, phrase length, kind, value) for every match."""
+        for i, tok in enumerate(tokens):
+            for toks, kind, value in self._by_first.get(tok, ()):
+                n = len(toks)
+                if n == 1 or tuple(tokens[i:i + n]) == toks:
+                    yield i, n, kind, value
+
+
+class ParsedQuery:
+    """Everything the router needs to know about one utterance."""
+
+    __slots__ = ("text", "tokens", "flags", "prayer", "place", "zone", "zone_found",
+                 "zone_alternatives", "states", "target_date", "day_label", "today")
+
+    def __init__(self, text: str, tokens: list[str], today: date):
+        self.text = text
+        self.tokens = tokens
+        self.flags: set[str] = set()
+        self.prayer: Optional[str] = None
+        self.place: Optional[str] = None
+        self.zone: Optional[str] = None
+        self.zone_found = False
+        self.zone_alternatives: tuple[str, ...] = ()   # other zones with the same place name
+        self.states: set[str] = set()                  # states named in the utterance
+        self.target_date = today
+        self.day_label = "hari ini"
+        self.today = today
+
+    def has(self, flag: str) -> bool:
+        return flag in self.flags
+
+    @property
+    def ask_mins(self) -> bool:
+        return "ask_mins" in self.flags
+
+    @property
+    def ask_entered(self) -> bool:
+        return "ask_entered" in self.flags
+
+    @property
+    def is_greeting(self) -> bool:
+        return "greeting" in self.flags
+
+    @property
+    def is_prayer_intent(self) -> bool:
+        return bool(self.prayer) or not self.flags.isdisjoint(PRAYER_INTENT_FLAGS)
+
+    @property
+    def wants_timetable(self) -> bool:
+        """General "waktu solat ..." question without a specific prayer."""
+        return not self.prayer and ("waktu_solat" in self.flags or "timetable_day" in self.flags)
+
+    @property
+    def date_given(self) -> bool:
+        """The day was said ("esok", "jumaat", "5 januari", "hari ini"), not defaulted to today."""
+        return self.day_label != "hari ini" or "hari_ini" in self.flags
+
+    def __repr__(self):
+        return (f"ParsedQuery(text={self.text!r}, prayer={self.prayer!r}, zone={self.zone!r}, "
+                f"date={self.target_date}, label={self.day_label!r}, flags={sorted(self.flags)})")
+
+
+class QueryParser:
+    def __init__(self, place_to_zone: dict, prayer_synonyms: dict, weekdays: dict, months: dict,
+                 rewrite: Optional[dict] = None, default_zone: str = "SGR01",
+                 place_threshold: int = 86, prayer_threshold: int = 85,
+                 gazetteer: Optional[Gazetteer] = None):
+        self.place_to_zone = dict(place_to_zone)
+        self.gazetteer = gazetteer
+        self.home_state = gazetteer.state_of(default_zone) if gazetteer else None
+        self.weekdays = dict(weekdays)
+        self.months = dict(months)
+        self.rewrite = dict(rewrite or {})
+        self.default_zone = default_zone
+        self.place_threshold = place_threshold
+        self.prayer_threshold = prayer_threshold
+
+        # values carry a rank = table order, so when several places/prayers/weekdays
+        # are mentioned the one listed first in the table wins (as the old loops did);
+        # for places a longer matched name comes first
+        self.trie = PhraseTrie()
+        for rank, (place, zone) in enumerate(self.place_to_zone.items()):
+            self.trie.add(place, "place", (rank, place, zone))
+        place_keys = list(self.place_to_zone)
+        if gazetteer:
+            # nationwide names rank after the local table; zone is resolved per query
+            rank = len(place_keys)
+            for place in gazetteer.places():
+                if place not in self.place_to_zone:
+                    self.trie.add(place, "place", (rank, place, None))
+                    rank += 1
+                    if place not in gazetteer.gated:
+                        place_keys.append(place)
+            for name, state in STATE_ALIASES.items():
+                self.trie.add(name, "state", state)
+        self.syn_to_canon = {}
+        for rank, (canon, syns) in enumerate(prayer_synonyms.items()):
+            for s in syns:
+                self.syn_to_canon.setdefault(s, canon)
+                self.trie.add(s, "prayer", (rank, canon))
+        for phrase, flag in INTENT_PHRASES.items():
+            self.trie.add(phrase, "flag", flag)
+        for rank, (name, wd) in enumerate(self.weekdays.items()):
+            self.trie.add(name, "weekday", (rank, name, wd))
+        for name, mm in self.months.items():
+            self.trie.add(name, "month", mm)
+
+        # prayer synonyms that are also a place/state word ("johor") only count
+        # when nothing else claims them; see parse()
+        self._weak_syns = {s for s in self.syn_to_canon
+                           if any(kind in ("place", "state") for toks, kind, _ in self.trie._by_first.get(s, ()))}
+        self._syn_keys = [s for s in self.syn_to_canon if s not in self._weak_syns]
+
+        # every word of a known phrase, so "minitnya" / "lamanya" can fall back to the stem
+        self._known_words = {t for bucket in self.trie._by_first.values() for toks, _, _ in bucket for t in toks}
+
+        self._place_keys = place_keys
+        self._place_index = TrigramIndex(place_keys) if gazetteer else None
+        # word / n-gram -> fuzzy result, so repeated words skip rapidfuzz entirely
+        self._prayer_memo: dict[str, Optional[str]] = {}
+        self._place_memo: dict[str, tuple[str, float]] = {}
+
+    def normalize(self, s: str) -> tuple[str, list[str]]:
+        s = (s or "").lower().replace(".", " ")
+        tokens = [self._stem(self.rewrite.get(t, t)) for t in _TOKEN.findall(s)]
+        return " ".join(tokens), tokens
+
+    def _stem(self, tok: str) -> str:
+        """Drop the "-nya" suffix ("berapa lamanya", "minitnya") when the stem is a known word."""
+        if tok.endswith("nya") and tok not in self._known_words:
+            stem = tok[:-3].rstrip("-")
+            if stem in self._known_words:
+                return stem
+        return tok
+
+    def parse(self, user_text: str, today: Optional[date] = None) -> ParsedQuery:
+        today = today or date.today()
+        text, tokens = self.normalize(user_text)
+        q = ParsedQuery(text, tokens, today)
+
+        weekday = prayer = None
+        places = []
+        weak = []          # (position, prayer) from synonyms that are also place/state words
+        claimed = set()    # token positions inside a matched place or state name
+        month_at = {}
+        for i, n, kind, value in self.trie.scan(tokens):
+            if kind == "flag":
+                q.flags.add(value)
+            elif kind == "prayer":
+                if tokens[i] in self._weak_syns:
+                    weak.append((i, value))
+                elif prayer is None or value < prayer:
+                    prayer = value
+            elif kind == "place":
+                places.append((-n, value))
+                claimed.update(range(i, i + n))
+            elif kind == "state":
+                q.states.add(value)
+                claimed.update(range(i, i + n))
+            elif kind == "weekday":
+                if weekday is None or value < weekday:
+                    weekday = value
+            elif kind == "month":
+                month_at[i] = value
+
+        if prayer is None:
+            prayer = min((v for i, v in weak if i not in claimed), default=None)
+        if prayer:
+            q.prayer = prayer[1]
+        # the longest name wins ("kuala rompin" over "rompin"); rank breaks ties
+        for _, (_, place, zone) in sorted(places):
+            zone, alternatives = (zone, ()) if zone else self._resolve_place(place, q.states)
+            if zone:
+                q.place, q.zone, q.zone_alternatives = place, zone, alternatives
+                break
+
+        if q.prayer is None and _HAS_FUZZ:
+            q.prayer = self._fuzzy_prayer(text)
+        if q.zone is None and (_HAS_FUZZ or self._place_index):
+            place = self._fuzzy_place(tokens)
+            if place:
+                if place in self.place_to_zone:
+                    q.place, q.zone = place, self.place_to_zone[place]
+                else:
+                    q.place = place
+                    q.zone, q.zone_alternatives = self._resolve_place(place, q.states)
+        if q.zone is None and self.gazetteer and len(q.states) == 1:
+            q.zone = self.gazetteer.state_zone(next(iter(q.states)))
+        q.zone_found = q.zone is not None
+        if q.zone is None:
+            q.zone = self.default_zone
+
+        q.target_date, q.day_label = self._resolve_date(q, text, tokens, weekday, month_at)
+        return q
+
+    def _resolve_place(self, place: str, states: set[str]) -> tuple[Optional[str], tuple[str, ...]]:
+        return self.gazetteer.resolve(place, states, prefer_state=self.home_state)
+
+    # ----------------------------
+    # Fuzzy fallbacks (one vectorized call / one index probe each)
+    # ----------------------------
+    def _fuzzy_prayer(self, text: str) -> Optional[str]:
+        words = _WORD.findall(text)
+        memo = self._prayer_memo
+        todo = [w for w in dict.fromkeys(words) if w not in memo]
+        if todo:
+            scores = process.cdist(todo, self._syn_keys, scorer=fuzz.ratio, workers=1)
+            for w, row in zip(todo, scores):
+                j = int(row.argmax())
+                memo[w] = self.syn_to_canon[self._syn_keys[j]] if row[j] >= self.prayer_threshold else None
+        # first word that matches, as before; trim only after reading this query's entries
+        found = next((memo[w] for w in words if memo[w]), None)
+        _trim(memo, MEMO_SIZE)
+        return found
+
+    def _fuzzy_place(self, tokens: list[str]) -> Optional[str]:
+        grams = []
+        for n in (3, 2, 1):
+            for i in range(len(tokens) - n + 1):
+                grams.append(" ".join(tokens[i:i + n]))
+        memo = self._place_memo
+        todo = [g for g in dict.fromkeys(grams) if g not in memo]
+        if todo and self._place_index:
+            # nationwide list: trigram prefilter, rapidfuzz only on the shortlist
+            for g in todo:
+                hits = [h for h in self._place_index.search(g, limit=5)
+                        if h[0] in self.place_to_zone or _wordwise_close(g, h[0])]
+                memo[g] = hits[0] if hits else (None, 0.0)
+        elif todo:
+            scores = process.cdist(todo, self._place_keys, scorer=fuzz.ratio, workers=1)
+            for g, row in zip(todo, scores):
+                j = int(row.argmax())
+                memo[g] = (self._place_keys[j], float(row[j]))
+
+        best_place, best_score = None, 0.0
+        for g in grams:
+            place, score = memo[g]
+            if score > best_score:
+                best_place, best_score = place, score
+        _trim(memo, MEMO_SIZE)
+        if best_place and best_score >= self.place_threshold:
+            return best_place
+        return None
+
+    # ----------------------------
+    # Dates
+    # ----------------------------
+    def _resolve_date(self, q: ParsedQuery, text: str, tokens: list[str], weekday, month_at) -> tuple[date, str]:
+        today = q.today
+
+        # 1) Specific numeric date formats: 05/01/2026 or 05-01
+        m = _NUM_DATE.search(text)
+        if m:
+            dd, mm = int(m.group(1)), int(m.group(2))
+            yy = int(m.group(3)) if m.group(3) else today.year
+            cand = _safe_date(yy, mm, dd)
+            if cand:
+                if not m.group(3) and cand < today:
+                    cand = _safe_date(today.year + 1, mm, dd) or cand
+                return cand, cand.strftime("%d-%m-%Y")
+
+        # 2) Specific Malay date: "5 januari" / "5 januari 2026"
+        for i, mm in sorted(month_at.items()):
+            if i == 0 or not tokens[i - 1].isdigit() or len(tokens[i - 1]) > 2:
+                continue
+            dd = int(tokens[i - 1])
+            explicit_year = i + 1 < len(tokens) and len(tokens[i + 1]) == 4 and tokens[i + 1].isdigit()
+            yy = int(tokens[i + 1]) if explicit_year else today.year
+            cand = _safe_date(yy, mm, dd)
+            if cand:
+                if not explicit_year and cand < today:
+                    cand = _safe_date(today.year + 1, mm, dd) or cand
+                return cand, cand.strftime("%d-%b-%Y")
+
+        # 3) Weekday: "jumaat" / "jumaat depan"
+        if weekday is not None:
+            _, name, wd = weekday
+            delta = (wd - today.weekday()) % 7 or 7
+            cand = today + timedelta(days=delta)
+            if q.has("minggu_depan"):
+                cand = cand + timedelta(days=7)
+            return cand, name
+
+        # 4) Relative keywords (priority: lusa > esok > today)
+        if q.has("lusa"):
+            return today + timedelta(days=2), "lusa"
+        if q.has("esok"):
+            return today + timedelta(days=1), "esok"
+
+        # 5) Week/month ahead
+        if q.has("minggu_depan"):
+            return today + timedelta(days=7), "minggu depan"
+        if q.has("bulan_depan"):
+            return today + relativedelta(months=+1), "bulan depan"
+
+        return today, "hari ini"
+
+
+def _wordwise_close(gram: str, name: str, threshold: int = 80) -> bool:
+    """
+    With hundreds of names a whole-string ratio lets one exact word carry a
+    garbled one ("kuala asar" ~ "kuala kangsar"); same-length phrases must
+    also match word by word.
+    """
+    gw, nw = gram.split(), name.split()
+    if len(gw) != len(nw) or len(gw) == 1 or not _HAS_FUZZ:
+        return True
+    return all(fuzz.ratio(a, b) >= threshold for a, b in zip(gw, nw))
+
+
+def _trim(memo: dict, size: int):
+    """Drop oldest entries (dicts keep insertion order) once over size."""
+    extra = len(memo) - size
+    if extra > 0:
+        for k in list(memo)[:extra]:
+            del memo[k]
+
+
+def _safe_date(yy: int, mm: int, dd: int) -> Optional[date]:
+    try:
+        return date(yy, mm, dd)
+    except ValueError:
+        return None
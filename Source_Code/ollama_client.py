@@ -1,20 +1,303 @@
+import os
+import re
+import json
+import time
+import threading
+from typing import Iterable, Iterator, Optional
+
 import requests
 
-def ollama_generate(prompt: str, model: str = "llama3:latest", host: str = "http://localhost:11434") -> str:
+from metrics import current_turn
+
+# Override with OLLAMA_HOST=http://127.0.0.1:xxxx (e.g. fake_ollama.py or a LAN box)
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+if "://" not in OLLAMA_HOST:
+    OLLAMA_HOST = "http://" + OLLAMA_HOST
+
+# Start of the text returned instead of an answer when Ollama can't be reached
+ERROR_PREFIX = "Maaf, saya tak dapat hubungi Ollama"
+STREAM_ENDED = "stream ended without a reply"      # error detail when a stream is cut off before any text
+
+# How long Ollama keeps the model loaded after a request ("30m", "1h", -1 = forever).
+# Ollama's own default is 5m, after which the next question pays the full reload.
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+def ollama_generate(prompt: str, model: str = "llama3:latest", host: Optional[str] = None) -> str:
     """
     Simple text generation via Ollama local REST API.
     Ollama is already running in your machine (port 11434).
     """
+    host = host or OLLAMA_HOST
     url = f"{host}/api/generate"
     payload = {
         "model": model,          # e.g. "llama3:latest" or "qwen2.5:7b"
         "prompt": prompt,
-        "stream": False
+        "stream": False,
+        "keep_alive": KEEP_ALIVE,
     }
 
     try:
         r = requests.post(url, json=payload, timeout=60)
         r.raise_for_status()
-        return (r.json().get("response") or "").strip()
+        body = r.json()
+        note_timings(body)
+        return (body.get("response") or "").strip()
+    except requests.exceptions.RequestException as e:
+        return f"{ERROR_PREFIX} di {host}. Error: {e}"
+
+
+def ollama_generate_stream(prompt: str, model: str = "llama3:latest", host: Optional[str] = None,
+                           cancel: Optional[threading.Event] = None) -> Iterator[str]:
+    """
+    Streaming variant: yields text chunks as Ollama produces them (NDJSON lines).
+    Set `cancel` to stop early; the HTTP response is closed so Ollama stops generating.
+    Malformed lines are skipped; a stream cut off before any text yields the error message.
+    """
+    host = host or OLLAMA_HOST
+    url = f"{host}/api/generate"
+    payload = {"model": model, "prompt": prompt, "stream": True, "keep_alive": KEEP_ALIVE}
+
+    got = False
+    try:
+        with requests.post(url, json=payload, stream=True, timeout=60) as r:
+            r.raise_for_status()
+            for msg in _ndjson(r, cancel):
+                chunk = msg.get("response") or ""
+                if chunk:
+                    got = True
+                    yield chunk
+                if msg.get("done"):
+                    note_timings(msg)
+                    return
     except requests.exceptions.RequestException as e:
-        return f"Maaf, saya tak dapat hubungi Ollama di {host}. Error: {e}"
+        yield f"{ERROR_PREFIX} di {host}. Error: {e}"
+        return
+    if not got and not (cancel is not None and cancel.is_set()):
+        yield f"{ERROR_PREFIX} di {host}. Error: {STREAM_ENDED}"
+
+
+def _ndjson(r: requests.Response, cancel: Optional[threading.Event] = None) -> Iterator[dict]:
+    """
+    Messages of a streaming Ollama response, until it ends or `cancel` is set.
+    A malformed or truncated line (proxy, dropped connection) is logged and
+    skipped instead of raising in the middle of a spoken reply.
+    """
+    for line in r.iter_lines():
+        if cancel is not None and cancel.is_set():
+            return
+        if not line:
+            continue
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            print(f"[OLLAMA] Skipped malformed stream line: {line[:80]!r}")
+            current_turn().note(error="llm_stream")
+            continue
+        if isinstance(msg, dict):
+            yield msg
+
+
+# ----------------------------
+# Timings reported by Ollama (nanoseconds in the final message)
+# ----------------------------
+def timings(msg: dict) -> dict:
+    """load / prompt-eval / eval split of one request, in seconds and tokens."""
+    ns = 1e-9
+    return {
+        "load_s": (msg.get("load_duration") or 0) * ns,
+        "prompt_tokens": msg.get("prompt_eval_count") or 0,
+        "prompt_eval_s": (msg.get("prompt_eval_duration") or 0) * ns,
+        "eval_tokens": msg.get("eval_count") or 0,
+        "eval_s": (msg.get("eval_duration") or 0) * ns,
+    }
+
+
+def note_timings(msg: dict) -> dict:
+    """Attach the timing split to the current traced turn (llm_* notes)."""
+    t = timings(msg)
+    current_turn().note(**{f"llm_{k}": round(v, 4) if isinstance(v, float) else v for k, v in t.items()})
+    return t
+
+
+def prewarm(model: str = "llama3:latest", host: Optional[str] = None, system: Optional[str] = None,
+            background: bool = True):
+    """
+    Load the model now (and pin it for KEEP_ALIVE) so the first question
+    doesn't pay the load. With a system prompt, that prefix is evaluated too,
+    so later chats that start with it reuse Ollama's prompt cache.
+    """
+    def _run():
+        base = host or OLLAMA_HOST
+        messages = [{"role": "system", "content": system}] if system else []
+        payload = {"model": model, "messages": messages, "stream": False, "keep_alive": KEEP_ALIVE}
+        if system:
+            payload["options"] = {"num_predict": 1}
+        try:
+            r = requests.post(f"{base}/api/chat", json=payload, timeout=300)
+            r.raise_for_status()
+            t = timings(r.json())
+            print(f"[OLLAMA] {model} warm (load {t['load_s']:.1f}s, prompt {t['prompt_tokens']} tok "
+                  f"in {t['prompt_eval_s']:.2f}s)")
+        except requests.exceptions.RequestException as e:
+            print(f"[OLLAMA] Pre-warm failed: {e}")
+
+    if not background:
+        _run()
+        return None
+    th = threading.Thread(target=_run, name="ollama-prewarm", daemon=True)
+    th.start()
+    return th
+
+
+# ----------------------------
+# Chat session: stable prefix + bounded history
+# ----------------------------
+def approx_tokens(text: str) -> int:
+    """~4 characters per token; good enough for budgeting Malay/English text."""
+    return len(text) // 4 + 1
+
+
+class ChatSession:
+    """
+    Multi-turn /api/chat conversation.
+
+    Every request starts with the same system message followed by the kept
+    history, so Ollama finds the previous prompt as a cached prefix and only
+    evaluates the new user turn. History is trimmed oldest-first to stay
+    within max_history_tokens (trimming changes the prefix once, then it is
+    stable again). Replies that were cancelled or failed are not recorded.
+    After idle_reset_s without a question the next one starts a new
+    conversation.
+    """
+
+    def __init__(self, model: str = "llama3:latest", system: str = "", host: Optional[str] = None,
+                 max_history_tokens: int = 1024, keep_alive: Optional[str] = None,
+                 idle_reset_s: float = 300.0):
+        self.model = model
+        self.system = system
+        self.host = host
+        self.max_history_tokens = max_history_tokens
+        self.keep_alive = keep_alive
+        self.idle_reset_s = idle_reset_s
+        self.history: list[dict] = []
+        self._last_at = 0.0
+        self.last: dict = {}
+        self.totals = {"requests": 0, "load_s": 0.0, "prompt_tokens": 0, "prompt_eval_s": 0.0,
+                       "eval_tokens": 0, "eval_s": 0.0}
+        self._http = requests.Session()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.history.clear()
+
+    def in_conversation(self) -> bool:
+        """True if the next question would be a follow-up to recent turns."""
+        return bool(self.history) and time.monotonic() - self._last_at < self.idle_reset_s
+
+    def _messages(self, user_text: str) -> list[dict]:
+        with self._lock:
+            if self.history and time.monotonic() - self._last_at >= self.idle_reset_s:
+                self.history.clear()
+            budget = self.max_history_tokens - approx_tokens(user_text)
+            used = sum(approx_tokens(m["content"]) for m in self.history)
+            while self.history and used > budget:
+                # drop the oldest user/assistant pair
+                for m in self.history[:2]:
+                    used -= approx_tokens(m["content"])
+                del self.history[:2]
+            msgs = [{"role": "system", "content": self.system}] if self.system else []
+            return msgs + list(self.history) + [{"role": "user", "content": user_text}]
+
+    def _payload(self, user_text: str, stream: bool) -> dict:
+        return {"model": self.model, "messages": self._messages(user_text), "stream": stream,
+                "keep_alive": self.keep_alive or KEEP_ALIVE}
+
+    def _record(self, user_text: str, answer: str, final: dict):
+        t = note_timings(final)
+        with self._lock:
+            self.last = t
+            self.totals["requests"] += 1
+            for k, v in t.items():
+                self.totals[k] += v
+            self._append(user_text, answer)
+
+    def record(self, user_text: str, answer: str):
+        """Add a turn answered without Ollama (e.g. from the answer cache) so follow-ups see it."""
+        with self._lock:
+            if self.history and time.monotonic() - self._last_at >= self.idle_reset_s:
+                self.history.clear()
+            self._append(user_text, answer)
+
+    def _append(self, user_text: str, answer: str):
+        self.history += [{"role": "user", "content": user_text},
+                         {"role": "assistant", "content": answer}]
+        self._last_at = time.monotonic()
+
+    def ask(self, user_text: str) -> str:
+        host = self.host or OLLAMA_HOST
+        try:
+            r = self._http.post(f"{host}/api/chat", json=self._payload(user_text, False), timeout=60)
+            r.raise_for_status()
+            body = r.json()
+        except requests.exceptions.RequestException as e:
+            return f"{ERROR_PREFIX} di {host}. Error: {e}"
+        answer = ((body.get("message") or {}).get("content") or "").strip()
+        if answer:
+            self._record(user_text, answer, body)
+        return answer
+
+    def ask_stream(self, user_text: str, cancel: Optional[threading.Event] = None) -> Iterator[str]:
+        """Yields reply chunks; the turn joins the history only if it finished."""
+        host = self.host or OLLAMA_HOST
+        parts = []
+        try:
+            with self._http.post(f"{host}/api/chat", json=self._payload(user_text, True),
+                                 stream=True, timeout=60) as r:
+                r.raise_for_status()
+                for msg in _ndjson(r, cancel):
+                    chunk = (msg.get("message") or {}).get("content") or ""
+                    if chunk:
+                        parts.append(chunk)
+                        yield chunk
+                    if msg.get("done"):
+                        answer = "".join(parts).strip()
+                        if answer:
+                            self._record(user_text, answer, msg)
+                        return
+        except requests.exceptions.RequestException as e:
+            yield f"{ERROR_PREFIX} di {host}. Error: {e}"
+            return
+        # no final message: cancelled, or cut off (then it is not recorded either)
+        if not parts and not (cancel is not None and cancel.is_set()):
+            yield f"{ERROR_PREFIX} di {host}. Error: {STREAM_ENDED}"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"turns_kept": len(self.history) // 2, "last": dict(self.last), "totals": dict(self.totals)}
+
+
+# Sentence end, or a clause break once the buffer is long enough to be worth speaking
+_SENT_END = re.compile(r"[.!?\n]+[\"')\]]*\s")
+_CLAUSE_END = re.compile(r"[,;:]\s")
+MIN_CLAUSE_CHARS = 40
+
+def iter_sentences(chunks: Iterable[str], min_clause_chars: int = MIN_CLAUSE_CHARS) -> Iterator[str]:
+    """
+    Group streamed text chunks into speakable segments (sentences, or long clauses).
+    """
+    buf = ""
+    for chunk in chunks:
+        buf += chunk
+        while True:
+            m = _SENT_END.search(buf)
+            if not m and len(buf) >= min_clause_chars:
+                m = _CLAUSE_END.search(buf, min_clause_chars // 2)
+            if not m:
+                break
+            seg, buf = buf[:m.end()].strip(), buf[m.end():]
+            if seg:
+                yield seg
+    tail = buf.strip()
+    if tail:
+        yield tail
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import date, datetime
+from typing import Callable, Optional
+
+from metrics import current_turn
+
+# Cache file lives next to the code so it survives restarts on the Pi
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prayer_cache.sqlite3")
+
+# Re-fetch a zone/year in the background when it is older than this (seconds)
+REFRESH_AFTER = 7 * 24 * 3600
+
+
+def parse_esolat_date(s: str) -> Optional[date]:
+    """e-Solat returns dates like "03-Jan-2026"."""
+    try:
+        return datetime.strptime(s, "%d-%b-%Y").date()
+    except (TypeError, ValueError):
+        return None
+
+
+class TimetableStore:
+    """
+    Whole-year prayer timetable cache keyed by (zone, date).
+
+    - loader(zone, year) returns the e-Solat prayerTime list for that year
+    - rows are kept in SQLite on disk and mirrored in a dict for O(1) lookup
+    - stale zone/years are re-fetched on a background thread while the old
+      rows keep being served (so e-Solat outages don't break answers)
+    """
+
+    def __init__(self, loader: Callable[[str, int], list[dict]], path: str = DEFAULT_DB_PATH,
+                 refresh_after: float = REFRESH_AFTER):
+        self.loader = loader
+        self.path = path
+        self.refresh_after = refresh_after
+
+        self._lock = threading.Lock()
+        self._days: dict[tuple[str, str], dict] = {}
+        self._loaded_at: dict[tuple[str, int], float] = {}
+        self._refreshing: dict[tuple[str, int], threading.Event] = {}
+        self._listeners: list[Callable[[str, int], None]] = []
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS days ("
+            " zone TEXT NOT NULL, day TEXT NOT NULL, data TEXT NOT NULL,"
+            " PRIMARY KEY (zone, day))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS loads ("
+            " zone TEXT NOT NULL, year INTEGER NOT NULL, loaded_at REAL NOT NULL,"
+            " PRIMARY KEY (zone, year))"
+        )
+        self._db.commit()
+        self._read_all()
+
+    def _read_all(self):
+        with self._lock:
+            for zone, day, data in self._db.execute("SELECT zone, day, data FROM days"):
+                self._days[(zone, day)] = json.loads(data)
+            for zone, year, loaded_at in self._db.execute("SELECT zone, year, loaded_at FROM loads"):
+                self._loaded_at[(zone, year)] = loaded_at
+
+    def get(self, zone: str, target: date, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Return the e-Solat day entry for (zone, target), loading its year on a miss.
+        With a timeout the load runs in the background and None comes back if it
+        takes longer (the load still finishes and fills the cache).
+        """
+        key = (zone, target.isoformat())
+        day = self._days.get(key)
+        if day is not None:
+            current_turn().note(timetable="hit")
+            self._maybe_refresh(zone, target.year)
+            return day
+
+        # miss: one bulk load for the whole year
+        turn = current_turn()
+        turn.note(timetable="miss")
+        with turn.stage("esolat_fetch"):
+            if timeout is None:
+                self.load_year(zone, target.year)
+            else:
+                self.refresh_async(zone, target.year).wait(timeout)
+        return self._days.get(key)
+
+    def load_year(self, zone: str, year: int) -> int:
+        """Fetch and store a full year for a zone. Returns number of days stored."""
+        try:
+            items = self.loader(zone, year)
+        except Exception as e:
+            print(f"[PRAYER] Could not load {zone} {year}: {e}")
+            return 0
+        return self.put_year(zone, year, items)
+
+    def put_year(self, zone: str, year: int, items: list[dict], fill: bool = False) -> int:
+        """
+        Store e-Solat day entries for a zone/year. fill=True is for stand-in
+        rows (prayer_calc): only days not cached yet are written and the year
+        stays due for a refresh, so real e-Solat rows replace them later.
+        """
+        rows = []
+        for it in items:
+            d = parse_esolat_date(it.get("date"))
+            if d is not None:
+                rows.append((zone, d.isoformat(), it))
+        if not rows:
+            return 0
+
+        now = time.time()
+        with self._lock:
+            if fill:
+                rows = [r for r in rows if (r[0], r[1]) not in self._days]
+                if not rows:
+                    return 0
+                now = self._loaded_at.get((zone, year), 0.0)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO days (zone, day, data) VALUES (?, ?, ?)",
+                [(z, d, json.dumps(it)) for z, d, it in rows],
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO loads (zone, year, loaded_at) VALUES (?, ?, ?)",
+                (zone, year, now),
+            )
+            self._db.commit()
+            for z, d, it in rows:
+                self._days[(z, d)] = it
+            self._loaded_at[(zone, year)] = now
+        for fn in list(self._listeners):
+            try:
+                fn(zone, year)
+            except Exception as e:
+                print(f"[PRAYER] Listener failed: {e}")
+        return len(rows)
+
+    def subscribe(self, fn: Callable[[str, int], None]):
+        """fn(zone, year) after every (re)load, e.g. to re-arm the adhan scheduler."""
+        self._listeners.append(fn)
+
+    def _maybe_refresh(self, zone: str, year: int):
+        loaded_at = self._loaded_at.get((zone, year), 0.0)
+        if time.time() - loaded_at < self.refresh_after:
+            return
+        self.refresh_async(zone, year)
+
+    def refresh_async(self, zone: str, year: int) -> threading.Event:
+        """Re-fetch a zone/year on a daemon thread (joins a load already running). The event is set when done."""
+        key = (zone, year)
+        with self._lock:
+            done = self._refreshing.get(key)
+            if done is not None:
+                return done
+            done = self._refreshing[key] = threading.Event()
+
+        def _run():
+            try:
+                self.load_year(zone, year)
+            finally:
+                with self._lock:
+                    self._refreshing.pop(key, None)
+                done.set()
+
+        threading.Thread(target=_run, name=f"prayer-refresh-{zone}-{year}", daemon=True).start()
+        return done
+
+    def prefetch(self, zone: str, year: int) -> bool:
+        """Start loading a zone/year in the background if it isn't cached. Returns True if started."""
+        if (zone, year) in self._loaded_at:
+            return False
+        self.refresh_async(zone, year)
+        return True
+
+    def preload(self, zones: list[str], year: Optional[int] = None):
+        """Make sure every zone has the given year (default: this year) cached."""
+        year = year or date.today().year
+        for zone in zones:
+            if (zone, year) not in self._loaded_at:
+                self.load_year(zone, year)
+            else:
+                self._maybe_refresh(zone, year)
+
+    def zones(self) -> list[str]:
+        return sorted({z for z, _ in self._loaded_at})
+
+    def close(self):
+        with self._lock:
+            self._db.close()
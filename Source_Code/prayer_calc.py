@@ -0,0 +1,270 @@
+"""
+Offline prayer-time calculation (no e-Solat needed).
+
+Sun position (declination + equation of time) and the JAKIM parameters give
+imsak / subuh / syuruk / dhuha / zohor / asar / maghrib / isyak for any zone
+reference point in zones.tsv. Everything is NumPy arrays shaped (prayer,
+zone, day), so a whole year for every zone is one batched call (~100 ms on a
+desktop CPU; see --bench).
+
+JAKIM parameters used:
+    subuh   sun 18° below the horizon       isyak   18° below
+    syuruk / maghrib  sun's upper limb on the horizon (-0.833°, refraction included)
+    dhuha   sun 4.8° above the horizon      asar    shadow = object + noon shadow (Shafi'i)
+    imsak   subuh - 10 min                  ihtiyati (safety margin) +2 min, syuruk -2 min
+
+Used by prayer_tool as the fallback when e-Solat is slow or down: the year is
+computed and written to the timetable cache marked stale, so answers work at
+once and real e-Solat rows replace it as soon as a refresh succeeds.
+
+    python prayer_calc.py --zone WLY01 --date 2026-01-15     # one day
+    python prayer_calc.py --validate                          # vs cached e-Solat rows
+    python prayer_calc.py --bench                             # all zones, full year
+"""
+import json
+import time
+import argparse
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+
+TZ_HOURS = 8.0                     # Malaysia time, no DST
+
+FAJR_ANGLE = 18.0                  # JAKIM used 20° before its subuh review
+ISHA_ANGLE = 18.0
+HORIZON_ALT = -0.833               # sunrise / sunset
+DHUHA_ALT = 4.8
+ASR_FACTOR = 1.0                   # Shafi'i
+IMSAK_BEFORE_MIN = 10
+IHTIYATI_MIN = {"fajr": 2, "syuruk": -2, "dhuha": 2, "dhuhr": 2, "asr": 2, "maghrib": 2, "isha": 2}
+ITERATIONS = 2                     # re-evaluate the sun at each estimated time
+
+# e-Solat day entry fields, in the order they are computed
+KEYS = ("fajr", "syuruk", "dhuha", "dhuhr", "asr", "maghrib", "isha")
+ALL_KEYS = ("imsak",) + KEYS
+NAMES = {"imsak": "imsak", "fajr": "subuh", "syuruk": "syuruk", "dhuha": "dhuha", "dhuhr": "zohor",
+         "asr": "asar", "maghrib": "maghrib", "isha": "isyak"}
+_GUESS_H = {"fajr": 5.0, "syuruk": 6.0, "dhuha": 7.0, "dhuhr": 12.0, "asr": 15.0, "maghrib": 18.0, "isha": 19.5}
+
+
+def _sun(jd: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Declination (radians) and equation of time (hours) at Julian day jd."""
+    d = jd - 2451545.0
+    g = np.radians(357.529 + 0.98560028 * d)
+    q = (280.459 + 0.98564736 * d) % 360.0
+    lam = np.radians(q + 1.915 * np.sin(g) + 0.020 * np.sin(2 * g))
+    eps = np.radians(23.439 - 0.00000036 * d)
+    ra = (np.degrees(np.arctan2(np.cos(eps) * np.sin(lam), np.cos(lam))) / 15.0) % 24.0
+    decl = np.arcsin(np.sin(eps) * np.sin(lam))
+    eqt = (q / 15.0 - ra + 12.0) % 24.0 - 12.0
+    return decl, eqt
+
+
+def _hour_angle(alt_deg, lat: np.ndarray, decl: np.ndarray) -> np.ndarray:
+    """Hours between solar noon and the sun being at altitude alt_deg."""
+    cos_h = (np.sin(np.radians(alt_deg)) - np.sin(lat) * np.sin(decl)) / (np.cos(lat) * np.cos(decl))
+    return np.degrees(np.arccos(np.clip(cos_h, -1.0, 1.0))) / 15.0
+
+
+def solar_times(lat_deg, lon_deg, days) -> dict[str, np.ndarray]:
+    """
+    lat_deg, lon_deg: (Z,) zone reference points; days: (D,) datetime64[D].
+    Returns {e-Solat key: (Z, D) minutes after local midnight}, ihtiyati and rounding applied.
+    """
+    lat = np.radians(np.asarray(lat_deg, dtype=np.float64))[:, None]
+    lon = np.asarray(lon_deg, dtype=np.float64)[:, None]
+    jd0 = np.asarray(days, dtype="datetime64[D]").astype(np.int64)[None, :] + 2440587.5   # 00:00 UT
+
+    # one (prayer, zone, day) array, so each iteration is a single sun evaluation
+    alt = np.array([{"fajr": -FAJR_ANGLE, "syuruk": HORIZON_ALT, "dhuha": DHUHA_ALT, "dhuhr": 0.0,
+                     "asr": 0.0, "maghrib": HORIZON_ALT, "isha": -ISHA_ANGLE}[k] for k in KEYS])[:, None, None]
+    sign = np.array([{"fajr": -1, "syuruk": -1, "dhuha": -1, "dhuhr": 0,
+                      "asr": 1, "maghrib": 1, "isha": 1}[k] for k in KEYS])[:, None, None]
+    asr = KEYS.index("asr")
+    hours = np.broadcast_to(np.array([_GUESS_H[k] for k in KEYS])[:, None, None],
+                            (len(KEYS), lat.shape[0], jd0.shape[1])).copy()
+    for _ in range(ITERATIONS):
+        decl, eqt = _sun(jd0 + (hours - TZ_HOURS) / 24.0)
+        noon = 12.0 + TZ_HOURS - lon / 15.0 - eqt
+        alt_now = np.broadcast_to(alt, hours.shape).copy()
+        alt_now[asr] = np.degrees(np.arctan(1.0 / (ASR_FACTOR + np.tan(np.abs(lat - decl[asr])))))
+        hours = noon + sign * _hour_angle(alt_now, lat, decl)
+    hours = dict(zip(KEYS, hours))
+
+    out = {}
+    for k in KEYS:
+        m = hours[k] * 60.0 + IHTIYATI_MIN[k]
+        # round toward the safe side: later for starts, earlier for syuruk (end of subuh)
+        out[k] = np.floor(m) if k == "syuruk" else np.ceil(m)
+    out["imsak"] = out["fajr"] - IMSAK_BEFORE_MIN
+    return out
+
+
+_HHMMSS = np.array([f"{m // 60:02d}:{m % 60:02d}:00" for m in range(24 * 60)], dtype=object)
+
+
+def compute(zones: Optional[Iterable[str]] = None, start: Optional[date] = None,
+            end: Optional[date] = None) -> dict[str, list[dict]]:
+    """
+    e-Solat style day entries for every zone (default: all in zones.tsv) and
+    every day start..end inclusive (default: this year), from one batched call.
+    """
+    from gazetteer import get_gazetteer
+    gz = get_gazetteer()
+    codes = list(zones) if zones is not None else list(gz.zones)
+    start = start or date(date.today().year, 1, 1)
+    end = end or date(start.year, 12, 31)
+
+    days = np.arange(np.datetime64(start), np.datetime64(end) + 1)
+    times = solar_times([gz.zones[z].lat for z in codes], [gz.zones[z].lon for z in codes], days)
+
+    labels = [(d.strftime("%d-%b-%Y"), d.strftime("%A"))
+              for d in (start + timedelta(days=i) for i in range(len(days)))]
+    text = {k: _HHMMSS[times[k].astype(np.int64) % (24 * 60)] for k in ALL_KEYS}
+    out = {}
+    for zi, zone in enumerate(codes):
+        cols = [text[k][zi] for k in ALL_KEYS]
+        out[zone] = [{"hijri": "", "date": ds, "day": dn, "source": "calc", **dict(zip(ALL_KEYS, vals))}
+                     for (ds, dn), vals in zip(labels, zip(*cols))]
+    return out
+
+
+def compute_year(zone: str, year: int) -> list[dict]:
+    """Same signature as prayer_tool.fetch_year."""
+    return compute([zone], date(year, 1, 1), date(year, 12, 31))[zone]
+
+
+def compute_day(zone: str, target: date) -> dict:
+    return compute([zone], target, target)[zone][0]
+
+
+# ----------------------------
+# Validation against cached e-Solat rows
+# ----------------------------
+def _minutes(hhmmss: str) -> Optional[float]:
+    try:
+        hh, mm, ss = map(int, hhmmss.split(":"))
+    except (AttributeError, ValueError):
+        return None
+    return hh * 60 + mm + ss / 60.0
+
+
+def validate(store, zones: Optional[Iterable[str]] = None) -> dict:
+    """
+    Per-prayer deviation (calculated - e-Solat, minutes) over every real
+    e-Solat row in the timetable cache. Rows we calculated ourselves are skipped.
+    """
+    from prayer_cache import parse_esolat_date
+    from gazetteer import get_gazetteer
+    gz = get_gazetteer()
+
+    real: dict[tuple[str, date], dict] = {}
+    with store._lock:
+        items = list(store._days.items())
+    wanted = set(zones) if zones is not None else None
+    for (zone, _), row in items:
+        d = parse_esolat_date(row.get("date"))
+        if d is None or row.get("source") == "calc" or zone not in gz.zones:
+            continue
+        if wanted is None or zone in wanted:
+            real[(zone, d)] = row
+    if not real:
+        return {"rows": 0, "zones": 0, "prayers": {}}
+
+    codes = sorted({z for z, _ in real})
+    first, last = min(d for _, d in real), max(d for _, d in real)
+    calc = compute(codes, first, last)
+
+    diffs = {k: [] for k in ALL_KEYS}
+    worst = {}
+    for (zone, d), row in real.items():
+        ours = calc[zone][(d - first).days]
+        for k in ALL_KEYS:
+            a, b = _minutes(ours[k]), _minutes(row.get(k))
+            if a is None or b is None:
+                continue
+            diffs[k].append(a - b)
+            if k not in worst or abs(a - b) > abs(worst[k][0]):
+                worst[k] = (a - b, zone, d.isoformat())
+
+    prayers = {}
+    for k, v in diffs.items():
+        if not v:
+            continue
+        a = np.asarray(v)
+        prayers[NAMES[k]] = {
+            "n": int(a.size),
+            "mean_min": float(a.mean()),
+            "mean_abs_min": float(np.abs(a).mean()),
+            "p95_abs_min": float(np.percentile(np.abs(a), 95)),
+            "max_abs_min": float(np.abs(a).max()),
+            "within_1_min": float((np.abs(a) <= 1).mean()),
+            "within_2_min": float((np.abs(a) <= 2).mean()),
+            "worst": {"diff_min": worst[k][0], "zone": worst[k][1], "date": worst[k][2]},
+        }
+    return {"rows": len(real), "zones": len(codes), "from": first.isoformat(), "to": last.isoformat(),
+            "prayers": prayers}
+
+
+def print_report(rep: dict):
+    if not rep["rows"]:
+        print("[CALC] No e-Solat rows in the cache to compare with (run the assistant online first).")
+        return
+    print(f"[CALC] {rep['rows']} e-Solat days, {rep['zones']} zones, {rep['from']} .. {rep['to']}")
+    print(f"{'prayer':10s} {'mean':>7s} {'|mean|':>7s} {'p95':>6s} {'max':>6s} {'<=1m':>6s} {'<=2m':>6s}   worst")
+    for name, st in rep["prayers"].items():
+        w = st["worst"]
+        print(f"{name:10s} {st['mean_min']:+7.2f} {st['mean_abs_min']:7.2f} {st['p95_abs_min']:6.1f} "
+              f"{st['max_abs_min']:6.1f} {st['within_1_min'] * 100:5.0f}% {st['within_2_min'] * 100:5.0f}%   "
+              f"{w['diff_min']:+.0f} ({w['zone']} {w['date']})")
+    print("(minutes, calculated - e-Solat)")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline prayer-time calculation (JAKIM parameters)")
+    ap.add_argument("--zone", action="append", help="zone code (repeatable; default all)")
+    ap.add_argument("--date", help="YYYY-MM-DD: print that day")
+    ap.add_argument("--validate", action="store_true", help="compare with cached e-Solat rows")
+    ap.add_argument("--bench", action="store_true", help="time a full year for every zone")
+    ap.add_argument("--fill", type=int, metavar="YEAR", help="write calculated rows for zones/year not cached yet")
+    ap.add_argument("--json", help="write the validation report here")
+    args = ap.parse_args(argv)
+
+    if args.date:
+        d = date.fromisoformat(args.date)
+        for zone in args.zone or ["SGR01"]:
+            row = compute_day(zone, d)
+            print(zone, " ".join(f"{NAMES[k]} {row[k][:5]}" for k in ALL_KEYS))
+    if args.bench:
+        from gazetteer import get_gazetteer
+        gz = get_gazetteer()
+        days = np.arange(np.datetime64(f"{date.today().year}-01-01"), np.datetime64(f"{date.today().year + 1}-01-01"))
+        lat = [z.lat for z in gz.zones.values()]
+        lon = [z.lon for z in gz.zones.values()]
+        t0 = time.perf_counter()
+        solar_times(lat, lon, days)
+        t1 = time.perf_counter()
+        compute()
+        t2 = time.perf_counter()
+        print(f"[CALC] {len(lat)} zones x {len(days)} days: arrays {(t1 - t0) * 1000:.1f} ms, "
+              f"with e-Solat rows {(t2 - t1) * 1000:.0f} ms")
+    if args.fill:
+        from prayer_tool import get_store
+        store = get_store()
+        n = 0
+        for zone, rows in compute(args.zone, date(args.fill, 1, 1), date(args.fill, 12, 31)).items():
+            n += store.put_year(zone, args.fill, rows, fill=True)
+        print(f"[CALC] Filled {n} days")
+    if args.validate:
+        from prayer_tool import get_store
+        rep = validate(get_store(), args.zone)
+        print_report(rep)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(rep, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
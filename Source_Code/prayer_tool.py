@@ -1,44 +1,110 @@
-import requests
+import os
 from datetime import date
 from typing import Optional
 
-ESOLAT_URL = "https://www.e-solat.gov.my/index.php?r=esolatApi/takwimsolat"
+from http_client import HttpClient, AsyncHttpClient
+from prayer_cache import TimetableStore
+from metrics import current_turn
+
+# Override with ESOLAT_URL=http://127.0.0.1:xxxx/... to test against a local stand-in
+ESOLAT_URL = os.environ.get("ESOLAT_URL", "https://www.e-solat.gov.my/index.php?r=esolatApi/takwimsolat")
+# On a cache miss wait this long for e-Solat, then answer from prayer_calc (None = always wait)
+ESOLAT_DEADLINE_S = float(os.environ.get("ESOLAT_DEADLINE_S", "3"))
+
+_client = None
+_aclient = None
+
+def get_client() -> HttpClient:
+    """Shared pooled client for e-Solat (see client.stats() for counters)."""
+    global _client
+    if _client is None:
+        _client = HttpClient(timeout=15)
+    return _client
+
+def get_async_client() -> AsyncHttpClient:
+    global _aclient
+    if _aclient is None:
+        _aclient = AsyncHttpClient(get_client())
+    return _aclient
 
 def fetch_period(zone: str, period: str = "today") -> list[dict]:
     """
     period: today | week | month | year
     Returns list of prayerTime entries.
     """
-    r = requests.get(ESOLAT_URL, params={"period": period, "zone": zone}, timeout=15)
-    r.raise_for_status()
-    data = r.json()
+    data = get_client().get_json(ESOLAT_URL, params={"period": period, "zone": zone})
     return data.get("prayerTime", [])
 
 def fetch_duration(zone: str, datestart: str, dateend: str) -> list[dict]:
     """
     period=duration requires POST body: datestart/dateend in YYYY-MM-DD
     """
-    r = requests.post(
+    data = get_client().post_json(
         ESOLAT_URL,
         params={"period": "duration", "zone": zone},
         data={"datestart": datestart, "dateend": dateend},
-        timeout=15,
     )
-    r.raise_for_status()
-    data = r.json()
     return data.get("prayerTime", [])
 
+async def fetch_period_async(zone: str, period: str = "today") -> list[dict]:
+    data = await get_async_client().get_json(ESOLAT_URL, params={"period": period, "zone": zone})
+    return data.get("prayerTime", [])
+
+async def fetch_duration_async(zone: str, datestart: str, dateend: str) -> list[dict]:
+    data = await get_async_client().post_json(
+        ESOLAT_URL,
+        params={"period": "duration", "zone": zone},
+        data={"datestart": datestart, "dateend": dateend},
+    )
+    return data.get("prayerTime", [])
+
+def fetch_year(zone: str, year: int) -> list[dict]:
+    """
+    Whole calendar year for a zone (period=year only covers the current year).
+    """
+    if year == date.today().year:
+        return fetch_period(zone, "year")
+    return fetch_duration(zone, f"{year}-01-01", f"{year}-12-31")
+
+_store = None
+
+def get_store() -> TimetableStore:
+    global _store
+    if _store is None:
+        _store = TimetableStore(fetch_year)
+    return _store
+
 def get_times_for_date(zone: str, target: date) -> Optional[dict]:
     """
     Return the prayer time dict for a specific date.
+    Served from the on-disk timetable cache; a miss bulk-loads the whole year.
+    If e-Solat is down or slower than ESOLAT_DEADLINE_S the year is calculated
+    locally instead (prayer_calc) and cached until e-Solat answers.
     """
-    # easiest: fetch a week and match date
-    items = fetch_period(zone, "week")
-    target_str = target.strftime("%d-%b-%Y")  # e-Solat usually returns like "03-Jan-2026"
-    for it in items:
-        if it.get("date") == target_str:
-            return it
-    return None
+    store = get_store()
+    day = store.get(zone, target, timeout=ESOLAT_DEADLINE_S)
+    if day is not None:
+        return day
+    return calc_fallback(zone, target)
+
+def calc_fallback(zone: str, target: date) -> Optional[dict]:
+    """Fill the cache with calculated times for (zone, year) and return target's entry."""
+    import prayer_calc
+    turn = current_turn()
+    try:
+        with turn.stage("prayer_calc"):
+            rows = prayer_calc.compute_year(zone, target.year)
+    except KeyError:
+        return None  # zone not in zones.tsv
+    store = get_store()
+    store.put_year(zone, target.year, rows, fill=True)
+    day = store.get(zone, target)  # also re-queues the e-Solat load
+    turn.note(timetable="calc")
+    return day
+
+def prefetch(zone: str, target: date) -> bool:
+    """Warm the cache for (zone, target) in the background, e.g. while STT is still decoding."""
+    return get_store().prefetch(zone, target.year)
 
 BM_TO_KEY = {
     "imsak": "imsak",
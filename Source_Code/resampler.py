@@ -0,0 +1,108 @@
+"""
+Streaming polyphase resampler for the capture path.
+
+Produces the same output as scipy.signal.resample_poly(x, dst, src) (same
+Kaiser-windowed FIR, same delay compensation) but chunk by chunk, carrying
+filter history between chunks, so it can run inside the mic callback.
+"""
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+from scipy.signal import firwin
+
+
+@lru_cache(maxsize=8)
+def _design(up: int, down: int) -> tuple[np.ndarray, int]:
+    """Filter + number of leading outputs to drop, exactly as resample_poly does."""
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    h = firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)) * up
+    n_pre_pad = down - half_len % down
+    n_pre_remove = (half_len + n_pre_pad) // down
+    h = np.concatenate((np.zeros(n_pre_pad), h))
+    return h, n_pre_remove
+
+
+@lru_cache(maxsize=8)
+def _polyphase(up: int, down: int) -> tuple[np.ndarray, int]:
+    """Filter split into `up` phases: bank[p, q] = h[p + q * up]."""
+    h, skip = _design(up, down)
+    taps = -(-len(h) // up)
+    padded = np.zeros(taps * up)
+    padded[:len(h)] = h
+    bank = padded.reshape(taps, up).T[:, ::-1].astype(np.float32)  # reversed: oldest input first
+    return np.ascontiguousarray(bank), skip
+
+
+class StreamingResampler:
+    """
+    rs = StreamingResampler(48000, 16000)
+    for chunk in chunks:
+        out16k = rs.process(chunk)
+    tail = rs.flush()
+    """
+
+    def __init__(self, src_sr: int, dst_sr: int = 16000):
+        g = gcd(src_sr, dst_sr)
+        self.up = dst_sr // g
+        self.down = src_sr // g
+        self.src_sr = src_sr
+        self.dst_sr = dst_sr
+        self.passthrough = self.up == self.down
+        if self.passthrough:
+            self.bank, self._skip_total = np.ones((1, 1), dtype=np.float32), 0
+        else:
+            self.bank, self._skip_total = _polyphase(self.up, self.down)
+        self.taps = self.bank.shape[1]
+        self.reset()
+
+    def reset(self):
+        self._hist = np.zeros(self.taps - 1, dtype=np.float32)
+        self._n_in = 0        # input samples consumed (including flush zeros)
+        self._n_real = 0      # real input samples
+        self._n_out = 0       # filter outputs computed (including dropped ones)
+        self._to_skip = self._skip_total
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32).reshape(-1)
+        if self.passthrough:
+            return x.copy()
+        self._n_real += len(x)
+        return self._run(x)
+
+    def flush(self) -> np.ndarray:
+        """Drain the filter so the total length matches resample_poly."""
+        want = -(-self._n_real * self.up // self.down)
+        produced = self._n_out - self._skip_total
+        need = want - max(produced, 0)
+        if need <= 0:
+            return np.zeros(0, dtype=np.float32)
+        zeros = np.zeros(-(-(need + self._to_skip) * self.down // self.up) + self.taps, dtype=np.float32)
+        return self._run(zeros)[:need]
+
+    def _run(self, x: np.ndarray) -> np.ndarray:
+        ext = np.concatenate((self._hist, x))
+        base = self._n_in - (self.taps - 1)    # global input index of ext[0]
+        total_in = self._n_in + len(x)
+
+        n_end = -(-total_in * self.up // self.down)   # outputs whose newest input is available
+        n = np.arange(self._n_out, n_end)
+        pos = n * self.down
+        newest = pos // self.up - base                 # index of newest input in ext
+        phase = pos % self.up
+
+        # window of `taps` inputs ending at `newest`, times the matching phase filter
+        idx = newest[:, None] + np.arange(-(self.taps - 1), 1)[None, :]
+        y = np.einsum("nq,nq->n", ext[idx], self.bank[phase])
+
+        if self.taps > 1:
+            self._hist = ext[len(ext) - (self.taps - 1):].copy()
+        self._n_in = total_in
+        self._n_out = n_end
+
+        if self._to_skip:
+            k = min(self._to_skip, len(y))
+            y = y[k:]
+            self._to_skip -= k
+        return y.astype(np.float32, copy=False)
@@ -0,0 +1,188 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+# Lives next to the code, like prayer_cache.sqlite3
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "response_cache.sqlite3")
+
+ANSWER_MAX = 1024             # computed prayer answers kept in memory
+LLM_MAX = 512                 # LLM answers kept (memory and disk)
+LLM_TTL = 7 * 24 * 3600       # seconds before an LLM answer is asked again
+
+
+class ResponseCache:
+    """
+    Router answer cache with two tiers.
+
+    - answers: prayer answers keyed by the resolved query (zone, prayer, date,
+      question type). Each entry carries its own expiry time, so "berapa minit
+      lagi" answers can expire at the next minute boundary and plain time
+      answers at midnight. Memory only; they are cheap to rebuild.
+    - llm: Ollama answers keyed by (model, normalized question). Bounded LRU
+      with a TTL, written through to SQLite so they survive restarts. A hit
+      only touches memory: its use time is written back with the next
+      put_llm() or on flush() / close(), so reads never wait for an fsync.
+
+    clock is wall time (time.time) because expiry follows the wall clock.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_DB_PATH, answer_max: int = ANSWER_MAX,
+                 llm_max: int = LLM_MAX, llm_ttl: float = LLM_TTL,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.answer_max = answer_max
+        self.llm_max = llm_max
+        self.llm_ttl = llm_ttl
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._answers: OrderedDict[Hashable, tuple[str, float]] = OrderedDict()
+        self._llm: OrderedDict[tuple[str, str], tuple[str, float]] = OrderedDict()   # -> (answer, created_at)
+        self._used: dict[tuple[str, str], float] = {}    # hits not yet written back: key -> used_at
+        self._stats = {tier: {"hits": 0, "misses": 0, "expired": 0, "evicted": 0} for tier in ("answers", "llm")}
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm ("
+                " model TEXT NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL,"
+                " created_at REAL NOT NULL, used_at REAL NOT NULL,"
+                " PRIMARY KEY (model, question))"
+            )
+            self._db.commit()
+            self._read_llm()
+
+    def _read_llm(self):
+        cutoff = self.clock() - self.llm_ttl
+        with self._lock:
+            self._db.execute("DELETE FROM llm WHERE created_at < ?", (cutoff,))
+            rows = self._db.execute(
+                "SELECT model, question, answer, created_at FROM llm ORDER BY used_at DESC LIMIT ?",
+                (self.llm_max,),
+            ).fetchall()
+            for model, question, answer, created_at in reversed(rows):   # oldest first = LRU order
+                self._llm[(model, question)] = (answer, created_at)
+            self._db.execute(
+                "DELETE FROM llm WHERE rowid NOT IN (SELECT rowid FROM llm ORDER BY used_at DESC LIMIT ?)",
+                (self.llm_max,),
+            )
+            self._db.commit()
+
+    # ----------------------------
+    # Prayer answers (per-entry expiry)
+    # ----------------------------
+    def get_answer(self, key: Hashable) -> Optional[str]:
+        st = self._stats["answers"]
+        with self._lock:
+            entry = self._answers.get(key)
+            if entry is None:
+                st["misses"] += 1
+                return None
+            text, expires_at = entry
+            if self.clock() >= expires_at:
+                del self._answers[key]
+                st["expired"] += 1
+                st["misses"] += 1
+                return None
+            self._answers.move_to_end(key)
+            st["hits"] += 1
+            return text
+
+    def put_answer(self, key: Hashable, text: str, expires_at: float):
+        if expires_at <= self.clock():
+            return
+        with self._lock:
+            self._answers[key] = (text, expires_at)
+            self._answers.move_to_end(key)
+            while len(self._answers) > self.answer_max:
+                self._answers.popitem(last=False)
+                self._stats["answers"]["evicted"] += 1
+
+    # ----------------------------
+    # LLM answers (LRU + TTL, persisted)
+    # ----------------------------
+    def get_llm(self, model: str, question: str) -> Optional[str]:
+        key = (model, question)
+        st = self._stats["llm"]
+        now = self.clock()
+        with self._lock:
+            entry = self._llm.get(key)
+            if entry is None:
+                st["misses"] += 1
+                return None
+            answer, created_at = entry
+            if now - created_at >= self.llm_ttl:
+                # the row is deleted on the next load (_read_llm drops expired rows)
+                del self._llm[key]
+                self._used.pop(key, None)
+                st["expired"] += 1
+                st["misses"] += 1
+                return None
+            self._llm.move_to_end(key)
+            self._used[key] = now
+            st["hits"] += 1
+            return answer
+
+    def put_llm(self, model: str, question: str, answer: str):
+        key = (model, question)
+        now = self.clock()
+        with self._lock:
+            self._llm[key] = (answer, now)
+            self._llm.move_to_end(key)
+            self._used.pop(key, None)
+            evicted = []
+            while len(self._llm) > self.llm_max:
+                evicted.append(self._llm.popitem(last=False)[0])
+                self._used.pop(evicted[-1], None)
+                self._stats["llm"]["evicted"] += 1
+            if self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm (model, question, answer, created_at, used_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (model, question, answer, now, now),
+                )
+                self._db.executemany("DELETE FROM llm WHERE model = ? AND question = ?", evicted)
+                self._write_used()
+                self._db.commit()
+
+    def flush(self):
+        """Write back use times of cache hits since the last write."""
+        with self._lock:
+            if self._db and self._used:
+                self._write_used()
+                self._db.commit()
+
+    def _write_used(self):
+        self._db.executemany("UPDATE llm SET used_at = ? WHERE model = ? AND question = ?",
+                             [(t, *k) for k, t in self._used.items()])
+        self._used.clear()
+
+    # ----------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            out = {}
+            for tier, st in self._stats.items():
+                lookups = st["hits"] + st["misses"]
+                out[tier] = {**st, "size": len(self._answers if tier == "answers" else self._llm),
+                             "hit_rate": st["hits"] / lookups if lookups else 0.0}
+            return out
+
+    def clear(self):
+        with self._lock:
+            self._answers.clear()
+            self._llm.clear()
+            self._used.clear()
+            if self._db:
+                self._db.execute("DELETE FROM llm")
+                self._db.commit()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._db:
+                self._db.close()
+                self._db = None
@@ -1,22 +1,20 @@
-import re
+import atexit
+import threading
 from datetime import datetime, date, timedelta
+from functools import lru_cache
 from zoneinfo import ZoneInfo
-from dateutil.relativedelta import relativedelta
+from typing import Iterable, Iterator, Optional, Union
 
-from prayer_tool import get_prayer_time  # returns "HH:MM:SS" or None
-from ollama_client import ollama_generate
-
-
-# Optional fuzzy for place typo (if rapidfuzz installed)
-try:
-    from rapidfuzz import process, fuzz
-    _HAS_FUZZ = True
-except Exception:
-    _HAS_FUZZ = False
+from prayer_tool import get_prayer_time, prefetch  # get_prayer_time returns "HH:MM:SS" or None
+from ollama_client import ChatSession, iter_sentences, ERROR_PREFIX
+from metrics import current_turn
+from response_cache import ResponseCache
+from nlu import QueryParser, ParsedQuery
+from gazetteer import get_gazetteer
 
 
 # ----------------------------
-# Zone mapping (Selangor)
+# Zone mapping (Selangor; the rest of Malaysia comes from zones.tsv via gazetteer.py)
 # ----------------------------
 DEFAULT_ZONE = "SGR01"
 
@@ -62,61 +60,6 @@ WEEKDAYS = {
     "isnin": 0, "selasa": 1, "rabu": 2, "khamis": 3, "jumaat": 4, "sabtu": 5, "ahad": 6,
 }
 
-def _next_weekday(d: date, target_wd: int) -> date:
-    # next occurrence (including today+7 if same day)
-    delta = (target_wd - d.weekday()) % 7
-    if delta == 0:
-        delta = 7
-    return d + timedelta(days=delta)
-
-def detect_target_date(text: str) -> tuple[date, str]:
-    t = text.lower()
-    today = date.today()
-
-    # 1) Specific numeric date formats: 05/01/2026 or 05-01
-    m = re.search(r"\b(\d{1,2})[/-](\d{1,2})(?:[/-](\d{4}))?\b", t)
-    if m:
-        dd = int(m.group(1)); mm = int(m.group(2))
-        yy = int(m.group(3)) if m.group(3) else today.year
-        cand = date(yy, mm, dd)
-        if not m.group(3) and cand < today:
-            cand = date(today.year + 1, mm, dd)
-        return cand, cand.strftime("%d-%m-%Y")
-
-    # 2) Specific Malay date: "5 januari" / "5 januari 2026"
-    m = re.search(r"\b(\d{1,2})\s+(januari|februari|mac|april|mei|jun|julai|ogos|september|oktober|november|disember)(?:\s+(\d{4}))?\b", t)
-    if m:
-        dd = int(m.group(1))
-        mm = MONTHS[m.group(2)]
-        yy = int(m.group(3)) if m.group(3) else today.year
-        cand = date(yy, mm, dd)
-        if not m.group(3) and cand < today:
-            cand = date(today.year + 1, mm, dd)
-        return cand, cand.strftime("%d-%b-%Y")
-
-    # 3) Weekday: "jumaat" / "jumaat depan"
-    for name, wd in WEEKDAYS.items():
-        if re.search(rf"\b{name}\b", t):
-            cand = _next_weekday(today, wd)
-            # if "minggu depan" also mentioned, push 7 more days
-            if "minggu depan" in t:
-                cand = cand + timedelta(days=7)
-            return cand, name
-
-    # 4) Relative keywords (priority: lusa > esok > today)
-    if "lusa" in t:
-        return today + timedelta(days=2), "lusa"
-    if "esok" in t:
-        return today + timedelta(days=1), "esok"
-
-    # 5) Week/month ahead
-    if "minggu depan" in t:
-        return today + timedelta(days=7), "minggu depan"
-    if "bulan depan" in t:
-        return today + relativedelta(months=+1), "bulan depan"
-
-    return today, "hari ini"
-
 # ----------------------------
 # Prayer detection
 # ----------------------------
@@ -125,7 +68,7 @@ PRAYER_SYNONYMS = {
     "subuh": ["subuh", "fajr"],
     "syuruk": ["syuruk", "sunrise"],
     "dhuha": ["dhuha", "duha"],
-    "zohor": ["zohor", "zuhur", "dzuhur", "dhuhr", "johor"],  # "johor" from STT sometimes
+    "zohor": ["zohor", "zuhur", "dzuhur", "dhuhr", "johor"],  # STT slip, unless a place/state claims it (nlu.py)
     "asar": ["asar", "asr", "asa"],
     "maghrib": ["maghrib", "magrib", "magreb"],
     "isyak": ["isyak", "isyah", "isha"],
@@ -133,124 +76,128 @@ PRAYER_SYNONYMS = {
 
 PRAYER_CANON = list(PRAYER_SYNONYMS.keys())
 
+MY_TZ = ZoneInfo("Asia/Kuala_Lumpur")
+EARLY_TAIL_S = 1.0   # undecoded audio shorter than this can't add a date or state any more
+                     # (includes the ~0.7 s of trailing silence the endpointer keeps)
+
+GREETING_ANSWER = "Waalaikumsalam."
+NO_DATA_ANSWER = "Maaf, saya tak dapat capai data waktu solat sekarang. Cuba lagi sekejap ya."
+
+# Reply templates for build_prayer_answer(). Kept as one table so tts_cache.py
+# can pre-render the fixed wording between the {fields} once.
+ANSWERS = {
+    "timetable": "Waktu solat {day} zon {zone}: {times}.",
+    "which": "Nak semak waktu solat yang mana? Subuh, zohor, asar, maghrib atau isyak?",
+    "at": "Waktu solat {prayer} {day} untuk zon {zone} ialah {hhmm}.",
+    "entered": "Ya, waktu {prayer} dah masuk untuk zon {zone} ({hhmm}).",
+    "not_yet": "Belum. Waktu {prayer} untuk zon {zone} pukul {hhmm}, lagi lebih kurang {mins} minit.",
+    "mins_left": "Waktu {prayer} untuk zon {zone} pukul {hhmm}. Lagi lebih kurang {mins} minit.",
+    "now": "Sekarang dah masuk waktu {prayer} untuk zon {zone} ({hhmm}).",
+    "passed": "Waktu {prayer} untuk zon {zone} pukul {hhmm}. Waktu itu dah lepas hari ini.",
+    "other_zones": " Ada juga {place} di {others}.",
+}
+
+# Fixed instruction sent first in every Ollama chat (stable prefix -> prompt cache hit)
+SYSTEM_PROMPT = (
+    "Anda ialah pembantu suara ringkas dalam Bahasa Melayu.\n"
+    "Jawab pendek dan jelas."
+)
+
 
 # ----------------------------
-# Helpers
+# Parsing (tables above are compiled once into a phrase trie, see nlu.py)
 # ----------------------------
+_PARSER = QueryParser(PLACE_TO_ZONE, PRAYER_SYNONYMS, WEEKDAYS, MONTHS,
+                      rewrite=PLACE_REWRITE, default_zone=DEFAULT_ZONE,
+                      gazetteer=get_gazetteer())
+
+@lru_cache(maxsize=256)
+def _parse_cached(text: str, today: date) -> ParsedQuery:
+    return _PARSER.parse(text, today)
+
+def parse_query(text: Union[str, ParsedQuery]) -> ParsedQuery:
+    """Parse once; every detect_* / answer function below shares the result."""
+    if isinstance(text, ParsedQuery):
+        return text
+    return _parse_cached(text or "", date.today())
+
+
 def _norm(s: str) -> str:
-    s = (s or "").lower()
-    s = s.replace(".", " ")
-    s = re.sub(r"\s+", " ", s).strip()
-
-    # quick rewrite for common place typos
-    for k, v in PLACE_REWRITE.items():
-        s = s.replace(k, v)
-    return s
-
-
-def detect_zone(text: str) -> str:
-    t = _norm(text)
-
-    # direct multi-word match first
-    for place, zone in PLACE_TO_ZONE.items():
-        if place in t:
-            return zone
-
-    # fuzzy fallback for phrases (2-3 words) if rapidfuzz available
-    if _HAS_FUZZ:
-        keys = list(PLACE_TO_ZONE.keys())
-        words = t.split()
-
-        # build n-grams (2 and 3 words) to match places like "kuala selangor"
-        candidates = []
-        for n in (3, 2, 1):
-            for i in range(len(words) - n + 1):
-                candidates.append(" ".join(words[i:i+n]))
-
-        best_place = None
-        best_score = 0
-        for c in candidates:
-            m = process.extractOne(c, keys, scorer=fuzz.ratio)
-            if m and m[1] > best_score:
-                best_place, best_score = m[0], m[1]
-
-        if best_place and best_score >= 86:
-            return PLACE_TO_ZONE[best_place]
-
-    return DEFAULT_ZONE
-
-
-
-def detect_prayer(text: str) -> str | None:
-    t = _norm(text)
-
-    # exact / substring match for synonyms
-    for canon, syns in PRAYER_SYNONYMS.items():
-        for s in syns:
-            if re.search(rf"\b{re.escape(s)}\b", t):
-                return canon
-
-    # fuzzy match if user says weird spelling like "magrib"
-    if _HAS_FUZZ:
-        words = re.findall(r"[a-z]+", t)
-        # build a synonym list to match against
-        all_syns = []
-        syn_to_canon = {}
-        for canon, syns in PRAYER_SYNONYMS.items():
-            for s in syns:
-                all_syns.append(s)
-                syn_to_canon[s] = canon
-        for w in words:
-            m = process.extractOne(w, all_syns, scorer=fuzz.ratio)
-            if m and m[1] >= 85:
-                return syn_to_canon[m[0]]
-
-    return None
-
-
-def is_prayer_intent(text: str) -> bool:
-    t = _norm(text)
-    if "waktu solat" in t or "waktu" in t:
-        return True
-    if "minit" in t or "berapa lama" in t or "dah masuk" in t or "masuk belum" in t:
-        return True
-    if detect_prayer(t):
+    return _PARSER.normalize(s)[0]
+
+
+def detect_target_date(text: Union[str, ParsedQuery]) -> tuple[date, str]:
+    q = parse_query(text)
+    return q.target_date, q.day_label
+
+
+def detect_zone(text: Union[str, ParsedQuery]) -> str:
+    return parse_query(text).zone
+
+
+def detect_prayer(text: Union[str, ParsedQuery]) -> str | None:
+    return parse_query(text).prayer
+
+
+def is_prayer_intent(text: Union[str, ParsedQuery]) -> bool:
+    return parse_query(text).is_prayer_intent
+
+
+def transcript_complete(text: Union[str, ParsedQuery]) -> bool:
+    """
+    False for a prayer-time question the parser can't fill in (it would get
+    the "which prayer?" reply), usually a misheard prayer name. Used as the
+    accept check for adaptive STT decoding; anything else is left to the LLM.
+    """
+    q = parse_query(text)
+    return not q.is_prayer_intent or bool(q.prayer) or q.wants_timetable
+
+
+def intent_complete(text: Union[str, ParsedQuery]) -> bool:
+    """
+    Stricter than transcript_complete: a prayer question with the prayer (or
+    timetable), a zone actually named and a date, or a bare greeting. Lets the
+    STT cascade keep a cheap model's transcript; anything else goes to the
+    bigger model, including chat for the LLM.
+    """
+    q = parse_query(text)
+    if q.is_greeting and not q.is_prayer_intent:
         return True
-    return False
+    return q.is_prayer_intent and (bool(q.prayer) or q.wants_timetable) and q.zone_found
 
 
 def _minutes_until(hhmmss: str) -> int:
     """Return minutes until HH:MM:SS (Malaysia time). Negative if passed."""
-    tz = ZoneInfo("Asia/Kuala_Lumpur")
-    now = datetime.now(tz)
+    now = datetime.now(MY_TZ)
     hh, mm, ss = map(int, hhmmss.split(":"))
     target = now.replace(hour=hh, minute=mm, second=ss, microsecond=0)
     return int((target - now).total_seconds() // 60)
 
 
-def build_prayer_answer(user_text: str) -> str:
-    t = _norm(user_text)
+def _other_zones_hint(q: ParsedQuery) -> str:
+    """ " Ada juga Pontian di zon PHG07 (Pahang)." when the place name is not unique."""
+    if not q.zone_alternatives:
+        return ""
+    gz = get_gazetteer()
+    others = ", ".join(f"zon {z} ({gz.state_of(z).title()})" for z in q.zone_alternatives)
+    return ANSWERS["other_zones"].format(place=q.place.title(), others=others)
 
-    zone = detect_zone(t)
-    prayer = detect_prayer(t)
-    target_date, day_label = detect_target_date(t)
 
+def build_prayer_answer(user_text: Union[str, ParsedQuery]) -> str:
+    q = parse_query(user_text)
 
-    ask_mins = ("berapa minit" in t) or ("minit lagi" in t) or ("berapa lama" in t) \
-               or ("berapa menit" in t) or ("menit lagi" in t)
-    ask_entered = ("dah masuk" in t) or ("sudah masuk" in t) or ("masuk belum" in t)
-
-    is_today = (target_date == date.today())
-    day_label = "hari ini" if is_today else ("esok" if target_date == date.today() + timedelta(days=1) else "lusa")
-
-# Heuristic: STT sometimes hears "esok" as "isyak" in phrase "waktu solat ..."
-    if "waktu solat isyak" in t and "esok" not in t and "lusa" not in t:
-    # treat it as "waktu solat esok"
-        t = t.replace("waktu solat isyak", "waktu solat esok")
+    zone = q.zone
+    hint = _other_zones_hint(q)
+    prayer = q.prayer
+    target_date = q.target_date
+    ask_mins = q.ask_mins
+    ask_entered = q.ask_entered
 
+    is_today = (target_date == q.today)
+    day_label = "hari ini" if is_today else ("esok" if target_date == q.today + timedelta(days=1) else "lusa")
 
     # --- If user asked general timetable (for the chosen day) ---
-    if (("waktu solat" in t) or ("waktu hari ini" in t) or ("waktu esok" in t) or ("waktu lusa" in t)) and not prayer:
+    if q.wants_timetable:
         core = ["subuh", "zohor", "asar", "maghrib", "isyak"]
         parts = []
         for p in core:
@@ -258,57 +205,244 @@ def build_prayer_answer(user_text: str) -> str:
             if tm:
                 parts.append(f"{p.capitalize()} {tm[:5]}")
         if parts:
-            return f"Waktu solat {day_label} zon {zone}: " + ", ".join(parts) + "."
-        return "Maaf, saya tak dapat capai data waktu solat sekarang. Cuba lagi sekejap ya."
+            return ANSWERS["timetable"].format(day=day_label, zone=zone, times=", ".join(parts)) + hint
+        return NO_DATA_ANSWER
 
     # --- If prayer not identified ---
     if not prayer:
-        return "Nak semak waktu solat yang mana? Subuh, zohor, asar, maghrib atau isyak?"
+        return ANSWERS["which"]
 
     # --- Get time for selected day ---
     tm = get_prayer_time(prayer, zone=zone, target=target_date)
     if not tm:
-        return "Maaf, saya tak dapat capai data waktu solat sekarang. Cuba lagi sekejap ya."
+        return NO_DATA_ANSWER
 
     hhmm = tm[:5]
 
     # “minit lagi” & “dah masuk” only valid for today
+    fields = dict(prayer=prayer, day=day_label, zone=zone, hhmm=hhmm)
     if not is_today:
-        return f"Waktu solat {prayer} {day_label} untuk zon {zone} ialah {hhmm}."
+        return ANSWERS["at"].format(**fields) + hint
 
     mins = _minutes_until(tm)
 
     if ask_entered:
         if mins <= 0:
-            return f"Ya, waktu {prayer} dah masuk untuk zon {zone} ({hhmm})."
-        return f"Belum. Waktu {prayer} untuk zon {zone} pukul {hhmm}, lagi lebih kurang {mins} minit."
+            return ANSWERS["entered"].format(**fields) + hint
+        return ANSWERS["not_yet"].format(mins=mins, **fields) + hint
 
     if ask_mins:
         if mins > 0:
-            return f"Waktu {prayer} untuk zon {zone} pukul {hhmm}. Lagi lebih kurang {mins} minit."
+            return ANSWERS["mins_left"].format(mins=mins, **fields) + hint
         if mins == 0:
-            return f"Sekarang dah masuk waktu {prayer} untuk zon {zone} ({hhmm})."
-        return f"Waktu {prayer} untuk zon {zone} pukul {hhmm}. Waktu itu dah lepas hari ini."
+            return ANSWERS["now"].format(**fields) + hint
+        return ANSWERS["passed"].format(**fields) + hint
+
+    return ANSWERS["at"].format(**fields) + hint
+
+
+
+# ----------------------------
+# Answer cache (repeat questions skip e-Solat lookups and Ollama)
+# ----------------------------
+_cache: Optional[ResponseCache] = None
+
+def get_response_cache() -> ResponseCache:
+    """Shared answer cache (see get_response_cache().stats() for hit/miss counters)."""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+        atexit.register(_cache.flush)      # LLM hit times are written back lazily
+    return _cache
+
+
+def _answer_key(q: ParsedQuery) -> tuple:
+    """Everything build_prayer_answer() reads, so differently worded repeats share an entry."""
+    return (q.zone, q.prayer, q.target_date, q.today, q.wants_timetable, q.ask_mins, q.ask_entered,
+            q.place if q.zone_alternatives else None)
+
 
-    return f"Waktu solat {prayer} {day_label} untuk zon {zone} ialah {hhmm}."
+def _answer_expiry(q: ParsedQuery) -> float:
+    now = datetime.now(MY_TZ)
+    if q.prayer and not q.wants_timetable and q.target_date == q.today and (q.ask_mins or q.ask_entered):
+        # "lagi N minit" / "dah masuk" change every minute (_minutes_until)
+        until = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    else:
+        # everything else only changes when "hari ini" becomes tomorrow
+        until = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=MY_TZ)
+    return until.timestamp()
 
 
+def _prayer_answer(q: ParsedQuery) -> str:
+    cache = get_response_cache()
+    key = _answer_key(q)
+    answer = cache.get_answer(key)
+    current_turn().note(answer_cache="miss" if answer is None else "hit")
+    if answer is None:
+        answer = build_prayer_answer(q)
+        if answer != NO_DATA_ANSWER:
+            cache.put_answer(key, answer, _answer_expiry(q))
+    return answer
 
-def get_response(user_text: str, ollama_model: str = "llama3:latest") -> str:
-    t =  _norm(user_text)
 
-    # greeting shortcut
-    if "assalamualaikum" in t:
-        return "Waalaikumsalam."
+def _cacheable_llm_answer(answer: str) -> bool:
+    return bool(answer) and not answer.startswith(ERROR_PREFIX)
+
+
+# ----------------------------
+# Ollama chat sessions (one per model and client)
+# ----------------------------
+_sessions: dict[tuple[str, Optional[str]], ChatSession] = {}
+_sessions_lock = threading.Lock()
+
+def get_chat_session(ollama_model: str = "llama3:latest", client: Optional[str] = None) -> ChatSession:
+    """One conversation per (model, client); client separates rooms when serving several devices."""
+    with _sessions_lock:
+        s = _sessions.get((ollama_model, client))
+        if s is None:
+            s = _sessions[(ollama_model, client)] = ChatSession(ollama_model, system=SYSTEM_PROMPT)
+        return s
+
+
+def get_response(user_text: str, ollama_model: str = "llama3:latest", client: Optional[str] = None) -> str:
+    q = parse_query(user_text)
+    turn = current_turn()
+
+    # greeting shortcut ("assalamualaikum, bila asar?" is still a prayer question;
+    # the greeting doubles as the wake phrase, see kws.py)
+    if q.is_greeting and not q.is_prayer_intent:
+        turn.note(route="greeting")
+        return GREETING_ANSWER
 
     # Domain route
-    if is_prayer_intent(user_text):
-        return build_prayer_answer(user_text)
-
-    # Fallback to Ollama
-    prompt = (
-        "Anda ialah pembantu suara ringkas dalam Bahasa Melayu.\n"
-        "Jawab pendek dan jelas.\n\n"
-        f"Soalan: {user_text}\nJawapan:"
-    )
-    return ollama_generate(prompt, model=ollama_model)
+    if q.is_prayer_intent:
+        turn.note(route="prayer")
+        return _prayer_answer(q)
+
+    # Fallback to Ollama. Follow-ups within a conversation depend on the
+    # history, so only standalone questions use the answer cache.
+    turn.note(route="llm")
+    session = get_chat_session(ollama_model, client)
+    standalone = not session.in_conversation()
+    cache = get_response_cache()
+    answer = cache.get_llm(ollama_model, q.text) if standalone else None
+    turn.note(answer_cache="miss" if answer is None else "hit")
+    if answer is not None:
+        session.record(user_text, answer)   # a follow-up must still see this turn
+        return answer
+    with turn.stage("llm"):
+        answer = session.ask(user_text)
+    if standalone and _cacheable_llm_answer(answer):
+        cache.put_llm(ollama_model, q.text, answer)
+    return answer
+
+
+def get_response_stream(user_text: str, ollama_model: str = "llama3:latest",
+                        cancel: Optional[threading.Event] = None, client: Optional[str] = None) -> Iterator[str]:
+    """
+    Same routing as get_response, but yields the reply in speakable segments.
+    Domain answers come out as one segment; the Ollama fallback streams
+    sentence by sentence while the LLM is still generating.
+    """
+    q = parse_query(user_text)
+    turn = current_turn()
+
+    if q.is_greeting and not q.is_prayer_intent:
+        turn.note(route="greeting")
+        yield GREETING_ANSWER
+        return
+
+    if q.is_prayer_intent:
+        turn.note(route="prayer")
+        yield _prayer_answer(q)
+        return
+
+    turn.note(route="llm")
+    session = get_chat_session(ollama_model, client)
+    standalone = not session.in_conversation()
+    cache = get_response_cache()
+    cached = cache.get_llm(ollama_model, q.text) if standalone else None
+    turn.note(answer_cache="miss" if cached is None else "hit")
+    if cached is not None:
+        session.record(user_text, cached)
+        yield from iter_sentences([cached])
+        return
+
+    chunks = []
+
+    def _tee(tokens):
+        for tok in tokens:
+            chunks.append(tok)
+            yield tok
+
+    yield from iter_sentences(_tee(session.ask_stream(user_text, cancel=cancel)))
+
+    # only complete answers are cached (not barge-in / cancelled ones)
+    answer = "".join(chunks).strip()
+    if standalone and not (cancel is not None and cancel.is_set()) and _cacheable_llm_answer(answer):
+        cache.put_llm(ollama_model, q.text, answer)
+
+
+# ----------------------------
+# Early resolution from partial transcripts
+# ----------------------------
+class IncrementalRouter:
+    """
+    Routes while STT is still decoding. resolve() reads (text so far, seconds
+    of audio not yet decoded) hypotheses, one per decoded chunk; as soon as a
+    zone is named the timetable year starts loading while the next chunk
+    decodes, and once prayer + zone + date are settled (the date said, or too
+    little audio left to say one) it stops reading, which closes the STT
+    stream so the remaining chunks are not decoded. Anything else waits for
+    the full transcript.
+
+        ir = IncrementalRouter()
+        text = ir.resolve(transcribe_partials(audio, postprocess=correct_domain_text))
+        for seg in ir.respond(cancel): ...
+    """
+
+    def __init__(self, ollama_model: str = "llama3:latest", client: Optional[str] = None,
+                 tail_s: float = EARLY_TAIL_S):
+        self.ollama_model = ollama_model
+        self.client = client
+        self.tail_s = tail_s
+        self.text = ""
+        self.query: Optional[ParsedQuery] = None
+        self.early = False
+        self._prefetched = None
+
+    def feed(self, text: str, pending_s: float) -> bool:
+        """One hypothesis; True once the answer can't change any more."""
+        q = parse_query(text)
+        self.text, self.query = text, q
+        if not q.is_prayer_intent:
+            return False
+        if q.zone_found and self._prefetched != (q.zone, q.target_date.year):
+            self._prefetched = (q.zone, q.target_date.year)
+            prefetch(q.zone, q.target_date)
+        settled_date = q.date_given or pending_s <= self.tail_s
+        settled_zone = not q.zone_alternatives or bool(q.states) or pending_s <= self.tail_s
+        return intent_complete(q) and settled_date and settled_zone
+
+    def resolve(self, partials: Iterable[tuple[str, float]]) -> str:
+        """Consume hypotheses until resolved or exhausted; returns the text the answer is for."""
+        it = iter(partials)
+        try:
+            for text, pending_s in it:
+                if self.feed(text, pending_s):
+                    self.early = pending_s > 0
+                    break
+        finally:
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()
+        current_turn().note(early_intent="yes" if self.early else "no")
+        return self.text
+
+    def respond(self, cancel: Optional[threading.Event] = None) -> Iterator[str]:
+        """Reply segments for what resolve() settled on (as get_response_stream)."""
+        if self.early:
+            current_turn().note(route="prayer")
+            yield _prayer_answer(self.query)
+            return
+        yield from get_response_stream(self.text, ollama_model=self.ollama_model, cancel=cancel, client=self.client)
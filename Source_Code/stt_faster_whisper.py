@@ -1,10 +1,31 @@
 import os
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
-os.environ["OMP_NUM_THREADS"] = "1"
 
+import time
+import threading
+from collections import Counter, deque
+from types import SimpleNamespace
+from typing import Callable, Iterator, Optional, Union
+
+import numpy as np
 from faster_whisper import WhisperModel
+from faster_whisper.audio import decode_audio
+
+from metrics import current_turn
+from mic_capture import pause_splits
 
-_model = None
+# Compute profile (env overrides so the Pi and a desktop can share the code)
+MODEL_SIZE = os.environ.get("STT_MODEL_SIZE", "small")
+COMPUTE_TYPE = os.environ.get("STT_COMPUTE_TYPE", "int8")     # int8 | int8_float32 | float32
+CPU_THREADS = int(os.environ.get("STT_CPU_THREADS", "0"))     # 0 = one per core
+NUM_WORKERS = int(os.environ.get("STT_NUM_WORKERS", "1"))     # >1 allows parallel transcribe() calls
+DECODE_MODE = os.environ.get("STT_DECODE", "adaptive")        # adaptive | beam
+CASCADE = [m for m in os.environ.get("STT_CASCADE", "").split(",") if m]   # e.g. "tiny,small"; empty = one model
+MEMORY_BUDGET_MB = int(os.environ.get("STT_MEMORY_MB", "1024"))             # all cascade tiers stay resident
+
+SAMPLE_RATE = 16000
+BATCH_SLOT_S = 30.0   # transcribe_many(): one Whisper window per utterance
+WARMUP_CLIP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Audio", "test.ogg")
 
 PRAYER_HINT = (
     "Bahasa Melayu. Frasa: waktu asar gombak. "
@@ -12,18 +33,470 @@ PRAYER_HINT = (
     "Nama tempat: gombak klang shah alam."
 )
 
-def transcribe_faster(audio_path: str, model_size: str = "small") -> str:
-    global _model
-    if _model is None:
-        _model = WhisperModel(model_size, device="cpu")
-
-    segments, info = _model.transcribe(
-        audio_path,
-        language="ms",
-        beam_size=5,
-        vad_filter=True,
-        temperature=0.0,
-        condition_on_previous_text=False,
-        initial_prompt=PRAYER_HINT,
-    )
-    return " ".join([s.text for s in segments]).strip()
+DECODE_DEFAULTS = dict(
+    language="ms",
+    beam_size=5,
+    vad_filter=True,
+    temperature=0.0,
+    condition_on_previous_text=False,
+    initial_prompt=PRAYER_HINT,
+)
+
+# Adaptive decoding: a greedy pass biased toward the domain vocabulary, and the
+# old beam-5 + prompt decode (with temperature fallback) only when that pass
+# looks unreliable. Most questions are short in-domain commands.
+HOTWORDS = (
+    "waktu solat imsak subuh syuruk zohor asar maghrib isyak minit lagi dah masuk "
+    "hari ini esok lusa gombak klang shah alam petaling sepang kuala selangor "
+    "hulu langat kuala lumpur putrajaya assalamualaikum"
+)
+GREEDY_OPTIONS = dict(beam_size=1, temperature=0.0, hotwords=HOTWORDS, initial_prompt=None)
+FALLBACK_OPTIONS = dict(beam_size=5, temperature=(0.0, 0.2, 0.4, 0.6), initial_prompt=PRAYER_HINT)
+LOGPROB_MIN = -0.8          # any segment below this average token log-prob -> re-decode
+NO_SPEECH_MAX = 0.6         # greedy text over audio Whisper thinks is silence
+COMPRESSION_MAX = 2.4       # repetition loops (same limit faster-whisper uses)
+MIN_SPEECH_S = 0.3          # VAD kept this much audio but nothing was decoded
+CHEAP_LOGPROB_MIN = -0.5    # a cheap cascade tier must be this sure of every segment
+
+# Parameter counts (millions), for the resident memory estimate
+MODEL_PARAMS_M = {"tiny": 39, "base": 74, "small": 244, "medium": 769,
+                  "large-v1": 1550, "large-v2": 1550, "large-v3": 1550, "distil-small.en": 166,
+                  "distil-medium.en": 394, "distil-large-v3": 756, "turbo": 809, "large-v3-turbo": 809}
+BYTES_PER_PARAM = {"int8": 1, "int8_float32": 1, "int8_float16": 1, "float16": 2, "float32": 4}
+RUNTIME_OVERHEAD_MB = 60    # CTranslate2 buffers + mel front end per loaded model
+
+
+def unreliable(segments, info) -> Optional[str]:
+    """Why a decode shouldn't be trusted ("logprob", "no_speech", "repetition", "empty"), or None."""
+    if not segments:
+        speech = getattr(info, "duration_after_vad", info.duration)
+        return "empty" if speech >= MIN_SPEECH_S else None
+    for seg in segments:
+        if seg.compression_ratio > COMPRESSION_MAX:
+            return "repetition"
+        if seg.no_speech_prob > NO_SPEECH_MAX:
+            return "no_speech"
+        if seg.avg_logprob < LOGPROB_MIN:
+            return "logprob"
+    return None
+
+
+class SttEngine:
+    """
+    One loaded WhisperModel plus its compute profile.
+
+    Call load() + warmup() at startup so the first question doesn't pay for
+    model load and the first (slow) decode.
+    """
+
+    def __init__(self, model_size: str = MODEL_SIZE, compute_type: str = COMPUTE_TYPE,
+                 cpu_threads: int = CPU_THREADS, num_workers: int = NUM_WORKERS, device: str = "cpu"):
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.device = device
+
+        self.model: Optional[WhisperModel] = None
+        self._batched = None
+        self._lock = threading.Lock()
+        self.load_s = None
+        self.warmup_rtf = None
+        self.calls = 0
+        self.decode_s = 0.0
+        self.audio_s = 0.0
+        self.adaptive_calls = 0
+        self.fallbacks: Counter = Counter()    # reason -> count
+        self.first_pass_s = 0.0
+        self.fallback_s = 0.0
+        self.streams = 0
+        self.early_stops = 0
+        self.skipped_s = 0.0         # audio chunks never decoded because the caller stopped early
+
+    def load(self) -> float:
+        """Load the model (once). Returns load time in seconds."""
+        with self._lock:
+            if self.model is None:
+                t0 = time.perf_counter()
+                self.model = WhisperModel(
+                    self.model_size,
+                    device=self.device,
+                    compute_type=self.compute_type,
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.num_workers,
+                )
+                self.load_s = time.perf_counter() - t0
+        return self.load_s
+
+    def warmup(self, clip: str = WARMUP_CLIP) -> Optional[float]:
+        """Decode a short clip once. Returns its real-time factor (decode time / audio length)."""
+        self.load()
+        if not os.path.exists(clip):
+            print(f"[STT] Warm-up clip not found: {clip}")
+            return None
+        audio = decode_audio(clip, sampling_rate=SAMPLE_RATE)
+        t0 = time.perf_counter()
+        self.transcribe(audio, count=False)
+        self.warmup_rtf = (time.perf_counter() - t0) / max(len(audio) / SAMPLE_RATE, 1e-6)
+        return self.warmup_rtf
+
+    def transcribe(self, audio: Union[str, np.ndarray], count: bool = True, **options) -> str:
+        text, _ = self.transcribe_with_info(audio, count=count, **options)
+        return text
+
+    def transcribe_with_info(self, audio: Union[str, np.ndarray], count: bool = True, **options):
+        """Returns (text, faster-whisper TranscriptionInfo)."""
+        segments, info = self.transcribe_segments(audio, count=count, **options)
+        return " ".join([s.text for s in segments]).strip(), info
+
+    def transcribe_segments(self, audio: Union[str, np.ndarray], count: bool = True, **options):
+        """Returns (list of faster-whisper Segments, TranscriptionInfo)."""
+        self.load()
+        if isinstance(audio, np.ndarray) and audio.dtype != np.float32:
+            audio = audio.astype(np.float32)
+
+        kwargs = {**DECODE_DEFAULTS, **options}
+
+        t0 = time.perf_counter()
+        if kwargs.get("batch_size"):
+            # chunked + batched decoding of one long file (faster-whisper >= 1.1)
+            segments, info = self.batched().transcribe(audio, **kwargs)
+        else:
+            segments, info = self.model.transcribe(audio, **kwargs)
+        segments = list(segments)   # segments are lazy: decode happens here
+        dt = time.perf_counter() - t0
+
+        if count:
+            current_turn().note(stt_model=self.model_size, stt_audio_s=info.duration,
+                                stt_vad_s=getattr(info, "duration_after_vad", info.duration))
+            with self._lock:
+                self.calls += 1
+                self.decode_s += dt
+                self.audio_s += info.duration
+        return segments, info
+
+    def transcribe_adaptive(self, audio: Union[str, np.ndarray], accept: Optional[Callable[[str], bool]] = None,
+                            count: bool = True, **options) -> str:
+        """
+        Greedy + hotwords first; re-decode with FALLBACK_OPTIONS when unreliable()
+        objects or accept(text) (e.g. the router can't make sense of it) says no.
+        """
+        t0 = time.perf_counter()
+        segments, info = self.transcribe_segments(audio, count=False, **{**GREEDY_OPTIONS, **options})
+        text = " ".join([s.text for s in segments]).strip()
+        t1 = time.perf_counter()
+
+        reason = unreliable(segments, info)
+        if reason is None and accept is not None and text and not accept(text):
+            reason = "parse"
+        if reason is not None:
+            segments, info = self.transcribe_segments(audio, count=False, **{**FALLBACK_OPTIONS, **options})
+            text = " ".join([s.text for s in segments]).strip()
+        t2 = time.perf_counter()
+
+        if count:
+            current_turn().note(stt_model=self.model_size, stt_audio_s=info.duration,
+                                stt_vad_s=getattr(info, "duration_after_vad", info.duration),
+                                stt_decode="fallback" if reason else "greedy",
+                                stt_fallback=reason, stt_first_pass_s=round(t1 - t0, 4))
+            with self._lock:
+                self.calls += 1
+                self.adaptive_calls += 1
+                self.decode_s += t2 - t0
+                self.audio_s += info.duration
+                self.first_pass_s += t1 - t0
+                if reason:
+                    self.fallbacks[reason] += 1
+                    self.fallback_s += t2 - t1
+        return text
+
+    def transcribe_partials(self, audio: np.ndarray, accept: Optional[Callable[[str], bool]] = None,
+                            postprocess: Optional[Callable[[str], str]] = None,
+                            **options) -> Iterator[tuple[str, float]]:
+        """
+        Yields (text so far, seconds of audio still to decode) after every
+        chunk. The utterance is cut at pauses (mic_capture.pause_splits) and
+        the chunks are decoded in turn, each prompted with the text before it,
+        so the first words are out after one short decode and closing the
+        generator early skips the chunks not decoded yet. Each chunk is its own
+        Whisper window, so a run to the end costs one encoder pass per chunk;
+        audio without a usable pause is a single decode. In adaptive mode the
+        chunks are decoded greedily; if they run to the end and look
+        unreliable, the full decode follows and its text is yielded last with
+        0 seconds left.
+        """
+        self.load()
+        audio = audio.astype(np.float32, copy=False)
+        first = GREEDY_OPTIONS if DECODE_MODE == "adaptive" else {}
+        fix = postprocess or (lambda t: t)
+        duration = len(audio) / SAMPLE_RATE
+        bounds = [0, *pause_splits(audio, SAMPLE_RATE), len(audio)]
+
+        t0 = time.perf_counter()
+        done, parts, chunks, decoded, speech = [], [], 0, 0.0, 0.0
+        t1, reason = None, None
+        try:
+            for start, end in zip(bounds, bounds[1:]):
+                kwargs = {**DECODE_DEFAULTS, **first, **options}
+                if parts:
+                    kwargs["initial_prompt"] = " ".join(p for p in (kwargs.get("initial_prompt"), *parts) if p)
+                segments, info = self.model.transcribe(audio[start:end], **kwargs)
+                segs = list(segments)
+                chunks += 1
+                decoded = end / SAMPLE_RATE
+                speech += getattr(info, "duration_after_vad", info.duration)
+                done += segs
+                parts += [s.text.strip() for s in segs if s.text.strip()]
+                yield fix(" ".join(parts)), max(duration - decoded, 0.0)
+            t1 = time.perf_counter()
+            if first:
+                text = " ".join(parts)
+                reason = unreliable(done, SimpleNamespace(duration=duration, duration_after_vad=speech))
+                if reason is None and accept is not None and text and not accept(text):
+                    reason = "parse"
+                if reason is not None:
+                    current_turn().note(stt_fallback=reason)
+                    segs, _ = self.transcribe_segments(audio, count=False, **{**FALLBACK_OPTIONS, **options})
+                    yield fix(" ".join(s.text for s in segs).strip()), 0.0
+        finally:
+            t2 = time.perf_counter()
+            t1 = t1 or t2
+            skipped = max(duration - decoded, 0.0)
+            current_turn().note(stt_model=self.model_size, stt_audio_s=duration,
+                                stt_chunks=chunks, stt_skipped_s=round(skipped, 3))
+            with self._lock:
+                self.calls += 1
+                self.streams += 1
+                self.decode_s += t2 - t0
+                self.audio_s += duration - skipped
+                if first:
+                    self.adaptive_calls += 1
+                    self.first_pass_s += t1 - t0
+                if reason:
+                    self.fallbacks[reason] += 1
+                    self.fallback_s += t2 - t1
+                if skipped > 0:
+                    self.early_stops += 1
+                    self.skipped_s += skipped
+
+    def transcribe_many(self, audios: list[np.ndarray], **options) -> list[str]:
+        """
+        Several short utterances (e.g. from different clients) in one batched
+        decode: each is placed in its own 30 s window of a padded buffer and
+        passed as a clip (sample offsets), so the encoder/decoder run on all of
+        them together and segments map back to their utterance by start time.
+        """
+        slot = int(BATCH_SLOT_S * SAMPLE_RATE)
+        if len(audios) == 1 or any(len(a) > slot for a in audios):
+            return [self.transcribe(a, **options) for a in audios]
+
+        buf = np.zeros(slot * len(audios), dtype=np.float32)
+        clips = []
+        for k, a in enumerate(audios):
+            buf[k * slot:k * slot + len(a)] = a
+            clips.append({"start": k * slot, "end": k * slot + len(a)})
+
+        kwargs = dict(
+            language="ms",
+            beam_size=5,
+            temperature=0.0,
+            condition_on_previous_text=False,
+            initial_prompt=PRAYER_HINT,
+            vad_filter=False,
+            clip_timestamps=clips,
+            batch_size=len(audios),
+        )
+        kwargs.update(options)
+
+        t0 = time.perf_counter()
+        segments, _ = self.batched().transcribe(buf, **kwargs)
+        parts: list[list[str]] = [[] for _ in audios]
+        for seg in segments:
+            parts[min(int(seg.start // BATCH_SLOT_S), len(audios) - 1)].append(seg.text)
+        dt = time.perf_counter() - t0
+
+        with self._lock:
+            self.calls += len(audios)
+            self.decode_s += dt
+            self.audio_s += sum(len(a) for a in audios) / SAMPLE_RATE
+        return [" ".join(p).strip() for p in parts]
+
+    def batched(self):
+        """faster-whisper BatchedInferencePipeline over the same loaded model."""
+        self.load()
+        with self._lock:       # several SttBatcher workers can get here first at once
+            if self._batched is None:
+                from faster_whisper import BatchedInferencePipeline
+                self._batched = BatchedInferencePipeline(model=self.model)
+        return self._batched
+
+    def stats(self) -> dict:
+        return {
+            "model_size": self.model_size,
+            "compute_type": self.compute_type,
+            "cpu_threads": self.cpu_threads,
+            "num_workers": self.num_workers,
+            "load_s": self.load_s,
+            "warmup_rtf": self.warmup_rtf,
+            "calls": self.calls,
+            "rtf": self.decode_s / self.audio_s if self.audio_s else None,
+            "adaptive_calls": self.adaptive_calls,
+            "fallback_rate": sum(self.fallbacks.values()) / self.adaptive_calls if self.adaptive_calls else None,
+            "fallback_reasons": dict(self.fallbacks),
+            "first_pass_avg_s": self.first_pass_s / self.adaptive_calls if self.adaptive_calls else None,
+            "fallback_avg_s": self.fallback_s / sum(self.fallbacks.values()) if self.fallbacks else None,
+            "streams": self.streams,
+            "early_stops": self.early_stops,
+            "skipped_audio_s": self.skipped_s,
+        }
+
+
+def estimate_memory_mb(model_size: str, compute_type: str = COMPUTE_TYPE) -> float:
+    """Rough resident size of one loaded model (weights + runtime buffers)."""
+    params = MODEL_PARAMS_M.get(model_size, MODEL_PARAMS_M["large-v3"])
+    return params * BYTES_PER_PARAM.get(compute_type, 4) + RUNTIME_OVERHEAD_MB
+
+
+class CascadeEngine:
+    """
+    Cheap model first, bigger model only when needed: each tier but the last
+    decodes greedily with hotwords and its transcript is kept only when every
+    segment is confident (CHEAP_LOGPROB_MIN) and complete(text) agrees (the
+    router resolves prayer + zone + date). Otherwise the same audio array goes
+    to the next tier. The last tier decodes like transcribe_faster (STT_DECODE:
+    adaptive, or always beam).
+
+    All tiers stay loaded; tiers that would push the estimate past the memory
+    budget are dropped, cheapest first, so the most accurate model always stays.
+    """
+
+    def __init__(self, tiers: list[str] = None, memory_budget_mb: float = MEMORY_BUDGET_MB,
+                 history: int = 500, **config):
+        tiers = list(tiers or CASCADE or [MODEL_SIZE])
+        compute_type = config.get("compute_type", COMPUTE_TYPE)
+        while len(tiers) > 1 and sum(estimate_memory_mb(t, compute_type) for t in tiers) > memory_budget_mb:
+            print(f"[STT] Cascade: dropping {tiers[0]} to stay within {memory_budget_mb:.0f} MB")
+            tiers.pop(0)
+        self.engines = [get_engine(t, **config) for t in tiers]
+        self.memory_budget_mb = memory_budget_mb
+        self.memory_mb = sum(estimate_memory_mb(t, compute_type) for t in tiers)
+        self._lock = threading.Lock()
+        self.attempts = [0] * len(tiers)
+        self.accepted = [0] * len(tiers)
+        self.latency = [deque(maxlen=history) for _ in tiers]
+
+    @property
+    def tiers(self) -> list[str]:
+        return [e.model_size for e in self.engines]
+
+    def load(self):
+        for e in self.engines:
+            e.load()
+
+    def transcribe(self, audio: Union[str, np.ndarray], accept: Optional[Callable[[str], bool]] = None,
+                   complete: Optional[Callable[[str], bool]] = None) -> str:
+        """accept: as in transcribe_faster (last tier, per STT_DECODE); complete: gate for the cheap tiers (defaults to accept)."""
+        complete = complete or accept
+        turn = current_turn()
+        for k, eng in enumerate(self.engines[:-1]):
+            t0 = time.perf_counter()
+            segments, info = eng.transcribe_segments(audio, count=False, **GREEDY_OPTIONS)
+            text = " ".join([s.text for s in segments]).strip()
+            ok = (bool(text) and unreliable(segments, info) is None
+                  and all(s.avg_logprob >= CHEAP_LOGPROB_MIN for s in segments)
+                  and complete is not None and complete(text))
+            self._record(k, time.perf_counter() - t0, ok)
+            if ok:
+                turn.note(stt_model=eng.model_size, stt_audio_s=info.duration, stt_decode="cascade")
+                return text
+        t0 = time.perf_counter()
+        text = _decode(self.engines[-1], audio, accept)
+        self._record(len(self.engines) - 1, time.perf_counter() - t0, True)
+        return text
+
+    def _record(self, tier: int, dt: float, accepted: bool):
+        with self._lock:
+            self.attempts[tier] += 1
+            self.accepted[tier] += accepted
+            self.latency[tier].append(dt)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.attempts[0]
+            tiers = []
+            for k, eng in enumerate(self.engines):
+                lat = np.asarray(self.latency[k]) * 1000.0
+                tiers.append({
+                    "model": eng.model_size,
+                    "attempts": self.attempts[k],
+                    "accepted": self.accepted[k],
+                    "hit_rate": self.accepted[k] / total if total else None,   # share of all questions
+                    "p50_ms": float(np.percentile(lat, 50)) if lat.size else None,
+                    "p95_ms": float(np.percentile(lat, 95)) if lat.size else None,
+                })
+        return {"questions": total, "memory_mb": self.memory_mb, "memory_budget_mb": self.memory_budget_mb,
+                "tiers": tiers, "final": self.engines[-1].stats()}
+
+
+_engines: dict[str, SttEngine] = {}
+_cascade: Optional[CascadeEngine] = None
+
+def get_engine(model_size: str = MODEL_SIZE, **config) -> SttEngine:
+    """Shared engine per model size (created on first use)."""
+    eng = _engines.get(model_size)
+    if eng is None:
+        eng = _engines[model_size] = SttEngine(model_size, **config)
+    return eng
+
+def preload(model_size: str = MODEL_SIZE, warmup: bool = True, **config) -> SttEngine:
+    """Load (and warm up) the engine at startup and print timings."""
+    eng = get_engine(model_size, **config)
+    eng.load()
+    print(f"[STT] Loaded {model_size} ({eng.compute_type}, threads={eng.cpu_threads or 'auto'}, "
+          f"workers={eng.num_workers}) in {eng.load_s:.2f}s")
+    if warmup:
+        rtf = eng.warmup()
+        if rtf is not None:
+            print(f"[STT] Warm-up RTF: {rtf:.2f}")
+    return eng
+
+def get_cascade(**config) -> CascadeEngine:
+    """Shared cascade over STT_CASCADE tiers (created on first use)."""
+    global _cascade
+    if _cascade is None:
+        _cascade = CascadeEngine(**config)
+    return _cascade
+
+def preload_cascade(warmup: bool = True, **config) -> CascadeEngine:
+    """Load (and warm up) every cascade tier at startup."""
+    cascade = get_cascade(**config)
+    for eng in cascade.engines:
+        preload(eng.model_size, warmup=warmup)
+    print(f"[STT] Cascade {' -> '.join(cascade.tiers)}: ~{cascade.memory_mb:.0f} MB "
+          f"of {cascade.memory_budget_mb:.0f} MB budget")
+    return cascade
+
+def transcribe_partials(audio: np.ndarray, model_size: str = MODEL_SIZE,
+                        accept: Optional[Callable[[str], bool]] = None,
+                        postprocess: Optional[Callable[[str], str]] = None) -> Iterator[tuple[str, float]]:
+    """Streaming variant of transcribe_faster for router.IncrementalRouter (see SttEngine.transcribe_partials)."""
+    return get_engine(model_size).transcribe_partials(audio, accept=accept, postprocess=postprocess)
+
+def transcribe_faster(audio: Union[str, np.ndarray], model_size: str = MODEL_SIZE,
+                      accept: Optional[Callable[[str], bool]] = None,
+                      complete: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    audio: a file path, or a float32 mono 16 kHz NumPy array (no disk / decoder round trip).
+    accept: optional check on the greedy transcript (STT_DECODE=adaptive); False forces the full decode.
+    complete: with STT_CASCADE set, a cheap tier's transcript is used only if this says the
+              question is fully resolved; otherwise the audio goes to the next model.
+    """
+    if CASCADE and model_size == MODEL_SIZE:
+        return get_cascade().transcribe(audio, accept=accept, complete=complete)
+    return _decode(get_engine(model_size), audio, accept)
+
+def _decode(eng: SttEngine, audio: Union[str, np.ndarray], accept: Optional[Callable[[str], bool]]) -> str:
+    """STT_DECODE dispatch: greedy + fallback, or always the full beam decode."""
+    if DECODE_MODE == "adaptive":
+        return eng.transcribe_adaptive(audio, accept=accept)
+    return eng.transcribe(audio)
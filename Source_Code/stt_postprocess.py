@@ -1,10 +1,14 @@
 import re
+from collections import OrderedDict
+from typing import Iterable, Optional
+
 from rapidfuzz import process, fuzz
 
 VOCAB = [
     "waktu", "solat", "dekat", "tempat", "di", "untuk",
     "imsak", "subuh", "syuruk", "dhuha", "zohor", "asar", "maghrib", "isyak",
     "gombak", "klang",
+    "johor",   # state name; kept so the fuzzy pass doesn't turn it into "zohor"
     "kuala", "selangor", "sabak", "bernam",
     "langat", "petaling", "sepang", "shah", "alam",
     "minit",
@@ -39,7 +43,6 @@ REPLACE = {
     "waddu": "waktu",
     "waduh": "waktu",
     "asa": "asar",
-    "johor": "zohor",
 
     # prayer/domain common errors
     "batu": "waktu",
@@ -50,7 +53,7 @@ REPLACE = {
     "gomak": "gombak",
     "gumbang": "gombak",
 
-    "sahabat": "sabak",
+    "sahabat bernam": "sabak bernam",   # "sahabat" alone is a place in Sabah
     "sabat": "sabak",
     "bernang": "bernam",
     "benam": "bernam",
@@ -61,21 +64,125 @@ REPLACE = {
 }
 
 
+_NON_ALNUM = re.compile(r"[^a-z0-9\s]")
+
+
+class CompiledCorrector:
+    """
+    Single-pass version of the REPLACE + VOCAB correction.
+
+    - the text is tokenized once; protected phrases (gazetteer place names)
+      and multiword REPLACE keys are matched first, longest first, so
+      "batu pahat" or "kluang" survive while "batu asar" still becomes
+      "waktu asar"
+    - single-word REPLACE keys are a dict lookup per remaining token
+      (so "asa" -> "asar" never fires inside "asar")
+    - words not already in VOCAB are scored against it in one
+      process.cdist call per text, and each word's correction is memoized
+      in a bounded LRU (transcripts repeat the same few words a lot)
+    """
+
+    def __init__(self, vocab: list[str] = VOCAB, replace: dict = REPLACE,
+                 threshold: int = 78, cache_size: int = 4096, protected: Iterable[str] = ()):
+        self.vocab = list(dict.fromkeys(vocab))
+        self.vocab_set = set(self.vocab)
+        self.replace = dict(replace)
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, str] = OrderedDict()
+
+        # first token -> [(phrase tokens, replacement or None = keep)], longest first
+        self._phrases: dict[str, list[tuple[tuple[str, ...], Optional[str]]]] = {}
+        for name in protected:
+            self._add_phrase(_words(name), None)
+        for key, value in self.replace.items():
+            if " " in key:
+                self._add_phrase(_words(key), value)
+
+    def _add_phrase(self, toks: tuple[str, ...], value: Optional[str]):
+        if toks:
+            bucket = self._phrases.setdefault(toks[0], [])
+            bucket.append((toks, value))
+            bucket.sort(key=lambda e: len(e[0]), reverse=True)
+
+    def _segments(self, t: str) -> list[tuple[list[str], bool]]:
+        """(words, fixed) runs: fixed words are protected or already rewritten and skip the fuzzy pass."""
+        words = _words(t)
+        out, run, i = [], [], 0
+        while i < len(words):
+            hit = next((e for e in self._phrases.get(words[i], ())
+                        if words[i:i + len(e[0])] == e[0]), None)
+            if hit is None:
+                run.append(self.replace.get(words[i], words[i]))
+                i += 1
+                continue
+            if run:
+                out.append((run, False))
+                run = []
+            toks, value = hit
+            out.append((list(toks) if value is None else value.split(), True))
+            i += len(toks)
+        if run:
+            out.append((run, False))
+        return out
+
+    def normalize(self, t: str) -> str:
+        return " ".join(w for words, _ in self._segments(t) for w in words)
+
+    def correct_words(self, words: list[str]) -> list[str]:
+        cache = self._cache
+        todo = []
+        for w in words:
+            if w in self.vocab_set:
+                continue
+            if w in cache:
+                cache.move_to_end(w)
+            else:
+                todo.append(w)
+
+        if todo:
+            todo = list(dict.fromkeys(todo))
+            scores = process.cdist(todo, self.vocab, scorer=fuzz.ratio, workers=1)
+            best = scores.argmax(axis=1)
+            for w, j, row in zip(todo, best, scores):
+                cache[w] = self.vocab[j] if row[j] >= self.threshold else w
+
+        out = [w if w in self.vocab_set else cache[w] for w in words]
+        # trim only after this text's words have been looked up
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return out
+
+    def __call__(self, text: str) -> str:
+        segs = self._segments(text)
+        loose = iter(self.correct_words([w for words, fixed in segs if not fixed for w in words]))
+        return " ".join(w if fixed else next(loose) for words, fixed in segs for w in words)
+
+
+def _words(t: str) -> tuple[str, ...]:
+    return tuple(_NON_ALNUM.sub(" ", (t or "").lower()).split())
+
+
+def _place_names() -> list[str]:
+    """Gazetteer names to leave alone (gated names are everyday words and stay correctable)."""
+    from gazetteer import get_gazetteer
+    gz = get_gazetteer()
+    return [p for p in gz.places() if p not in gz.gated]
+
+
+_correctors: dict[int, CompiledCorrector] = {}
+
+
+def _get_corrector(threshold: int) -> CompiledCorrector:
+    c = _correctors.get(threshold)
+    if c is None:
+        c = _correctors[threshold] = CompiledCorrector(threshold=threshold, protected=_place_names())
+    return c
+
+
 def _norm(t: str) -> str:
-    t = t.lower()
-    for k, v in REPLACE.items():
-        t = t.replace(k, v)
-    t = re.sub(r"[^a-z0-9\s]", " ", t)
-    t = re.sub(r"\s+", " ", t).strip()
-    return t
+    return _get_corrector(78).normalize(t)
+
 
 def correct_domain_text(text: str, threshold: int = 78) -> str:
-    words = _norm(text).split()
-    fixed = []
-    for w in words:
-        m = process.extractOne(w, VOCAB, scorer=fuzz.ratio)
-        if m and m[1] >= threshold:
-            fixed.append(m[0])
-        else:
-            fixed.append(w)
-    return " ".join(fixed)
+    return _get_corrector(threshold)(text)
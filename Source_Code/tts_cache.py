@@ -0,0 +1,410 @@
+"""
+Pre-rendered phrase cache for TTS replies.
+
+Prayer answers come from a handful of templates (router.ANSWERS), so instead
+of running pyttsx3 over the whole sentence every time, the reply is cut into
+units that are each rendered once and kept on disk:
+
+    "Waktu solat maghrib hari ini untuk zon SGR01 ialah 19:20."
+    -> [waktu solat] [maghrib] [hari ini] [untuk zon] [S G R kosong satu] [ialah]
+       [sembilan] [belas] [dua] [puluh] + pause
+
+- fixed template wording, prayer names and day labels: one clip each
+- zone codes: spelled out, one clip per code
+- numbers (times, "lagi N minit"): Malay number words, one clip per word
+- anything else (LLM replies, fixed messages): the whole utterance is one
+  clip, so a repeated reply also plays straight from disk
+
+Clips are joined with short pauses and played through audio_out.py, so a
+fully cached reply starts after a few ms of file reads instead of a full
+synthesis. Clips are keyed by the text and the pyttsx3 voice/rate/volume.
+
+    python tts_cache.py --warm                  # render all template units + zone codes
+    python tts_cache.py --say "Waktu solat asar hari ini untuk zon SGR01 ialah 16:30."
+"""
+import os
+import re
+import time
+import string
+import hashlib
+import argparse
+import tempfile
+import threading
+from collections import OrderedDict
+from math import gcd
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+from scipy.io import wavfile
+from scipy.signal import resample_poly
+
+from router import ANSWERS, PRAYER_CANON, NO_DATA_ANSWER, GREETING_ANSWER
+from metrics import current_turn
+
+# Lives next to the code, like prayer_cache.sqlite3
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache")
+
+UTTERANCE_MAX = 256        # whole free-form replies kept on disk (least recently played dropped)
+MEMORY_MAX = 512           # decoded clips kept in memory
+
+WORD_GAP_S = 0.03          # between units
+COMMA_S = 0.15             # after , : ( )
+STOP_S = 0.30              # after . ? !
+TRIM_DB = -45.0            # clip edges quieter than this (vs. the clip peak) are cut
+EDGE_S = 0.01              # kept around the trimmed clip
+
+DAY_LABELS = ("hari ini", "esok", "lusa")
+
+# Replies that never change; rendered whole by --warm
+FIXED_REPLIES = (ANSWERS["which"], NO_DATA_ANSWER, GREETING_ANSWER)
+
+_DIGITS = ("kosong", "satu", "dua", "tiga", "empat", "lima", "enam", "tujuh", "lapan", "sembilan")
+
+
+def malay_number(n: int) -> str:
+    """19 -> "sembilan belas", 125 -> "seratus dua puluh lima"."""
+    if n < 10:
+        return _DIGITS[n]
+    if n == 10:
+        return "sepuluh"
+    if n == 11:
+        return "sebelas"
+    if n < 20:
+        return f"{_DIGITS[n - 10]} belas"
+    for size, one, word in ((1000, "seribu", "ribu"), (100, "seratus", "ratus"), (10, "sepuluh", "puluh")):
+        if n >= size:
+            head, rest = divmod(n, size)
+            s = one if head == 1 else f"{malay_number(head)} {word}"
+            return f"{s} {malay_number(rest)}" if rest else s
+
+
+def spoken_time(hhmm: str) -> str:
+    """"05:07" -> "lima kosong tujuh", "13:00" -> "tiga belas"."""
+    hh, mm = (int(x) for x in hhmm.split(":"))
+    if mm == 0:
+        return malay_number(hh)
+    return f"{malay_number(hh)} {'kosong ' if mm < 10 else ''}{malay_number(mm)}"
+
+
+def spell_zone(zone: str) -> str:
+    """"SGR01" -> "S G R kosong satu"."""
+    letters, digits = zone[:3].upper(), zone[3:]
+    return " ".join([*letters, *(_DIGITS[int(d)] for d in digits)])
+
+
+_SLOT_RE = re.compile(
+    r"(?P<time>\b\d{1,2}:\d{2}\b)|(?P<zone>\b[A-Z]{3}\d{2}\b)|(?P<num>\d+)|(?P<word>\b(?:%s)\b)"
+    % "|".join(re.escape(w) for w in (*PRAYER_CANON, *DAY_LABELS)),
+    re.IGNORECASE,
+)
+_PUNCT_RE = re.compile(r"([^\w\s]+)")
+
+
+def _template_re(template: str) -> str:
+    """ANSWERS template -> regex; a {field} is any run of text within one sentence."""
+    return "".join(re.escape(literal) + ("[^.?!]+?" if field is not None else "")
+                   for literal, field, _, _ in string.Formatter().parse(template))
+
+
+# Only replies built from a router.ANSWERS template (optionally followed by the
+# "other zones" hint) are split into units; anything else, e.g. an LLM reply that
+# happens to mention a time, is cached whole and pruned with the utterances.
+_TEMPLATED_RE = re.compile("(?:%s)(?:%s)?" % (
+    "|".join(_template_re(t) for k, t in ANSWERS.items()
+             if k != "other_zones" and any(f for _, f, _, _ in string.Formatter().parse(t))),
+    _template_re(ANSWERS["other_zones"])))
+
+
+def is_templated(text: str) -> bool:
+    return bool(_TEMPLATED_RE.fullmatch(" ".join(text.split())))
+
+
+def split_units(text: str) -> list[tuple[str, float]]:
+    """Templated reply -> [(unit text, pause after in seconds), ...] in speaking order."""
+    units: list[list] = []
+
+    def literal(chunk: str):
+        for part in _PUNCT_RE.split(chunk):
+            if not part.strip():
+                continue
+            if _PUNCT_RE.fullmatch(part):
+                if units:
+                    pause = STOP_S if re.search(r"[.?!]", part) else COMMA_S
+                    units[-1][1] = max(units[-1][1], pause)
+                continue
+            units.append([" ".join(part.lower().split()), WORD_GAP_S])
+
+    pos = 0
+    for m in _SLOT_RE.finditer(text):
+        literal(text[pos:m.start()])
+        kind, value = m.lastgroup, m.group()
+        if kind == "time":
+            words = spoken_time(value).split()
+        elif kind == "num":
+            words = malay_number(int(value)).split()
+        elif kind == "zone":
+            words = [spell_zone(value)]
+        else:
+            words = [value.lower()]
+        units.extend([w, WORD_GAP_S] for w in words)
+        pos = m.end()
+    literal(text[pos:])
+    return [(u, p) for u, p in units]
+
+
+def template_units() -> set[str]:
+    """Every unit a prayer answer can need, apart from zone codes and place names."""
+    units = set(PRAYER_CANON) | set(DAY_LABELS)
+    for n in range(60):
+        units.update(malay_number(n).split())
+    units.update(("seratus", "ratus", "seribu", "ribu"))
+    for template in ANSWERS.values():
+        parsed = list(string.Formatter().parse(template))
+        if any(field for _, field, _, _ in parsed):     # fixed replies are rendered whole
+            for literal, *_ in parsed:
+                units.update(u for u, _ in split_units(literal))
+    return units
+
+
+class PhraseCache:
+    """
+    Rendered clips on disk (root/units, root/utterances) with an in-memory LRU
+    of decoded audio in front.
+
+    render(text, path) writes a WAV for text; by default it is
+    tts_pyttsx3.synthesize_to_file. pyttsx3 is not thread-safe, so rendering
+    is serialized and should happen on the thread that otherwise speaks.
+    """
+
+    def __init__(self, root: str = DEFAULT_DIR, render: Optional[Callable[[str, str], object]] = None,
+                 voice: Optional[str] = None, utterance_max: int = UTTERANCE_MAX,
+                 memory_max: int = MEMORY_MAX):
+        self.root = root
+        self.utterance_max = utterance_max
+        self.memory_max = memory_max
+        self._render_fn = render
+        self._voice = voice if voice is not None else ("" if render is not None else None)
+        self.sr: Optional[int] = None
+        self.renders = 0
+
+        self._lock = threading.Lock()
+        self._mem: OrderedDict[tuple[str, str], np.ndarray] = OrderedDict()
+        self._stats = {kind: {"hits": 0, "misses": 0} for kind in ("units", "utterances")}
+        for kind in self._stats:
+            os.makedirs(os.path.join(root, kind), exist_ok=True)
+
+    @property
+    def voice(self) -> str:
+        if self._voice is None:
+            from tts_pyttsx3 import voice_tag
+            self._voice = voice_tag()
+        return self._voice
+
+    def _path(self, kind: str, text: str) -> str:
+        digest = hashlib.sha1(f"{self.voice}\n{text}".encode("utf-8")).hexdigest()[:20]
+        return os.path.join(self.root, kind, digest + ".wav")
+
+    # ----------------------------
+    # Clips
+    # ----------------------------
+    def clip(self, text: str, kind: str = "units") -> np.ndarray:
+        """Audio for one unit (or a whole utterance), rendering it on first use."""
+        key = (kind, text)
+        st = self._stats[kind]
+        with self._lock:
+            audio = self._mem.get(key)
+            if audio is not None:
+                self._mem.move_to_end(key)
+                st["hits"] += 1
+                return audio
+
+            path = self._path(kind, text)
+            if os.path.exists(path):
+                sr, data = wavfile.read(path)
+                audio = self._to_float(sr, data)
+                if kind == "utterances":
+                    os.utime(path)          # mtime = last played, for pruning
+                st["hits"] += 1
+            else:
+                audio = self._render(text, path)
+                st["misses"] += 1
+                if kind == "utterances":
+                    self._prune_utterances()
+
+            self._mem[key] = audio
+            while len(self._mem) > self.memory_max:
+                self._mem.popitem(last=False)
+            return audio
+
+    def _render(self, text: str, path: str) -> np.ndarray:
+        if self._render_fn is None:
+            from tts_pyttsx3 import synthesize_to_file
+            self._render_fn = synthesize_to_file
+        fd, tmp = tempfile.mkstemp(suffix=".wav", dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            self._render_fn(text, tmp)
+            sr, data = wavfile.read(tmp)
+        finally:
+            os.remove(tmp)
+        audio = self._trim(self._to_float(sr, data))
+        self.renders += 1
+
+        part = path + ".part"
+        wavfile.write(part, self.sr, (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16))
+        os.replace(part, path)
+        return audio
+
+    def _to_float(self, sr: int, data: np.ndarray) -> np.ndarray:
+        if data.ndim > 1:
+            data = data.mean(axis=1)
+        if data.dtype == np.uint8:
+            data = (data.astype(np.float32) - 128.0) / 128.0
+        elif data.dtype.kind == "i":
+            data = data.astype(np.float32) / np.iinfo(data.dtype).max
+        data = data.astype(np.float32, copy=False)
+        if self.sr is None:
+            self.sr = int(sr)
+        elif sr != self.sr:
+            g = gcd(int(sr), self.sr)
+            data = resample_poly(data, self.sr // g, int(sr) // g).astype(np.float32)
+        return data
+
+    def _trim(self, audio: np.ndarray) -> np.ndarray:
+        """Cut the engine's leading/trailing silence so joined clips don't drag."""
+        mag = np.abs(audio)
+        if mag.size == 0 or mag.max() == 0:
+            return audio[:0]
+        loud = np.flatnonzero(mag >= mag.max() * 10 ** (TRIM_DB / 20))
+        edge = int(EDGE_S * self.sr)
+        return audio[max(0, loud[0] - edge): loud[-1] + 1 + edge]
+
+    def _prune_utterances(self):
+        folder = os.path.join(self.root, "utterances")
+        files = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".wav")]
+        if len(files) <= self.utterance_max:
+            return
+        files.sort(key=os.path.getmtime)
+        for f in files[:len(files) - self.utterance_max]:
+            os.remove(f)
+
+    # ----------------------------
+    # Replies
+    # ----------------------------
+    def assemble(self, text: str) -> np.ndarray:
+        """Whole reply as one float32 buffer at self.sr."""
+        text = " ".join(text.split())
+        if not text:
+            return np.zeros(0, np.float32)
+        if not is_templated(text):
+            return self.clip(text, "utterances")
+        parts = []
+        for unit, pause in split_units(text):
+            parts.append(self.clip(unit))
+            parts.append(np.zeros(int(pause * self.sr), np.float32))
+        return np.concatenate(parts)
+
+    def prerender(self, zones: Iterable[str] = (), fixed: Iterable[str] = FIXED_REPLIES) -> int:
+        """Render template units, number words, zone codes and fixed replies not on disk yet."""
+        todo = [("units", u) for u in sorted(template_units() | {spell_zone(z) for z in zones})]
+        todo += [("utterances", " ".join(t.split())) for t in fixed]
+        todo = [(kind, t) for kind, t in todo if not os.path.exists(self._path(kind, t))]
+        for kind, t in todo:
+            self.clip(t, kind)
+        return len(todo)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {}
+            for kind, st in self._stats.items():
+                lookups = st["hits"] + st["misses"]
+                out[kind] = {**st, "files": len(os.listdir(os.path.join(self.root, kind))),
+                             "hit_rate": st["hits"] / lookups if lookups else 0.0}
+            return out
+
+
+# ----------------------------
+# Drop-in speak()/stop() for tts_pyttsx3
+# ----------------------------
+_cache: Optional[PhraseCache] = None
+_disabled = False
+
+def get_phrase_cache() -> PhraseCache:
+    global _cache
+    if _cache is None:
+        _cache = PhraseCache()
+    return _cache
+
+
+def warm(zones: Optional[Iterable[str]] = None) -> int:
+    """Pre-render everything (all JAKIM zones by default). Fast when already on disk."""
+    if zones is None:
+        from gazetteer import get_gazetteer
+        zones = list(get_gazetteer().zones)
+    return get_phrase_cache().prerender(zones)
+
+
+def play(audio: np.ndarray, sr: int):
+    """Play through the shared output stream (audio_out.py) and wait until done."""
+    from audio_out import get_output
+    if audio.size:
+        get_output().play_pcm(audio, sr).wait()
+
+
+def speak(text: str):
+    """Like tts_pyttsx3.speak, but plays cached clips (rendering missing ones first)."""
+    global _disabled
+    if not _disabled:
+        cache = get_phrase_cache()
+        renders = cache.renders
+        t0 = time.monotonic()
+        try:
+            audio = cache.assemble(text)
+        except Exception as e:   # e.g. the engine writes AIFF instead of WAV on macOS
+            print(f"[TTS] Phrase cache off ({type(e).__name__}: {e}); using pyttsx3 directly.")
+            _disabled = True
+        else:
+            current_turn().note(tts_cache="hit" if cache.renders == renders else "miss",
+                                tts_ready_s=round(time.monotonic() - t0, 4))
+            play(audio, cache.sr)
+            return
+
+    from tts_pyttsx3 import speak as speak_direct
+    speak_direct(text)
+
+
+def stop():
+    """Interrupt playback (barge-in / Ctrl+C)."""
+    if _disabled:
+        from tts_pyttsx3 import stop as stop_direct
+        stop_direct()
+        return
+    from audio_out import get_output
+    get_output().cancel(channel="speech")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Pre-rendered TTS phrase cache")
+    ap.add_argument("--warm", action="store_true", help="render every template unit and zone code")
+    ap.add_argument("--say", help="assemble and play one reply")
+    ap.add_argument("--dir", default=DEFAULT_DIR)
+    args = ap.parse_args(argv)
+
+    global _cache
+    _cache = PhraseCache(args.dir)
+    if args.warm:
+        t0 = time.monotonic()
+        n = warm()
+        print(f"[TTS] Rendered {n} new clips in {time.monotonic() - t0:.1f}s")
+    if args.say:
+        t0 = time.monotonic()
+        audio = _cache.assemble(args.say)
+        print(f"[TTS] Ready in {(time.monotonic() - t0) * 1000:.1f} ms ({audio.size / _cache.sr:.2f}s of audio)")
+        play(audio, _cache.sr)
+    for kind, st in _cache.stats().items():
+        print(f"[TTS] {kind}: {st['hits']} hits / {st['misses']} misses, {st['files']} files")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
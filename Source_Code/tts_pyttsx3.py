@@ -1,14 +1,102 @@
+import queue
+import threading
+from typing import Callable, Iterable, Optional
+
 import pyttsx3
 
 _engine = None
 
-def speak(text: str):
+def _get_engine():
     global _engine
     if _engine is None:
         _engine = pyttsx3.init()
         # Optional: tweak rate/volume if you want
         # _engine.setProperty("rate", 175)
         # _engine.setProperty("volume", 1.0)
+    return _engine
+
+def speak(text: str):
+    engine = _get_engine()
+    engine.say(text)
+    engine.runAndWait()
+
+def stop():
+    """Interrupt the utterance being spoken (runAndWait returns early)."""
+    if _engine is not None:
+        _engine.stop()
+
+def voice_tag() -> str:
+    """Current voice/rate/volume; rendered clips are only reusable with the same settings."""
+    engine = _get_engine()
+    return "|".join(str(engine.getProperty(k)) for k in ("voice", "rate", "volume"))
+
+def synthesize_to_file(text: str, path: str) -> str:
+    """Render speech to an audio file instead of the speaker (benchmarks, caching)."""
+    engine = _get_engine()
+    engine.save_to_file(text, path)
+    engine.runAndWait()
+    return path
+
+
+class SpeechQueue:
+    """
+    Speaks segments on a worker thread while the caller keeps producing them
+    (e.g. sentences from a streaming LLM reply).
+
+    pyttsx3 is not thread-safe, so when using a SpeechQueue don't call speak()
+    from other threads at the same time. Pass speak/stop to play through
+    something else (e.g. tts_cache.speak / tts_cache.stop).
+    """
+
+    def __init__(self, speak: Callable[[str], None] = speak, stop: Callable[[], None] = stop):
+        self._speak = speak
+        self._stop = stop
+        self._q: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tts-queue", daemon=True)
+        self._thread.start()
+
+    def put(self, text: str):
+        if text and not self.cancelled.is_set():
+            self._q.put(text)
+
+    def speak_all(self, segments: Iterable[str]):
+        """Queue segments as they arrive; returns once the producer is exhausted."""
+        for seg in segments:
+            if self.cancelled.is_set():
+                break
+            self.put(seg)
+
+    def cancel(self):
+        """Drop everything queued and stop the current utterance."""
+        self.cancelled.set()
+        try:
+            while True:
+                self._q.get_nowait()
+                self._q.task_done()
+        except queue.Empty:
+            pass
+        self._stop()
+
+    def reset(self):
+        """Re-arm after cancel() for the next turn."""
+        self.cancelled.clear()
+
+    def wait(self):
+        """Block until everything queued so far has been spoken (or dropped)."""
+        self._q.join()
+
+    def close(self):
+        self._q.put(None)
+        self._thread.join(timeout=5)
 
-    _engine.say(text)
-    _engine.runAndWait()
+    def _run(self):
+        while True:
+            text = self._q.get()
+            try:
+                if text is None:
+                    return
+                if not self.cancelled.is_set():
+                    self._speak(text)
+            finally:
+                self._q.task_done()
@@ -0,0 +1,13 @@
+"""
+pytest setup for the unit tests in this folder: puts Source_Code/ on the
+import path. The older scripts here (test_file.py, test_text.py, mic_*.py)
+are manual demos that need a mic / Whisper / Ollama, so they are not collected.
+
+    cd test_code && python -m pytest -q
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Source_Code"))
+
+collect_ignore = ["test_file.py", "test_text.py"]
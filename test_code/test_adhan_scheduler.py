@@ -0,0 +1,98 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import adhan_scheduler as adhan
+from adhan_scheduler import AdhanScheduler, ManualClock, MY_TZ
+
+# imsak is 10 minutes before subuh, so it shares its minute with the subuh reminder
+DAY = {"imsak": "05:54:00", "fajr": "06:04:00", "dhuhr": "13:15:00", "asr": "16:36:00",
+       "maghrib": "19:20:00", "isha": "20:33:00"}
+
+
+def times_for(zone, day):
+    return dict(DAY, date=day.isoformat())
+
+
+def local(y, m, d, hh, mm=0, ss=0):
+    return datetime(y, m, d, hh, mm, ss, tzinfo=MY_TZ)
+
+
+class JumpClock(ManualClock):
+    """Auto-advancing ManualClock that moves the wall clock once it passes `at`."""
+
+    def __init__(self, start, at, to):
+        super().__init__(start, auto=True)
+        self.jump = (at, to)
+
+    def wait(self, cv, timeout):
+        super().wait(cv, timeout)
+        if self.jump and self.now() >= self.jump[0]:
+            self.set(self.jump[1])
+            self.jump = None
+
+
+def run(clock, end, record=True, **kw):
+    fired = []
+    if record:
+        kw["on_event"] = lambda e: fired.append((e.when, e.kind, e.prayer, e.interrupt))
+    sched = AdhanScheduler(["SGR01"], times_for=times_for, clock=clock, **kw)
+    sched.run_until(end)
+    return sched, fired
+
+
+def test_same_minute_alerts_queue():
+    sched, fired = run(ManualClock(local(2026, 3, 1, 5, 0), auto=True), local(2026, 3, 1, 6, 30))
+    assert [(w.strftime("%H:%M"), k, i) for w, k, _, i in fired] == [
+        ("05:54", "imsak", True), ("05:54", "reminder", False), ("06:04", "adhan", True)]
+
+
+def test_rearms_after_midnight():
+    sched, fired = run(ManualClock(local(2026, 3, 1, 20, 0), auto=True), local(2026, 3, 2, 7, 0))
+    assert [(w.date(), k, p) for w, k, p, _ in fired] == [
+        (date(2026, 3, 1), "reminder", "isyak"), (date(2026, 3, 1), "adhan", "isyak"),
+        (date(2026, 3, 2), "imsak", "imsak"), (date(2026, 3, 2), "reminder", "subuh"),
+        (date(2026, 3, 2), "adhan", "subuh")]
+    assert sched.rebuilds == 2 and sched.missed == 0
+    assert max(sched.late_s) == 0
+
+
+def test_clock_jump_forward_skips_the_gap():
+    # 12:00 -> 17:00 in one step: zohor and the asar reminder/adhan are long gone
+    clock = JumpClock(local(2026, 3, 1, 11, 0), at=local(2026, 3, 1, 12, 0), to=local(2026, 3, 1, 17, 0))
+    sched, fired = run(clock, local(2026, 3, 1, 19, 30))
+    assert [(k, p) for _, k, p, _ in fired] == [("reminder", "maghrib"), ("adhan", "maghrib")]
+    assert sched.rebuilds == 2
+
+
+def test_clock_jump_back_does_not_repeat():
+    clock = JumpClock(local(2026, 3, 1, 13, 0), at=local(2026, 3, 1, 13, 20), to=local(2026, 3, 1, 13, 0))
+    sched, fired = run(clock, local(2026, 3, 1, 13, 30))
+    assert [(k, p) for _, k, p, _ in fired] == [("reminder", "zohor"), ("adhan", "zohor")]
+    assert sched.rebuilds == 2
+
+
+def test_late_start_within_grace_still_fires():
+    start = local(2026, 3, 1, 13, 15) + timedelta(seconds=adhan.GRACE_S / 2)
+    sched, fired = run(ManualClock(start, auto=True), local(2026, 3, 1, 13, 20))
+    assert [(k, p) for _, k, p, _ in fired] == [("adhan", "zohor")]
+
+
+class FakeOutput:
+    def __init__(self):
+        self.jobs = []
+
+    def say(self, text, **kw):
+        self.jobs.append((text, kw["interrupt"]))
+
+
+def test_announce_queues_behind_the_first(monkeypatch):
+    import audio_out
+    import tts_cache
+
+    out = FakeOutput()
+    monkeypatch.setattr(audio_out, "get_output", lambda: out)
+    monkeypatch.setattr(tts_cache, "get_phrase_cache", lambda: 1 / 0)
+    run(ManualClock(local(2026, 3, 1, 5, 50), auto=True), local(2026, 3, 1, 5, 55),
+        record=False, adhan=False)
+    assert out.jobs == [(adhan.IMSAK_TEXT, True), ("10 minit lagi masuk waktu subuh.", False)]
@@ -0,0 +1,80 @@
+import asyncio
+
+import numpy as np
+
+from assistant_async import DuplexAssistant
+from mic_capture import FRAME_MS
+
+SR = 16000
+
+
+def utterance(seconds=0.8, gap_s=1.2):
+    """Quiet lead-in, a voiced tone, then enough silence to end the utterance."""
+    t = np.arange(int(SR * seconds)) / SR
+    quiet = np.full(int(SR * 0.4), 1e-4, dtype=np.float32)
+    voice = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    return np.concatenate((quiet, voice, np.full(int(SR * gap_s), 1e-4, dtype=np.float32)))
+
+
+async def feed_utterances(assistant, n):
+    step = SR * FRAME_MS // 1000
+    for _ in range(n):
+        audio = utterance()
+        for i in range(0, len(audio), step):
+            assistant.feed(audio[i:i + step])
+            await asyncio.sleep(0)
+        await assistant.wait_idle(poll_s=0.01)
+
+
+def run(assistant, n):
+    asyncio.run(asyncio.wait_for(assistant.run(lambda a: feed_utterances(a, n)), timeout=30))
+
+
+def test_answers_each_utterance():
+    spoken = []
+    a = DuplexAssistant(transcribe=lambda audio: "waktu asar", correct=str,
+                        respond_stream=lambda text, **kw: iter([f"jawapan {text}."]),
+                        speak=spoken.append)
+    run(a, 2)
+    assert spoken == ["jawapan waktu asar.", "jawapan waktu asar."]
+
+
+def test_stt_error_does_not_stop_the_loop():
+    calls = []
+    spoken = []
+
+    def transcribe(audio):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("decoder blew up")
+        return "waktu asar"
+
+    a = DuplexAssistant(transcribe=transcribe, correct=str,
+                        respond_stream=lambda text, **kw: iter(["ok."]), speak=spoken.append)
+    run(a, 2)
+    assert len(calls) == 2
+    assert spoken == ["ok."]
+    assert a._inflight == 0
+
+
+def test_reply_and_tts_errors_do_not_stop_the_loop():
+    replies = []
+    spoken = []
+
+    def respond(text, **kw):
+        replies.append(text)
+        if len(replies) == 1:
+            raise ConnectionError("ollama down")
+        yield "satu."
+        yield "dua."
+
+    def speak(seg):
+        if seg == "satu.":
+            raise OSError("audio device gone")
+        spoken.append(seg)
+
+    a = DuplexAssistant(transcribe=lambda audio: "soalan", correct=str, respond_stream=respond, speak=speak)
+    run(a, 3)
+    assert len(replies) == 3
+    assert spoken == ["dua.", "dua."]
+    assert a._inflight == 0
@@ -0,0 +1,92 @@
+import json
+import time
+
+import numpy as np
+import pytest
+import requests
+
+from assistant_server import AssistantService, SttBatcher, start_server
+
+
+class FakeEngine:
+    """transcribe_many stand-in: reports each clip's length."""
+
+    def __init__(self):
+        self.batches = []
+
+    def transcribe_many(self, clips):
+        self.batches.append(len(clips))
+        return [f"{len(a)} samples" for a in clips]
+
+
+@pytest.fixture
+def server():
+    svc = AssistantService(FakeEngine(), workers=1, correct=str,
+                           respond_stream=lambda text, **kw: iter([f"jawapan: {text}."]))
+    srv = start_server(svc)
+    yield f"http://127.0.0.1:{srv.server_port}", svc
+    srv.shutdown()
+    svc.close()
+
+
+def pcm16(seconds, sr=16000):
+    return (np.zeros(int(seconds * sr), "<i2")).tobytes()
+
+
+def events(r):
+    return [json.loads(line) for line in r.iter_lines() if line]
+
+
+def test_ask_streams_transcript_segments_done(server):
+    url, svc = server
+    r = requests.post(f"{url}/v1/ask", params={"client": "dapur"}, data=pcm16(1.0), timeout=10)
+    assert r.status_code == 200
+    ev = events(r)
+    assert [e["type"] for e in ev] == ["transcript", "segment", "done"]
+    assert ev[0]["text"] == "16000 samples"
+    deadline = time.time() + 5      # recorded just after the last chunk is written
+    while svc.stats()["clients"].get("dapur", {}).get("ok") != 1 and time.time() < deadline:
+        time.sleep(0.01)
+    assert svc.stats()["clients"]["dapur"]["ok"] == 1
+
+
+def test_upload_is_resampled(server):
+    url, _ = server
+    r = requests.post(f"{url}/v1/ask", params={"sr": 48000}, data=pcm16(0.5, 48000), timeout=10)
+    assert events(r)[0]["text"] == "8000 samples"
+
+
+@pytest.mark.parametrize("params", [{"sr": "abc"}, {"sr": 0}, {"sr": -16000}, {"sr": "16000.5"},
+                                    {"format": "mp3"}])
+def test_bad_parameters_get_400(server, params):
+    url, svc = server
+    r = requests.post(f"{url}/v1/ask", params={"client": "x", **params}, data=pcm16(0.1), timeout=10)
+    assert r.status_code == 400
+    assert "error" in r.json()
+    # the client is not left marked busy
+    r = requests.post(f"{url}/v1/ask", params={"client": "x"}, data=pcm16(0.1), timeout=10)
+    assert r.status_code == 200
+
+
+def test_batcher_rejects_when_full():
+    import queue
+    import threading
+
+    gate = threading.Event()
+
+    class SlowEngine(FakeEngine):
+        def transcribe_many(self, clips):
+            gate.wait(5)
+            return super().transcribe_many(clips)
+
+    b = SttBatcher(SlowEngine(), workers=1, max_batch=1, queue_max=1)
+    try:
+        first = b.submit(np.zeros(10, np.float32))
+        with pytest.raises(queue.Full):
+            for _ in range(3):      # the worker may already hold the first one
+                b.submit(np.zeros(10, np.float32))
+        gate.set()
+        assert first.result(5) == "10 samples"
+    finally:
+        gate.set()
+        b.close()
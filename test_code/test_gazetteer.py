@@ -0,0 +1,37 @@
+import random
+import time
+
+from gazetteer import Gazetteer, TrigramIndex, Zone, get_gazetteer
+
+
+def test_duplicate_name_resolves_by_state():
+    gz = get_gazetteer()
+    assert gz.resolve("pontian", {"pahang"}) == ("PHG07", ())
+    zone, others = gz.resolve("pontian")
+    assert zone == "JHR03" and "PHG07" in others
+
+
+def test_gated_name_needs_the_state():
+    gz = Gazetteer([Zone("PHG01", "pahang", 0, 0, ("kuantan", "pekan"))], gated=["pekan"])
+    assert gz.resolve("pekan") == (None, ())
+    assert gz.resolve("pekan", {"pahang"}) == ("PHG01", ())
+    assert gz.index.names == ["kuantan"]
+
+
+def test_index_scales_to_thousands():
+    rng = random.Random(0)
+
+    def word():
+        return "".join(rng.choice("bcdghjklmnprstw") + rng.choice("aeiou") + (rng.choice("ngkrl") if rng.random() < 0.4 else "")
+                       for _ in range(rng.randint(2, 3)))
+
+    names = list(dict.fromkeys(" ".join(word() for _ in range(rng.randint(1, 2))) for _ in range(6000)))[:5000]
+    index = TrigramIndex(names)
+    queries = rng.sample(names, 200)
+
+    t0 = time.perf_counter()
+    found = [index.best(q[:-1] + "x")[0] for q in queries]       # last letter garbled
+    per_query = (time.perf_counter() - t0) / len(queries)
+
+    assert sum(f == q for f, q in zip(found, queries)) >= 0.95 * len(queries)
+    assert per_query < 0.005        # ~0.4 ms on a desktop CPU; loose for slow CI / the Pi
@@ -0,0 +1,128 @@
+import time
+import asyncio
+import threading
+
+import pytest
+import requests
+
+import fake_esolat
+from http_client import HttpClient, AsyncHttpClient, CircuitOpenError
+
+
+@pytest.fixture
+def server():
+    srv = fake_esolat.start_server(latency=0.2)
+    yield srv
+    srv.shutdown()
+
+
+def test_get_json(server):
+    client = HttpClient(timeout=5)
+    data = client.get_json(fake_esolat.url_for(server), params={"period": "today", "zone": "SGR01"})
+    assert data["zone"] == "SGR01" and len(data["prayerTime"]) == 1
+    assert client.stats()["ok"] == 1
+
+
+def test_identical_concurrent_calls_share_one_request(server):
+    client = HttpClient(timeout=5)
+    url = fake_esolat.url_for(server)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.get_json(url, params={"zone": "SGR01"})))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 5
+    assert server.RequestHandlerClass.hits == 1
+    assert client.stats()["deduped"] == 4
+
+
+def test_retries_then_raises_on_503():
+    srv = fake_esolat.start_server(fail_rate=1.0)
+    try:
+        client = HttpClient(timeout=5, retries=2, backoff=0.001, breaker_threshold=100)
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.get_json(fake_esolat.url_for(srv))
+        st = client.stats()
+        assert st["calls"] == 3 and st["retries"] == 2 and st["failures"] == 3
+    finally:
+        srv.shutdown()
+
+
+def test_breaker_fails_fast_after_threshold():
+    srv = fake_esolat.start_server(fail_rate=1.0)
+    try:
+        client = HttpClient(timeout=5, retries=0, breaker_threshold=2, breaker_reset=60)
+        for _ in range(2):
+            with pytest.raises(requests.exceptions.HTTPError):
+                client.get_json(fake_esolat.url_for(srv))
+        hits = srv.RequestHandlerClass.hits
+        with pytest.raises(CircuitOpenError):
+            client.get_json(fake_esolat.url_for(srv))
+        assert srv.RequestHandlerClass.hits == hits
+        assert client.stats()["breaker_open"]
+    finally:
+        srv.shutdown()
+
+
+def open_breaker(srv, reset):
+    client = HttpClient(timeout=5, retries=0, breaker_threshold=2, breaker_reset=reset)
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.get_json(fake_esolat.url_for(srv))
+    return client
+
+
+def test_breaker_lets_one_trial_through_after_reset():
+    srv = fake_esolat.start_server(fail_rate=1.0)
+    try:
+        client = open_breaker(srv, reset=0.1)
+        time.sleep(0.15)
+        handler = srv.RequestHandlerClass
+        handler.fail_rate, handler.latency = 0.0, 0.3
+        hits = handler.hits
+
+        trial = threading.Thread(target=client.get_json, args=(fake_esolat.url_for(srv),), kwargs={"params": {"zone": "A"}})
+        trial.start()
+        time.sleep(0.1)
+        assert client.stats()["breaker_trial"]
+        for zone in "BCD":            # different requests, so no single-flight sharing
+            with pytest.raises(CircuitOpenError):
+                client.get_json(fake_esolat.url_for(srv), params={"zone": zone})
+        trial.join()
+        assert handler.hits == hits + 1
+
+        # the trial succeeded: closed again
+        client.get_json(fake_esolat.url_for(srv), params={"zone": "B"})
+        st = client.stats()
+        assert not st["breaker_open"] and not st["breaker_trial"] and st["short_circuited"] == 3
+    finally:
+        srv.shutdown()
+
+
+def test_failed_trial_reopens_at_once():
+    srv = fake_esolat.start_server(fail_rate=1.0)
+    try:
+        client = open_breaker(srv, reset=0.1)
+        time.sleep(0.15)
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.get_json(fake_esolat.url_for(srv))      # the trial, one failure only
+        hits = srv.RequestHandlerClass.hits
+        with pytest.raises(CircuitOpenError):
+            client.get_json(fake_esolat.url_for(srv))
+        assert srv.RequestHandlerClass.hits == hits and client.stats()["breaker_open"]
+    finally:
+        srv.shutdown()
+
+
+def test_async_calls_share_one_request(server):
+    aclient = AsyncHttpClient(HttpClient(timeout=5))
+    url = fake_esolat.url_for(server)
+
+    async def main():
+        return await asyncio.gather(*(aclient.get_json(url, params={"zone": "SGR02"}) for _ in range(4)))
+
+    results = asyncio.run(main())
+    assert all(r["zone"] == "SGR02" for r in results)
+    assert server.RequestHandlerClass.hits == 1
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from kws import SR, Features, WakeWordDetector, count_fires, mfcc
+
+
+def phrase(freqs, seg_s=0.12, seed=0, stretch=1.0, noise=0.003):
+    """Vowel-like sequence: a harmonic tone per segment, like syllables of a phrase."""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for f in freqs:
+        t = np.arange(int(SR * seg_s * stretch)) / SR
+        tone = sum(np.sin(2 * np.pi * f * k * t) / k for k in (1, 2, 3))
+        parts.append(0.2 * tone * np.hanning(len(t)))
+    x = np.concatenate(parts)
+    return (x + rng.normal(0, noise, len(x))).astype(np.float32)
+
+
+WAKE = (300, 500, 800, 400, 650, 350)
+OTHER = (900, 250, 250, 1100, 700, 200)
+
+
+def quiet(seconds, seed=1):
+    return np.random.default_rng(seed).normal(0, 1e-4, int(SR * seconds)).astype(np.float32)
+
+
+def stream(det, audio, chunk=320):
+    det.reset()
+    return sum(det.feed(audio[i:i + chunk]) for i in range(0, len(audio), chunk))
+
+
+@pytest.fixture(scope="module")
+def detector():
+    return WakeWordDetector.enroll([phrase(WAKE, seed=s) for s in range(3)])
+
+
+def test_streaming_features_match_whole_clip():
+    x = phrase(WAKE)
+    whole, e_whole = mfcc(x)
+    f = Features()
+    parts = [f.push(x[i:i + 333]) for i in range(0, len(x), 333)]
+    chunked = np.concatenate([p[0] for p in parts])
+    assert chunked.shape == whole.shape
+    np.testing.assert_allclose(chunked, whole, atol=1e-4)
+
+
+def test_fires_once_on_the_wake_phrase(detector):
+    audio = np.concatenate([quiet(1.0), phrase(WAKE, seed=10), quiet(1.0)])
+    assert stream(detector, audio) == 1
+    assert detector.fire_score <= detector.threshold
+
+
+def test_fires_on_a_slower_speaker(detector):
+    audio = np.concatenate([quiet(1.0), phrase(WAKE, seed=11, stretch=1.4), quiet(1.0)])
+    assert stream(detector, audio) == 1
+
+
+def test_ignores_other_sounds(detector):
+    audio = np.concatenate([quiet(1.0), phrase(OTHER, seed=12), quiet(0.5), phrase(WAKE[::-1], seed=13), quiet(1.0)])
+    assert stream(detector, audio) == 0
+
+
+def test_save_load_roundtrip(detector, tmp_path):
+    path = str(tmp_path / "wake.npz")
+    detector.save(path)
+    loaded = WakeWordDetector.load(path)
+    assert len(loaded.templates) == len(detector.templates)
+    audio = np.concatenate([quiet(1.0), phrase(WAKE, seed=14), quiet(1.0)])
+    assert stream(loaded, audio) == 1
+
+
+def test_count_fires_refractory():
+    s = np.array([1, 0.1, 0.1, 1, 1, 0.1, 1, 1, 1, 0.1])
+    assert count_fires(s, 0.2, refractory_frames=3) == 3     # 1, 5, 9
+    assert count_fires(s, 0.2, refractory_frames=4) == 2     # 1, 9
+    assert count_fires(s, 0.2, refractory_frames=0) == 4
+
+
+def test_needs_a_template():
+    with pytest.raises(ValueError):
+        WakeWordDetector([])
@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+
+from metrics import summarize
+
+
+def test_summarize_matches_numpy():
+    rng = np.random.default_rng(0)
+    samples = list(rng.exponential(0.2, 101))
+    s = summarize(samples)
+    a = np.asarray(samples) * 1000.0
+    assert s["n"] == 101
+    for q in (50, 95, 99):
+        assert s[f"p{q}_ms"] == pytest.approx(np.percentile(a, q))
+    assert (s["mean_ms"], s["max_ms"]) == (pytest.approx(a.mean()), pytest.approx(a.max()))
+    assert summarize([]) == {"n": 0}
@@ -0,0 +1,107 @@
+from datetime import date
+
+import pytest
+
+from nlu import QueryParser
+from router import PLACE_TO_ZONE, PRAYER_SYNONYMS, WEEKDAYS, MONTHS, PLACE_REWRITE
+
+TODAY = date(2026, 1, 5)   # a Monday
+
+
+@pytest.fixture(scope="module")
+def parser():
+    return QueryParser(PLACE_TO_ZONE, PRAYER_SYNONYMS, WEEKDAYS, MONTHS, rewrite=PLACE_REWRITE)
+
+
+def test_prayer_zone_and_default_date(parser):
+    q = parser.parse("waktu asar gombak", TODAY)
+    assert (q.prayer, q.zone, q.zone_found) == ("asar", "SGR01", True)
+    assert (q.target_date, q.day_label, q.date_given) == (TODAY, "hari ini", False)
+
+
+def test_multiword_place_and_rewrite(parser):
+    assert parser.parse("maghrib kuala selangor", TODAY).zone == "SGR02"
+    assert parser.parse("subuh gomak", TODAY).zone == "SGR01"
+
+
+def test_default_zone_when_no_place(parser):
+    q = parser.parse("bila isyak", TODAY)
+    assert (q.zone, q.zone_found) == ("SGR01", False)
+
+
+@pytest.mark.parametrize("text,expected,label", [
+    ("asar esok klang", date(2026, 1, 6), "esok"),
+    ("asar lusa klang", date(2026, 1, 7), "lusa"),
+    ("zohor jumaat", date(2026, 1, 9), "jumaat"),
+    ("zohor jumaat minggu depan", date(2026, 1, 16), "jumaat"),
+    ("subuh 5 januari 2027", date(2027, 1, 5), "05-Jan-2027"),
+    ("subuh 07/02", date(2026, 2, 7), "07-02-2026"),
+])
+def test_dates(parser, text, expected, label):
+    q = parser.parse(text, TODAY)
+    assert (q.target_date, q.day_label) == (expected, label)
+    assert q.date_given
+
+
+def test_intent_flags(parser):
+    q = parser.parse("berapa minit lagi maghrib", TODAY)
+    assert q.ask_mins and q.is_prayer_intent
+    assert parser.parse("asar dah masuk belum", TODAY).ask_entered
+    assert parser.parse("assalamualaikum", TODAY).is_greeting
+    assert parser.parse("waktu solat esok", TODAY).wants_timetable
+    assert not parser.parse("siapa perdana menteri", TODAY).is_prayer_intent
+
+
+@pytest.mark.parametrize("text", ["berapa lamanya lagi maghrib", "minitnya lagi", "waktunya bila"])
+def test_nya_suffix_keeps_intent(parser, text):
+    assert parser.parse(text, TODAY).is_prayer_intent
+
+
+def test_berapa_lamanya_asks_minutes(parser):
+    assert parser.parse("berapa lamanya lagi maghrib", TODAY).ask_mins
+
+
+def test_nya_not_stripped_from_unknown_words(parser):
+    assert parser.normalize("bunyanya")[1] == ["bunyanya"]
+
+
+# ----------------------------
+# "johor": state / place name vs STT slip for "zohor" (router parser, with gazetteer)
+# ----------------------------
+@pytest.mark.parametrize("text,prayer,zone", [
+    ("waktu asar johor bahru", "asar", "JHR02"),
+    ("maghrib di muar johor", "maghrib", "JHR04"),
+    ("bila isyak di johor", "isyak", "JHR02"),
+])
+def test_johor_is_a_place_not_zohor(text, prayer, zone):
+    from router import parse_query
+    from stt_postprocess import correct_domain_text
+    fixed = correct_domain_text(text)
+    assert fixed == text
+    q = parse_query(fixed)
+    assert (q.prayer, q.zone) == (prayer, zone)
+
+
+def test_johor_still_zohor_without_places(parser):
+    # no gazetteer: "johor" is only the STT slip
+    assert parser.parse("waktu johor gombak", TODAY).prayer == "zohor"
+
+
+def test_state_only_uses_capital_zone():
+    from router import parse_query
+    q = parse_query("asar di pahang")
+    assert (q.zone, q.zone_found) == ("PHG02", True)
+
+
+@pytest.mark.parametrize("text,place,zone", [
+    ("waktu asar di kuala rompin", "kuala rompin", "PHG07"),
+    ("waktu asar di kota kinabalu", "kota kinabalu", "SBH07"),
+    ("waktu asar di desa petaling", "desa petaling", "WLY01"),
+    ("asar di cheras kl", "cheras kl", "WLY01"),
+    ("asar di rompin", "rompin", "NGS01"),
+    ("asar di petaling", "petaling", "SGR01"),
+])
+def test_longest_place_name_wins(text, place, zone):
+    from router import _PARSER
+    q = _PARSER.parse(text, TODAY)
+    assert (q.place, q.zone) == (place, zone)
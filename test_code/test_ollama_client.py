@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+import ollama_client
+from ollama_client import ChatSession, ERROR_PREFIX
+
+
+class FakeResponse:
+    """Streaming response stand-in: iter_lines() returns the given raw lines."""
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+
+def chat_line(text, done=False):
+    return json.dumps({"message": {"content": text}, "done": done}).encode()
+
+
+@pytest.fixture
+def session(monkeypatch):
+    s = ChatSession("m", host="http://fake")
+    s.lines = []
+    monkeypatch.setattr(s._http, "post", lambda *a, **kw: FakeResponse(s.lines))
+    return s
+
+
+def test_bad_line_is_skipped(session):
+    session.lines = [chat_line("Kuala "), b'{"message": {"content": "Lum', chat_line("Lumpur."), chat_line("", done=True)]
+    assert "".join(session.ask_stream("ibu negara?")) == "Kuala Lumpur."
+    assert session.in_conversation()
+
+
+def test_cut_off_stream_is_not_recorded(session):
+    session.lines = [chat_line("Kuala "), b'{"message": {"cont']
+    assert list(session.ask_stream("ibu negara?")) == ["Kuala "]
+    assert not session.in_conversation()
+
+
+def test_stream_with_no_text_speaks_the_error(session):
+    session.lines = [b"<html>502 Bad Gateway</html>"]
+    reply = list(session.ask_stream("ibu negara?"))
+    assert len(reply) == 1 and reply[0].startswith(ERROR_PREFIX)
+
+
+def test_generate_stream_skips_bad_lines(monkeypatch):
+    lines = [json.dumps({"response": "Ya."}).encode(), b"\xff\xfe", json.dumps({"done": True}).encode()]
+    monkeypatch.setattr(ollama_client.requests, "post", lambda *a, **kw: FakeResponse(lines))
+    assert list(ollama_client.ollama_generate_stream("hai", host="http://fake")) == ["Ya."]
+
+    monkeypatch.setattr(ollama_client.requests, "post", lambda *a, **kw: FakeResponse([b"{oops"]))
+    reply = list(ollama_client.ollama_generate_stream("hai", host="http://fake"))
+    assert len(reply) == 1 and reply[0].startswith(ERROR_PREFIX)
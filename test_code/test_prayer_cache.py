@@ -0,0 +1,70 @@
+import time
+from datetime import date
+
+from prayer_cache import TimetableStore, parse_esolat_date
+
+
+def esolat_year(year, fajr="05:58:00"):
+    """Minimal e-Solat prayerTime list: Jan 1..3 of the year."""
+    return [{"date": f"0{d}-Jan-{year}", "fajr": fajr, "maghrib": "19:20:00"} for d in (1, 2, 3)]
+
+
+class Loader:
+    def __init__(self, fajr="05:58:00", fail=False):
+        self.calls = []
+        self.fajr = fajr
+        self.fail = fail
+
+    def __call__(self, zone, year):
+        self.calls.append((zone, year))
+        if self.fail:
+            raise ConnectionError("e-Solat down")
+        return esolat_year(year, self.fajr)
+
+
+def test_parse_esolat_date():
+    assert parse_esolat_date("03-Jan-2026") == date(2026, 1, 3)
+    assert parse_esolat_date("2026-01-03") is None
+    assert parse_esolat_date(None) is None
+
+
+def test_miss_loads_whole_year_once(tmp_path):
+    loader = Loader()
+    store = TimetableStore(loader, path=str(tmp_path / "c.db"))
+    assert store.get("SGR01", date(2026, 1, 2))["fajr"] == "05:58:00"
+    assert store.get("SGR01", date(2026, 1, 3))["fajr"] == "05:58:00"
+    assert loader.calls == [("SGR01", 2026)]
+    assert store.zones() == ["SGR01"]
+
+
+def test_rows_survive_restart(tmp_path):
+    path = str(tmp_path / "c.db")
+    TimetableStore(Loader(), path=path).get("SGR01", date(2026, 1, 1))
+    store = TimetableStore(Loader(fail=True), path=path)
+    assert store.get("SGR01", date(2026, 1, 1))["maghrib"] == "19:20:00"
+    assert store.loader.calls == []
+
+
+def test_failed_load_returns_none(tmp_path):
+    store = TimetableStore(Loader(fail=True), path=str(tmp_path / "c.db"))
+    assert store.get("SGR01", date(2026, 1, 1)) is None
+
+
+def test_stale_year_refreshed_in_background(tmp_path):
+    store = TimetableStore(Loader(), path=str(tmp_path / "c.db"), refresh_after=0)
+    store.get("SGR01", date(2026, 1, 1))
+    store.loader = Loader(fajr="06:00:00")
+    # still served from the old rows, refresh happens on a thread
+    assert store.get("SGR01", date(2026, 1, 1)) is not None
+    deadline = time.time() + 5
+    while store.get("SGR01", date(2026, 1, 1))["fajr"] != "06:00:00" and time.time() < deadline:
+        time.sleep(0.01)
+    assert store.get("SGR01", date(2026, 1, 1))["fajr"] == "06:00:00"
+
+
+def test_failed_refresh_keeps_old_rows(tmp_path):
+    store = TimetableStore(Loader(), path=str(tmp_path / "c.db"), refresh_after=0)
+    store.get("SGR01", date(2026, 1, 1))
+    store.loader = Loader(fail=True)
+    store.refresh_async("SGR01", 2026).wait(5)
+    assert store.get("SGR01", date(2026, 1, 1))["fajr"] == "05:58:00"
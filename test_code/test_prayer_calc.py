@@ -0,0 +1,57 @@
+from datetime import date
+
+import pytest
+
+import prayer_calc
+from prayer_cache import TimetableStore
+
+START, END = date(2026, 1, 1), date(2026, 1, 10)
+
+
+def shift(hhmmss, mins):
+    m = prayer_calc._minutes(hhmmss) + mins
+    return f"{int(m) // 60:02d}:{int(m) % 60:02d}:00"
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Cache holding "e-Solat" rows that differ from our calculation by known offsets."""
+    s = TimetableStore(lambda zone, year: [], path=str(tmp_path / "cache.sqlite3"))
+    for zone, rows in prayer_calc.compute(["WLY01", "SGR01"], START, END).items():
+        real = []
+        for row in rows:
+            row = {k: v for k, v in row.items() if k != "source"}
+            row["fajr"] = shift(row["fajr"], 1)                  # ours is a minute early every day
+            if zone == "SGR01" and row["date"] == "05-Jan-2026":
+                row["asr"] = shift(row["asr"], -2)               # and two minutes late once
+            real.append(row)
+        s.put_year(zone, 2026, real)
+    yield s
+    s.close()
+
+
+def test_known_offsets(store):
+    rep = prayer_calc.validate(store)
+    assert (rep["rows"], rep["zones"], rep["from"], rep["to"]) == (20, 2, "2026-01-01", "2026-01-10")
+
+    subuh = rep["prayers"]["subuh"]
+    assert subuh["n"] == 20 and subuh["mean_min"] == -1.0 and subuh["max_abs_min"] == 1.0
+    assert subuh["within_1_min"] == 1.0
+
+    asar = rep["prayers"]["asar"]
+    assert asar["mean_min"] == pytest.approx(2 / 20) and asar["within_1_min"] == pytest.approx(19 / 20)
+    assert asar["worst"] == {"diff_min": 2.0, "zone": "SGR01", "date": "2026-01-05"}
+
+
+def test_exact_match_has_zero_worst(store):
+    # every zohor row matches exactly; the worst entry must still be filled in
+    zohor = prayer_calc.validate(store)["prayers"]["zohor"]
+    assert zohor["max_abs_min"] == 0.0 and zohor["worst"]["diff_min"] == 0.0
+
+
+def test_only_real_rows_are_compared(store):
+    store.put_year("JHR02", 2026, prayer_calc.compute_year("JHR02", 2026), fill=True)
+    rep = prayer_calc.validate(store)
+    assert rep["rows"] == 20
+    assert prayer_calc.validate(store, ["WLY01"])["rows"] == 10
+    assert prayer_calc.validate(store, ["JHR02"]) == {"rows": 0, "zones": 0, "prayers": {}}
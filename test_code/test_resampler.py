@@ -0,0 +1,75 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+from scipy.signal import resample_poly
+
+from resampler import StreamingResampler
+import mic_capture
+
+
+def tone(sr, seconds, freq=220.0, amp=0.3):
+    t = np.arange(int(sr * seconds)) / sr
+    return (amp * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+@pytest.mark.parametrize("src,dst", [(48000, 16000), (44100, 16000), (16000, 16000)])
+@pytest.mark.parametrize("chunk", [1, 480, 4096])
+def test_streaming_matches_resample_poly(src, dst, chunk):
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal(src // 2 + 37).astype(np.float32)
+    rs = StreamingResampler(src, dst)
+    parts = [rs.process(x[i:i + chunk]) for i in range(0, len(x), chunk)]
+    y = np.concatenate(parts + [rs.flush()])
+    ref = resample_poly(x, dst, src) if src != dst else x
+    assert len(y) == len(ref)
+    assert np.max(np.abs(y - ref)) < 1e-4
+
+
+class _FakeStream:
+    """Stands in for sounddevice.InputStream: plays `signal` through the callback."""
+    signal = None
+    fed = 0
+
+    def __init__(self, samplerate, blocksize, callback, finished_callback, **kw):
+        self.blocksize, self.callback, self.finished = blocksize, callback, finished_callback
+
+    def __enter__(self):
+        x = self.signal
+        for i in range(0, len(x), self.blocksize):
+            _FakeStream.fed = min(i + self.blocksize, len(x))
+            try:
+                self.callback(x[i:i + self.blocksize, None], self.blocksize, None, None)
+            except _CallbackStop:
+                break
+        self.finished()
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _CallbackStop(Exception):
+    pass
+
+
+def test_capture_keeps_resampler_tail(monkeypatch):
+    sr = 48000
+    quiet = np.full(int(sr * 0.6), 1e-4, dtype=np.float32)
+    x = np.concatenate((quiet, tone(sr, 1.0), np.full(int(sr * 1.5), 1e-4, dtype=np.float32)))
+    _FakeStream.signal = x
+    monkeypatch.setitem(sys.modules, "sounddevice",
+                        types.SimpleNamespace(InputStream=_FakeStream, CallbackStop=_CallbackStop))
+
+    audio, out_sr = mic_capture.capture_utterance(sr=sr, out_sr=16000)
+    assert out_sr == 16000
+
+    # the capture is one contiguous slice of the offline resample, ending after
+    # the last block the endpointer saw (nothing lost to the filter delay)
+    ref = resample_poly(x, 1, 3).astype(np.float32)
+    frame = 16000 * mic_capture.FRAME_MS // 1000
+    offsets = [o for o in range(0, len(ref) - len(audio), frame)
+               if np.max(np.abs(ref[o:o + len(audio)] - audio)) < 1e-4]
+    assert offsets, "captured audio is not a contiguous slice of the resampled input"
+    assert offsets[0] + len(audio) == -(-_FakeStream.fed // 3)
@@ -0,0 +1,112 @@
+from response_cache import ResponseCache
+
+
+class Clock:
+    def __init__(self, t=1000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+def test_answer_expires_at_its_own_time():
+    clock = Clock()
+    c = ResponseCache(path=None, clock=clock)
+    c.put_answer(("SGR01", "asar"), "16:30", expires_at=clock.t + 60)
+    assert c.get_answer(("SGR01", "asar")) == "16:30"
+    clock.t += 60
+    assert c.get_answer(("SGR01", "asar")) is None
+    st = c.stats()["answers"]
+    assert (st["hits"], st["misses"], st["expired"]) == (1, 1, 1)
+
+
+def test_already_expired_answer_not_stored():
+    clock = Clock()
+    c = ResponseCache(path=None, clock=clock)
+    c.put_answer("k", "x", expires_at=clock.t)
+    assert c.stats()["answers"]["size"] == 0
+
+
+def test_answer_tier_is_lru_bounded():
+    c = ResponseCache(path=None, answer_max=2, clock=Clock())
+    for k in "abc":
+        c.put_answer(k, k, expires_at=10 ** 9)
+    assert c.get_answer("a") is None
+    assert c.get_answer("c") == "c"
+    assert c.stats()["answers"]["evicted"] == 1
+
+
+def test_llm_ttl():
+    clock = Clock()
+    c = ResponseCache(path=None, llm_ttl=100, clock=clock)
+    c.put_llm("llama3", "siapa kamu", "Saya pembantu.")
+    clock.t += 99
+    assert c.get_llm("llama3", "siapa kamu") == "Saya pembantu."
+    assert c.get_llm("mistral", "siapa kamu") is None
+    clock.t += 1
+    assert c.get_llm("llama3", "siapa kamu") is None
+
+
+def test_llm_tier_persists_and_keeps_recent(tmp_path):
+    path = str(tmp_path / "r.db")
+    clock = Clock()
+    c = ResponseCache(path=path, llm_max=2, clock=clock)
+    for q in ("q1", "q2"):
+        clock.t += 1
+        c.put_llm("m", q, q.upper())
+    clock.t += 1
+    c.get_llm("m", "q1")          # q1 is now the most recent
+    clock.t += 1
+    c.put_llm("m", "q3", "Q3")    # evicts q2
+    c.close()
+
+    c = ResponseCache(path=path, llm_max=2, clock=clock)
+    assert c.get_llm("m", "q1") == "Q1"
+    assert c.get_llm("m", "q3") == "Q3"
+    assert c.get_llm("m", "q2") is None
+
+
+def test_llm_expired_rows_dropped_on_load(tmp_path):
+    path = str(tmp_path / "r.db")
+    clock = Clock()
+    c = ResponseCache(path=path, llm_ttl=100, clock=clock)
+    c.put_llm("m", "q", "a")
+    c.close()
+    clock.t += 200
+    c = ResponseCache(path=path, llm_ttl=100, clock=clock)
+    assert c.stats()["llm"]["size"] == 0
+
+
+class CountingDb:
+    """Wraps the sqlite connection to count commits."""
+
+    def __init__(self, db):
+        self.db = db
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+        self.db.commit()
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+
+def test_llm_hit_does_not_commit(tmp_path):
+    path = str(tmp_path / "r.db")
+    clock = Clock()
+    c = ResponseCache(path=path, llm_max=2, clock=clock)
+    c.put_llm("m", "q1", "Q1")
+    clock.t += 1
+    c.put_llm("m", "q2", "Q2")
+    c._db = db = CountingDb(c._db)
+    for _ in range(5):
+        clock.t += 1
+        assert c.get_llm("m", "q1") == "Q1"
+    assert db.commits == 0
+
+    c.close()                     # use times written back once
+    assert db.commits == 1
+    c = ResponseCache(path=path, llm_max=1, clock=clock)
+    assert c.get_llm("m", "q1") == "Q1"      # most recently used survives the smaller cap
+    assert c.get_llm("m", "q2") is None
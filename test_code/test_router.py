@@ -0,0 +1,45 @@
+import pytest
+
+import fake_ollama
+import router
+from ollama_client import ChatSession
+from response_cache import ResponseCache
+
+MODEL = "fake-llm"
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Fresh answer cache and a chat session for client "t" pointed at fake_ollama."""
+    srv = fake_ollama.start_server()
+    monkeypatch.setattr(router, "_cache", ResponseCache(path=None))
+    session = ChatSession(MODEL, system=router.SYSTEM_PROMPT, host=fake_ollama.host_for(srv))
+    monkeypatch.setitem(router._sessions, (MODEL, "t"), session)
+    yield srv, session
+    srv.shutdown()
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_cached_answer_joins_the_conversation(llm, stream):
+    srv, session = llm
+    router.get_response_cache().put_llm(MODEL, "siapa perdana menteri malaysia", "Jawapan dari cache.")
+
+    if stream:
+        reply = " ".join(router.get_response_stream("Siapa perdana menteri Malaysia?", MODEL, client="t"))
+    else:
+        reply = router.get_response("Siapa perdana menteri Malaysia?", MODEL, client="t")
+    assert reply == "Jawapan dari cache."
+    assert session.in_conversation()
+
+    # the follow-up goes to the LLM with the cached turn in its history, and is not cached
+    router.get_response("berapa umur dia", MODEL, client="t")
+    prompt = srv.RequestHandlerClass._last_prompt[MODEL]
+    assert "Siapa perdana menteri Malaysia?" in prompt and "Jawapan dari cache." in prompt
+    assert router.get_response_cache().get_llm(MODEL, "berapa umur dia") is None
+
+
+def test_record_starts_fresh_after_idle():
+    s = ChatSession(MODEL, idle_reset_s=0.0)
+    s.record("q1", "a1")
+    s.record("q2", "a2")
+    assert [m["content"] for m in s.history] == ["q2", "a2"]
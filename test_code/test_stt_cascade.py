@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faster_whisper")
+import stt_faster_whisper as stt  # noqa: E402
+
+
+class FakeEngine:
+    """SttEngine stand-in that records which decode path was used."""
+
+    def __init__(self, model_size, text="asar gombak", logprob=-0.1):
+        self.model_size = model_size
+        self.text = text
+        self.logprob = logprob
+        self.calls = []
+
+    def transcribe_segments(self, audio, count=True, **options):
+        self.calls.append("greedy")
+        seg = SimpleNamespace(text=self.text, avg_logprob=self.logprob, no_speech_prob=0.0,
+                              compression_ratio=1.0, start=0.0, end=1.0)
+        return [seg], SimpleNamespace(duration=1.0, duration_after_vad=1.0)
+
+    def transcribe_adaptive(self, audio, accept=None):
+        self.calls.append("adaptive")
+        return self.text
+
+    def transcribe(self, audio):
+        self.calls.append("beam")
+        return self.text
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture
+def cascade(monkeypatch):
+    engines = {"tiny": FakeEngine("tiny", logprob=-2.0), "small": FakeEngine("small")}
+    monkeypatch.setattr(stt, "_engines", engines)
+    return stt.CascadeEngine(["tiny", "small"], memory_budget_mb=10 ** 6), engines
+
+
+@pytest.mark.parametrize("mode,expected", [("adaptive", "adaptive"), ("beam", "beam")])
+def test_last_tier_follows_decode_mode(monkeypatch, cascade, mode, expected):
+    c, engines = cascade
+    monkeypatch.setattr(stt, "DECODE_MODE", mode)
+    c.transcribe(np.zeros(16000, np.float32), accept=lambda t: True)
+    assert engines["tiny"].calls == ["greedy"]         # not confident -> next tier
+    assert engines["small"].calls == [expected]
+
+
+def test_confident_cheap_tier_is_kept(cascade):
+    c, engines = cascade
+    engines["tiny"].logprob = -0.1
+    assert c.transcribe(np.zeros(16000, np.float32), accept=lambda t: True) == "asar gombak"
+    assert engines["small"].calls == []
+    assert c.stats()["tiers"][0]["accepted"] == 1
+
+
+def test_batched_pipeline_built_once(monkeypatch):
+    import threading
+    import time
+
+    import faster_whisper
+
+    built = []
+
+    class SlowPipeline:
+        def __init__(self, model):
+            time.sleep(0.05)
+            built.append(model)
+
+    monkeypatch.setattr(faster_whisper, "BatchedInferencePipeline", SlowPipeline, raising=False)
+    eng = stt.SttEngine("fake")
+    eng.model = object()
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(eng.batched())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(built) == 1 and all(p is got[0] for p in got)
@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from mic_capture import pause_splits
+
+SR = 16000
+
+
+def utterance(*parts):
+    """("speech", s) / ("pause", s) pieces -> tone bursts over a faint noise floor."""
+    rng = np.random.default_rng(0)
+    out = [rng.normal(0, 0.001, int(0.3 * SR))]
+    for kind, s in parts:
+        n = int(s * SR)
+        if kind == "speech":
+            out.append(0.3 * np.sin(2 * np.pi * 220.0 * np.arange(n) / SR))
+        else:
+            out.append(rng.normal(0, 0.001, n))
+    return np.concatenate(out).astype(np.float32)
+
+
+QUESTION = utterance(("speech", 1.2), ("pause", 0.4), ("speech", 1.2), ("pause", 0.4), ("speech", 1.2), ("pause", 0.7))
+
+
+def test_cuts_in_the_pauses():
+    cuts = pause_splits(QUESTION, SR)
+    assert len(cuts) == 2
+    assert 1.5 * SR < cuts[0] < 1.9 * SR
+    assert 3.1 * SR < cuts[1] < 3.5 * SR
+
+
+def test_no_cut_without_a_usable_pause():
+    assert pause_splits(utterance(("speech", 3.0), ("pause", 0.7)), SR) == []
+    # the pause leaves less than min_chunk_s after it
+    assert pause_splits(utterance(("speech", 2.0), ("pause", 0.3), ("speech", 0.3)), SR) == []
+    assert len(pause_splits(QUESTION, SR, max_chunks=2)) == 1
+
+
+class FakeModel:
+    """WhisperModel stand-in: one canned text per transcribe() call."""
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append((len(audio), options.get("initial_prompt")))
+        seg = SimpleNamespace(text=" " + self.texts[len(self.calls) - 1], avg_logprob=-0.1, no_speech_prob=0.0,
+                              compression_ratio=1.0, start=0.0, end=len(audio) / SR)
+        info = SimpleNamespace(duration=len(audio) / SR, duration_after_vad=len(audio) / SR)
+        return iter([seg]), info
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    pytest.importorskip("faster_whisper")
+    import stt_faster_whisper as stt
+
+    monkeypatch.setattr(stt, "DECODE_MODE", "adaptive")
+    eng = stt.SttEngine("fake")
+    eng.model = FakeModel(["waktu asar gombak", "esok", "terima kasih"])
+    return eng
+
+
+def test_partials_decode_chunk_by_chunk(engine):
+    got = list(engine.transcribe_partials(QUESTION, accept=lambda t: True))
+    assert [t for t, _ in got] == ["waktu asar gombak", "waktu asar gombak esok", "waktu asar gombak esok terima kasih"]
+    pending = [p for _, p in got]
+    assert pending[0] > pending[1] > pending[2] == 0.0
+    assert sum(n for n, _ in engine.model.calls) == len(QUESTION)
+    # later chunks are prompted with what came before
+    assert engine.model.calls[0][1] is None
+    assert engine.model.calls[2][1] == "waktu asar gombak esok"
+    assert engine.stats()["early_stops"] == 0
+
+
+def test_closing_early_skips_the_rest(engine):
+    it = engine.transcribe_partials(QUESTION)
+    text, pending = next(it)
+    it.close()
+    assert text == "waktu asar gombak"
+    assert len(engine.model.calls) == 1
+    stats = engine.stats()
+    assert stats["early_stops"] == 1
+    assert stats["skipped_audio_s"] == pytest.approx(pending)
+    assert pending == pytest.approx((len(QUESTION) - engine.model.calls[0][0]) / SR)
+
+
+def test_router_prefetches_while_decoding(engine, monkeypatch):
+    import router
+
+    seen = []
+    monkeypatch.setattr(router, "prefetch", lambda zone, day: seen.append((zone, len(engine.model.calls))))
+    ir = router.IncrementalRouter()
+    text = ir.resolve(engine.transcribe_partials(QUESTION))
+    assert seen == [("SGR01", 1)]              # zone heard in the first chunk, before the second decode
+    assert text == "waktu asar gombak esok"
+    assert ir.early and len(engine.model.calls) == 2
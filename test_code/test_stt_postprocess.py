@@ -0,0 +1,54 @@
+import pytest
+
+from stt_postprocess import CompiledCorrector, correct_domain_text
+
+
+def test_replace_and_fuzzy_fix():
+    assert correct_domain_text("Waddu asa dikak Kelang?") == "waktu asar dekat klang"
+    assert correct_domain_text("berapa menit lagi maghrip") == "berapa minit lagi maghrib"
+
+
+def test_replace_only_at_word_boundaries():
+    assert correct_domain_text("waktu asar gombak") == "waktu asar gombak"
+
+
+def test_small_cache_does_not_evict_current_words():
+    c = CompiledCorrector(cache_size=2)
+    assert c("foo bar") == "foo bar"
+    assert c("foo baz") == "foo baz"
+    assert c("qux quux corge foo") == "qux quux corge foo"
+    assert len(c._cache) == 2
+
+
+def test_cache_keeps_recent_words():
+    c = CompiledCorrector(cache_size=2)
+    c("foo bar")
+    c("foo baz")          # foo was just used, so bar is the one evicted
+    assert list(c._cache) == ["foo", "baz"]
+
+
+def test_multiword_replace_keys():
+    assert correct_domain_text("sahabat bernam") == "sabak bernam"
+    assert correct_domain_text("batu asar di klang") == "waktu asar di klang"
+
+
+def gazetteer_names():
+    from gazetteer import get_gazetteer
+    gz = get_gazetteer()
+    return [p for p in gz.places() if p not in gz.gated]
+
+
+@pytest.mark.parametrize("name", gazetteer_names())
+def test_gazetteer_names_survive(name):
+    expected = "waktu asar di " + " ".join(name.replace("'", " ").split())
+    assert correct_domain_text("waktu asar di " + name) == expected
+
+
+@pytest.mark.parametrize("text,zone", [
+    ("waktu asar di kluang", "JHR03"),
+    ("maghrib di batu pahat", "JHR04"),
+    ("isyak di fraser's hill", "PHG06"),
+])
+def test_corrected_names_still_route(text, zone):
+    from router import parse_query
+    assert parse_query(correct_domain_text(text)).zone == zone
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pytest
+from scipy.io import wavfile
+
+from router import ANSWERS
+from tts_cache import PhraseCache, is_templated, split_units, spoken_time, spell_zone, malay_number
+
+SR = 16000
+
+
+def fake_render(text, path):
+    """A short tone per clip, longer for longer text."""
+    t = np.arange(int(SR * 0.01 * (len(text) + 1))) / SR
+    wavfile.write(path, SR, (0.3 * np.sin(2 * np.pi * 300 * t) * 32767).astype(np.int16))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PhraseCache(root=str(tmp_path), render=fake_render, utterance_max=2)
+
+
+def files(cache, kind):
+    return sorted(os.listdir(os.path.join(cache.root, kind)))
+
+
+def test_numbers_and_codes():
+    assert malay_number(19) == "sembilan belas"
+    assert malay_number(45) == "empat puluh lima"
+    assert spell_zone("SGR01") == "S G R kosong satu"
+    assert spoken_time("19:20") == "sembilan belas dua puluh"
+
+
+@pytest.mark.parametrize("text", [
+    ANSWERS["at"].format(prayer="asar", day="hari ini", zone="SGR01", hhmm="16:30"),
+    ANSWERS["not_yet"].format(prayer="asar", zone="SGR01", hhmm="16:30", mins=12),
+    ANSWERS["timetable"].format(day="esok", zone="WLY01", times="subuh 06:14, zohor 13:26")
+    + ANSWERS["other_zones"].format(place="Pontian", others="PHG07"),
+])
+def test_template_answers_are_templated(text):
+    assert is_templated(text)
+
+
+@pytest.mark.parametrize("text", [
+    "Mesyuarat itu pukul 10:30 di bilik SGR01.",
+    "Perlawanan bermula 20:45. Waktu solat asar hari ini untuk zon SGR01 ialah 16:30.",
+    ANSWERS["which"],
+])
+def test_other_replies_are_not_templated(text):
+    assert not is_templated(text)
+
+
+def test_split_units():
+    units = [u for u, _ in split_units("Waktu solat maghrib hari ini untuk zon SGR01 ialah 19:20.")]
+    assert units == ["waktu solat", "maghrib", "hari ini", "untuk zon", "S G R kosong satu", "ialah",
+                     "sembilan", "belas", "dua", "puluh"]
+
+
+def test_template_answer_reuses_unit_clips(cache):
+    cache.assemble("Waktu solat asar hari ini untuk zon SGR01 ialah 16:30.")
+    before = cache.renders
+    cache.assemble("Waktu solat asar esok untuk zon SGR01 ialah 16:30.")
+    assert cache.renders == before + 1        # only "esok" was new
+    assert files(cache, "utterances") == []
+
+
+def test_llm_reply_with_times_stays_in_pruned_utterances(cache):
+    for hh in range(10, 15):
+        cache.assemble(f"Kedai itu buka pukul {hh}:00 di SGR01 setiap hari.")
+    assert files(cache, "units") == []
+    assert len(files(cache, "utterances")) == 2